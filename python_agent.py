@@ -8,7 +8,14 @@ import platform
 import subprocess
 import logging
 import threading
-import multiprocessing
+import struct
+import zlib
+import argparse
+import collections
+import asyncio
+import uuid
+import shlex
+from concurrent.futures import Future, ThreadPoolExecutor
 from lxml import etree
 
 # from lxml.parser import result
@@ -19,49 +26,352 @@ from lxml import etree
 logging.basicConfig(level=logging.INFO)
 
 
-# 通用的字节转换函数
-def bytes2human(n):
-    symbols = ('K', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y')
-    prefix = {s: 1 << (i + 1) * 10 for i, s in enumerate(symbols)}
-    for s in reversed(symbols):
-        if n >= prefix[s]:
-            value = float(n) / prefix[s]
-            return f'{value:.1f}{s}'
-    return f"{n}B"
-
-
 # 获取主机名
 hostname = socket.gethostname()
 
+# 帧协议（版本2）：魔数 + 版本 + 标志位 + 请求ID + 负载字节长度，均为网络字节序
+# 客户端在请求中携带 "proto": 2 即表示支持帧协议，否则按旧版长度前缀格式回复
+FRAME_MAGIC = b'KY'
+FRAME_VERSION = 2
+FRAME_HEADER = struct.Struct('!2sBBII')
+# 帧标志位：负载经 zlib 压缩。客户端在请求中携带 "compress": ["zlib"] 表示可以接收压缩响应
+FRAME_FLAG_ZLIB = 0x01
+# 负载超过该字节数时才压缩，小帧压缩收益不抵 CPU 开销
+AGENT_COMPRESS_THRESHOLD = int(os.environ.get('KYLIN_AGENT_COMPRESS_THRESHOLD', 1024))
+
+# 服务模式与并发控制，可通过环境变量或命令行参数调整
+AGENT_SERVER_MODE = os.environ.get('KYLIN_AGENT_MODE', 'asyncio')
+# 执行阻塞命令（子进程、采样等）的线程池大小，即整个探针的最大并发命令数
+AGENT_MAX_CONCURRENCY = int(os.environ.get('KYLIN_AGENT_MAX_CONCURRENCY', 8))
+# 单个客户端连接上同时处理的请求数上限，达到上限后暂停读取该连接
+AGENT_MAX_INFLIGHT_PER_CLIENT = int(os.environ.get('KYLIN_AGENT_MAX_INFLIGHT', 4))
+# 后台采样间隔（秒）与环形缓冲区保留的采样点数
+AGENT_SAMPLE_INTERVAL = float(os.environ.get('KYLIN_AGENT_SAMPLE_INTERVAL', 1.0))
+AGENT_SAMPLE_HISTORY = int(os.environ.get('KYLIN_AGENT_SAMPLE_HISTORY', 300))
+# 推送模式：采集端地址（"主机:端口"，为空则不推送）、推送间隔（秒）与上报的主机标识（默认由采集端取对端IP）
+AGENT_PUSH_ADDR = os.environ.get('KYLIN_AGENT_PUSH_ADDR', '')
+AGENT_PUSH_INTERVAL = float(os.environ.get('KYLIN_AGENT_PUSH_INTERVAL', 5.0))
+AGENT_PUSH_ID = os.environ.get('KYLIN_AGENT_PUSH_ID', '')
+# 推送帧是否使用差分编码
+AGENT_PUSH_DELTA = os.environ.get('KYLIN_AGENT_PUSH_DELTA', '1') != '0'
+# 块设备IO分析：默认采样时长（秒）与采样间隔（秒），请求可通过 duration/interval 覆盖
+IO_SAMPLE_DURATION = float(os.environ.get('KYLIN_AGENT_IO_DURATION', 5))
+IO_SAMPLE_INTERVAL = float(os.environ.get('KYLIN_AGENT_IO_INTERVAL', 0.1))
+IO_SAMPLE_MAX_DURATION = 60
+# 火焰图：默认采样时长（秒）与频率（Hz），请求可通过 duration/frequency 覆盖，时长不超过上限
+FLAME_GRAPH_DURATION = int(os.environ.get('KYLIN_AGENT_PERF_DURATION', 60))
+FLAME_GRAPH_FREQUENCY = int(os.environ.get('KYLIN_AGENT_PERF_FREQUENCY', 99))
+FLAME_GRAPH_MAX_DURATION = 300
+# 旧版服务端需要探针直接返回 SVG 时使用的 flamegraph.pl
+FLAME_GRAPH_SCRIPT = os.environ.get('KYLIN_AGENT_FLAMEGRAPH_PL',
+                                    '/root/os_manage/FlameGraphChart/FlameGraph/flamegraph.pl')
+
+
+class MetricSampler(threading.Thread):
+    """
+    后台采样线程：按固定间隔读取 CPU、内存、磁盘IO、网络IO 计数器，
+    把相邻两次读数的差值换算为使用率和速率，保存在环形缓冲区中。
+    get_info 直接读取最新采样点，不再阻塞等待 cpu_percent。
+    """
+
+    def __init__(self, interval=AGENT_SAMPLE_INTERVAL, history=AGENT_SAMPLE_HISTORY):
+        super().__init__(name='metric-sampler', daemon=True)
+        self.interval = interval
+        self.samples = collections.deque(maxlen=history)
+        self.lock = threading.Lock()
+        self.start_lock = threading.Lock()
+
+    def ensure_started(self):
+        with self.start_lock:
+            if not self.is_alive():
+                self.start()
+
+    def latest(self):
+        """返回最新采样点，尚未完成第一次采样时返回 None"""
+        with self.lock:
+            return self.samples[-1] if self.samples else None
+
+    def history(self, limit=None):
+        with self.lock:
+            samples = list(self.samples)
+        return samples[-limit:] if limit else samples
+
+    def run(self):
+        previous = self._read_counters()
+        while True:
+            time.sleep(self.interval)
+            try:
+                current = self._read_counters()
+                sample = self._delta(previous, current)
+            except Exception as e:
+                logging.error(f"采样失败: {e}")
+                continue
+            with self.lock:
+                self.samples.append(sample)
+            previous = current
+
+    @staticmethod
+    def _read_counters():
+        return dict(time=time.time(), cpu=psutil.cpu_times(), memory=psutil.virtual_memory(),
+                    disk=psutil.disk_io_counters(), network=psutil.net_io_counters())
+
+    @staticmethod
+    def _delta(previous, current):
+        elapsed = max(current['time'] - previous['time'], 1e-6)
+
+        def rate(group, field):
+            before, after = previous[group], current[group]
+            if before is None or after is None:
+                return 0.0
+            # 计数器回绕或设备热插拔时差值可能为负
+            return max(getattr(after, field) - getattr(before, field), 0) / elapsed
+
+        cpu_before, cpu_after = previous['cpu'], current['cpu']
+        cpu_total = max(sum(cpu_after) - sum(cpu_before), 1e-6)
+        cpu_idle = cpu_after.idle - cpu_before.idle
+        cpu_iowait = getattr(cpu_after, 'iowait', 0) - getattr(cpu_before, 'iowait', 0)
+        cpu_percent = min(max((cpu_total - cpu_idle - cpu_iowait) / cpu_total * 100, 0.0), 100.0)
+        return dict(
+            time=current['time'],
+            cpu_percent=round(cpu_percent, 1),
+            cpu_iowait_percent=round(max(cpu_iowait, 0) / cpu_total * 100, 1),
+            mem_percent=current['memory'].percent,
+            disk_read_bytes_per_sec=round(rate('disk', 'read_bytes'), 1),
+            disk_write_bytes_per_sec=round(rate('disk', 'write_bytes'), 1),
+            disk_read_iops=round(rate('disk', 'read_count'), 1),
+            disk_write_iops=round(rate('disk', 'write_count'), 1),
+            net_sent_bytes_per_sec=round(rate('network', 'bytes_sent'), 1),
+            net_recv_bytes_per_sec=round(rate('network', 'bytes_recv'), 1),
+            net_packets_sent_per_sec=round(rate('network', 'packets_sent'), 1),
+            net_packets_recv_per_sec=round(rate('network', 'packets_recv'), 1),
+        )
 
-# 生成火焰图的函数
-def generate_flame_graph(output_file='perf.svg'):
-    try:
-        # 记录perf数据
-        perf_record_cmd = ['sudo', 'perf', 'record', '-e', 'cycles:u', '-a', '-g', '--', 'sleep', '60']
-        result = subprocess.run(perf_record_cmd, check=True)
-
-        # 生成折叠后的调用栈
-        perf_script_cmd = ['sudo', 'perf', 'script', '-i', 'perf.data']
-        if os.path.exists('perf.data'):
-            with open('perf.unfold', 'w') as f:
-                subprocess.run(perf_script_cmd, stdout=f, check=True)
-        else:
-            return
 
-        # 生成SVG图
-        flamegraph_cmd = (
-            "sudo perf script | "
-            "/root/os_manage/FlameGraphChart/FlameGraph/stackcollapse-perf.pl | "
-            "/root/os_manage/FlameGraphChart/FlameGraph/flamegraph.pl > "
-            f"{output_file}"
-        )
-        subprocess.run(flamegraph_cmd, shell=True, check=True)
+metric_sampler = MetricSampler()
+
+# psutil 进程状态 -> top 的状态字母
+PROCESS_STATUS_CODES = {
+    'running': 'R', 'sleeping': 'S', 'disk-sleep': 'D', 'stopped': 'T', 'tracing-stop': 't',
+    'zombie': 'Z', 'dead': 'X', 'idle': 'I', 'parked': 'P',
+}
+PROCESS_SORT_KEYS = {
+    'cpu': lambda row: (row['%CPU'], row['%MEM']),
+    'mem': lambda row: (row['%MEM'], row['%CPU']),
+}
+
+
+class ProcessSampler:
+    """
+    进程表采样：psutil.process_iter 一次性预取所需字段（直接读取 /proc/[pid]/stat、statm），替代解析 top -b 的输出。
+    进程 CPU 使用率由本次与上一次快照之间的 CPU 时间差值计算，口径与 top 相同（单核跑满为 100%）。
+    """
+    ATTRS = ['pid', 'name', 'username', 'nice', 'status', 'cpu_times', 'memory_info', 'create_time', 'cpu_num',
+             'cmdline']
+
+    def __init__(self, min_interval=0.5):
+        self.min_interval = min_interval  # 两次快照的最小间隔（秒），间隔过短时 CPU 使用率误差大
+        self.lock = threading.Lock()
+        self.previous = None  # (时间, {pid: (create_time, CPU秒数)})
+
+    def _snapshot(self):
+        processes = []
+        for proc in psutil.process_iter(self.ATTRS):
+            info = proc.info
+            # 进程在遍历过程中退出或无权限读取时字段为 None
+            if info['cpu_times'] is None or info['memory_info'] is None:
+                continue
+            processes.append(info)
+        return time.monotonic(), processes
+
+    @staticmethod
+    def _cpu_seconds(info):
+        return info['cpu_times'].user + info['cpu_times'].system
+
+    def _remember(self, now, processes):
+        self.previous = (now, {info['pid']: (info['create_time'], self._cpu_seconds(info)) for info in processes})
+
+    def _measure(self):
+        """采集一次进程表，返回 (进程列表, {pid: CPU使用率}, 距上一次快照的秒数)"""
+        with self.lock:
+            now, processes = self._snapshot()
+            if self.previous is None:
+                # 第一次调用没有基准快照，等待一个最小间隔后再采一次
+                self._remember(now, processes)
+                time.sleep(self.min_interval)
+                now, processes = self._snapshot()
+            elif now - self.previous[0] < self.min_interval:
+                time.sleep(self.min_interval - (now - self.previous[0]))
+                now, processes = self._snapshot()
+            elapsed = max(now - self.previous[0], 1e-6)
+            before = self.previous[1]
+            self._remember(now, processes)
+        cpu_percent = {}
+        for info in processes:
+            cpu_seconds = self._cpu_seconds(info)
+            created, cpu_before = before.get(info['pid'], (None, None))
+            # PID 被复用时 create_time 不同，视为新进程
+            if created != info['create_time']:
+                cpu_before = cpu_seconds
+            cpu_percent[info['pid']] = round(max(cpu_seconds - cpu_before, 0) / elapsed * 100, 1)
+        return processes, cpu_percent, elapsed
+
+    def top(self, sort='cpu', limit=None):
+        """返回按 CPU 或内存排序的前 limit 个进程，数值字段均为数字（内存为字节，TIME+ 为秒）"""
+        sort_key = PROCESS_SORT_KEYS.get(sort, PROCESS_SORT_KEYS['cpu'])
+        processes, cpu_percent, elapsed = self._measure()
+        total_memory = psutil.virtual_memory().total
+        rows = []
+        for info in processes:
+            memory = info['memory_info']
+            nice = info['nice'] or 0
+            rows.append({
+                "PID": info['pid'],
+                "USER": info['username'] or '',
+                "PR": 20 + nice,
+                "NI": nice,
+                "VIRT": memory.vms,
+                "RES": memory.rss,
+                "SHR": getattr(memory, 'shared', 0),
+                "S": PROCESS_STATUS_CODES.get(info['status'], '?'),
+                "%CPU": cpu_percent[info['pid']],
+                "%MEM": round(memory.rss / total_memory * 100, 1),
+                "TIME+": round(self._cpu_seconds(info), 2),
+                "COMMAND": info['name'],
+            })
+        rows.sort(key=sort_key, reverse=True)
+        return dict(processes=rows[:limit] if limit else rows, total=len(rows), interval=round(elapsed, 2))
+
+    def table(self):
+        """返回 {pid: [CPU核心, CPU使用率, 启动命令]}，启动命令与 ps 的 cmd 列一致（内核线程显示为 [名称]）"""
+        processes, cpu_percent, _ = self._measure()
+        return {info['pid']: [info['cpu_num'], cpu_percent[info['pid']],
+                              ' '.join(info['cmdline'] or []) or f"[{info['name']}]"]
+                for info in processes}
+
+
+process_sampler = ProcessSampler()
+
+# 进程表增量同步：空闲超过该时间（秒）的会话被丢弃，会话数超过上限时丢弃最久未访问的
+PROCESS_TABLE_SESSION_TTL = 300
+PROCESS_TABLE_MAX_SESSIONS = 64
+
+
+class ProcessTableTracker:
+    """
+    进程表增量同步：每个会话保存上一次发给客户端的进程表及其版本号。
+    客户端带上 session 和已持有的 version 时只返回新增、消失以及核心/CPU使用率变化的进程，
+    会话未知或版本不一致时返回完整进程表。
+    """
+
+    def __init__(self, sampler, ttl=PROCESS_TABLE_SESSION_TTL, max_sessions=PROCESS_TABLE_MAX_SESSIONS):
+        self.sampler = sampler
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = collections.OrderedDict()  # session -> (版本号, 进程表, 最近访问时间)
+        self.lock = threading.Lock()
+
+    def sync(self, session, version=None):
+        table = self.sampler.table()
+        now = time.monotonic()
+        with self.lock:
+            for name in [name for name, (_, _, seen) in self.sessions.items() if now - seen > self.ttl]:
+                del self.sessions[name]
+            known = self.sessions.pop(session, None)
+            self.sessions[session] = ((known[0] if known else 0) + 1, table, now)
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+            current = self.sessions[session][0]
+        if known is None or version != known[0]:
+            return dict(session=session, version=current, type='full', rows=table)
+        previous = known[1]
+        added, changed = {}, {}
+        for pid, row in table.items():
+            before = previous.get(pid)
+            # 启动命令变化（exec 或 PID 复用）时按新增处理，下发完整的行
+            if before is None or before[2] != row[2]:
+                added[pid] = row
+            elif before[:2] != row[:2]:
+                changed[pid] = row[:2]
+        removed = [pid for pid in previous if pid not in table]
+        return dict(session=session, version=current, type='delta', base=version, added=added, changed=changed,
+                    removed=removed)
+
+
+process_table_tracker = ProcessTableTracker(process_sampler)
+
+
+# 返回最新采样点中的指标；采样线程尚未产出数据时返回默认值，不阻塞请求
+def latest_sample_value(key, default=0.0):
+    metric_sampler.ensure_started()
+    sample = metric_sampler.latest()
+    return sample[key] if sample else default
 
-        # 返回生成的文件路径
-        return output_file
-    except Exception as e:
-        print(e)
+
+# 生成火焰图的函数
+# perf script 输出中样本的首行：进程名 PID[/TID] [CPU] 时间戳: ...
+PERF_EVENT_PATTERN = re.compile(r'^(\S.*?)\s+(\d+)(?:/\d+)?\s')
+# 调用栈中的一帧：地址 函数名+偏移 (模块路径)
+PERF_FRAME_PATTERN = re.compile(r'^\s*[0-9a-fA-F]+\s+(.+?)(?:\s+\((.*)\))?$')
+PERF_OFFSET_PATTERN = re.compile(r'\+0x[0-9a-fA-F]+$')
+
+
+def perf_frame_name(symbol, module):
+    """与 stackcollapse-perf.pl 一致：去掉偏移和 C++ 参数列表，无符号的帧以 [模块名] 表示"""
+    symbol = PERF_OFFSET_PATTERN.sub('', symbol)
+    if symbol == '[unknown]' and module and module != '[unknown]':
+        symbol = f'[{os.path.basename(module)}]'
+    elif '(' in symbol and not symbol.startswith('('):
+        symbol = symbol[:symbol.index('(')]
+    return symbol.replace(';', ':')
+
+
+def collapse_perf_script(lines):
+    """把 perf script 的输出逐行折叠为 {调用栈: 样本数}，调用栈从根到叶以分号连接，第一帧为进程名"""
+    stacks = collections.Counter()
+    comm, frames = None, []
+    for line in lines:
+        if not line.strip():
+            if comm is not None:
+                stacks[';'.join([comm] + frames[::-1])] += 1
+            comm, frames = None, []
+        elif line[0] not in ' \t':
+            match = PERF_EVENT_PATTERN.match(line)
+            comm = match.group(1).replace(' ', '_').replace(';', ':') if match else None
+            frames = []
+        elif comm is not None:
+            match = PERF_FRAME_PATTERN.match(line.rstrip('\n'))
+            if match:
+                frames.append(perf_frame_name(match.group(1), match.group(2)))
+    if comm is not None:
+        stacks[';'.join([comm] + frames[::-1])] += 1
+    return stacks
+
+
+def format_folded_stacks(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def record_folded_stacks(duration=FLAME_GRAPH_DURATION, frequency=FLAME_GRAPH_FREQUENCY):
+    """
+    全系统采样 duration 秒并返回折叠后的调用栈。perf record 以管道模式直接把数据交给 perf script，
+    perf script 的输出在进程内逐行折叠，不再写 perf.data/perf.unfold，也只需要一次 perf script。
+    """
+    record = subprocess.Popen(['sudo', 'perf', 'record', '-e', 'cycles:u', '-F', str(frequency), '-a', '-g',
+                               '-o', '-', '--', 'sleep', str(duration)],
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    script = subprocess.Popen(['sudo', 'perf', 'script', '-i', '-'], stdin=record.stdout, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, errors='replace')
+    # 只由 perf script 持有管道读端，perf script 提前退出时 perf record 能收到 SIGPIPE
+    record.stdout.close()
+    try:
+        stacks = collapse_perf_script(script.stdout)
+    finally:
+        script.stdout.close()
+        script.wait()
+        record.wait()
+    if record.returncode:
+        raise RuntimeError(f"perf record 执行失败，返回码 {record.returncode}")
+    return stacks
 
 
 # 获取CPU信息
@@ -69,12 +379,13 @@ def get_cpu_info():
     try:
         cpu_times = psutil.cpu_times(percpu=False)
         cpu_count = psutil.cpu_count()
-        cpu_percent = psutil.cpu_percent(interval=1)
+        cpu_percent = latest_sample_value('cpu_percent', psutil.cpu_percent(interval=None))
         cpu_model = platform.processor()
-        user_time = time.strftime('%H:%M:%S', time.gmtime(cpu_times.user))
-        system_time = time.strftime('%H:%M:%S', time.gmtime(cpu_times.system))
-        idle_time = time.strftime('%H:%M:%S', time.gmtime(cpu_times.idle))
-        wait_time = time.strftime('%H:%M:%S', time.gmtime(cpu_times.iowait))
+        # 累计时间取整秒，作为整数计数器便于差分编码
+        user_time = int(cpu_times.user)
+        system_time = int(cpu_times.system)
+        idle_time = int(cpu_times.idle)
+        wait_time = int(getattr(cpu_times, 'iowait', 0))
         return dict(cpu_count=cpu_count, cpu_percent=cpu_percent, cpu_user_time=user_time, cpu_system_time=system_time,
                     cpu_idle_time=idle_time, cpu_wait_time=wait_time, cpu_model=cpu_model)
     except Exception as e:
@@ -85,16 +396,16 @@ def get_cpu_info():
 def get_memory_info():
     try:
         virtual_mem = psutil.virtual_memory()
-        mem_total = bytes2human(virtual_mem.total)
-        mem_used = bytes2human(virtual_mem.used)
-        mem_free = bytes2human(virtual_mem.free)
+        mem_total = virtual_mem.total
+        mem_used = virtual_mem.used
+        mem_free = virtual_mem.free
         mem_percent = virtual_mem.percent
-        mem_buffers = bytes2human(virtual_mem.buffers)
-        mem_cache = bytes2human(virtual_mem.cached)
+        mem_buffers = virtual_mem.buffers
+        mem_cache = virtual_mem.cached
         swap_info = psutil.swap_memory()
-        swap_total = bytes2human(swap_info.total)
-        swap_used = bytes2human(swap_info.used)
-        swap_free = bytes2human(swap_info.free)
+        swap_total = swap_info.total
+        swap_used = swap_info.used
+        swap_free = swap_info.free
         swap_percent = swap_info.percent
         return dict(mem_total=mem_total, mem_used=mem_used, mem_free=mem_free, mem_percent=mem_percent,
                     mem_buffers=mem_buffers, mem_cache=mem_cache, mem_swap_total=swap_total, mem_swap_used=swap_used,
@@ -107,15 +418,21 @@ def get_memory_info():
 def get_disk_info():
     try:
         disk_usage = psutil.disk_usage('/')
-        disk_total = bytes2human(disk_usage.total)
-        disk_used = bytes2human(disk_usage.used)
-        disk_free = bytes2human(disk_usage.free)
+        disk_total = disk_usage.total
+        disk_used = disk_usage.used
+        disk_free = disk_usage.free
         disk_percent = disk_usage.percent
         disk_io = psutil.disk_io_counters()
-        disk_read = bytes2human(disk_io.read_bytes)
-        disk_write = bytes2human(disk_io.write_bytes)
+        disk_read = disk_io.read_bytes
+        disk_write = disk_io.write_bytes
         return dict(disk_total=disk_total, disk_used=disk_used, disk_free=disk_free, disk_percent=disk_percent,
-                    disk_read=disk_read, disk_write=disk_write)
+                    disk_read=disk_read, disk_write=disk_write,
+                    disk_read_count=disk_io.read_count, disk_write_count=disk_io.write_count,
+                    disk_read_time=disk_io.read_time, disk_write_time=disk_io.write_time,
+                    disk_read_rate=latest_sample_value('disk_read_bytes_per_sec'),
+                    disk_write_rate=latest_sample_value('disk_write_bytes_per_sec'),
+                    disk_read_iops=latest_sample_value('disk_read_iops'),
+                    disk_write_iops=latest_sample_value('disk_write_iops'))
     except Exception as e:
         print(e)
 
@@ -124,12 +441,16 @@ def get_disk_info():
 def get_net_info():
     try:
         net_io = psutil.net_io_counters(pernic=False)
-        net_bytes_sent = bytes2human(net_io.bytes_sent)
-        net_bytes_recv = bytes2human(net_io.bytes_recv)
-        net_packets_recv = bytes2human(net_io.packets_recv)
-        net_packets_sent = bytes2human(net_io.packets_sent)
+        net_bytes_sent = net_io.bytes_sent
+        net_bytes_recv = net_io.bytes_recv
+        net_packets_recv = net_io.packets_recv
+        net_packets_sent = net_io.packets_sent
         return dict(net_bytes_sent=net_bytes_sent, net_bytes_recv=net_bytes_recv,
-                    net_packets_recv=net_packets_recv, net_packets_sent=net_packets_sent)
+                    net_packets_recv=net_packets_recv, net_packets_sent=net_packets_sent,
+                    net_sent_rate=latest_sample_value('net_sent_bytes_per_sec'),
+                    net_recv_rate=latest_sample_value('net_recv_bytes_per_sec'),
+                    net_packets_sent_rate=latest_sample_value('net_packets_sent_per_sec'),
+                    net_packets_recv_rate=latest_sample_value('net_packets_recv_per_sec'))
     except Exception as e:
         print(e)
 
@@ -150,16 +471,6 @@ def get_os_info():
         print(e)
 
 
-def run_top():
-    try:
-        # 运行top命令
-        result = subprocess.run(['top', '-n', '1', 'b'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
-                                text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        print(f"运行top出错: {e.stderr}")
-
-
 def get_ps():
     try:
         # 运行ps命令
@@ -170,41 +481,279 @@ def get_ps():
         print(f"运行ps出错: {e.stderr}")
 
 
-# 运行biotop的函数
-def run_biolatency():
-    try:
-        # 运行biotop命令，并将其输出写入到biotop_output.txt文件
-        with open("/opt/biotop_output.txt", "w") as output_file:
-            subprocess.run(['/usr/share/bcc/tools/biolatency', "-D", "-T", "3", "10"], stdout=output_file,
-                           stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        print(f"运行biotop出错: {e.stderr}")
+# /proc/diskstats 与 /sys/block/<设备>/stat 中使用的字段（从 0 开始的下标，后者没有主次设备号和设备名三列）
+DISKSTAT_FIELDS = ('reads', 'read_merges', 'read_sectors', 'read_ms', 'writes', 'write_merges', 'write_sectors',
+                   'write_ms', 'in_flight', 'io_ms', 'weighted_ms')
+SECTOR_SIZE = 512
+
+
+def read_diskstats():
+    """读取 /proc/diskstats，只保留 /sys/block 下的整盘设备（不含分区），返回 {设备名: 计数器元组}"""
+    devices = set(os.listdir('/sys/block'))
+    stats = {}
+    with open('/proc/diskstats') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 14 and parts[2] in devices:
+                stats[parts[2]] = tuple(int(value) for value in parts[3:14])
+    return stats
+
+
+def read_sysfs_block_stats(devices=None):
+    """从 /sys/block/<设备>/stat 读取同样的计数器，可只读取指定设备"""
+    stats = {}
+    for name in devices or os.listdir('/sys/block'):
+        try:
+            with open(f'/sys/block/{name}/stat') as f:
+                stats[name] = tuple(int(value) for value in f.read().split()[:11])
+        except (OSError, ValueError):
+            continue
+    return stats
+
+
+def latency_bucket(latency_ms):
+    """按 2 的幂划分毫秒延迟区间，与 biolatency 的直方图相同：0 为 [0,1)，k 为 [2^(k-1), 2^k)"""
+    return int(latency_ms).bit_length()
+
+
+class BlockIOStats:
+    """单个块设备在一次采样期间的累计结果"""
+
+    def __init__(self):
+        self.totals = dict.fromkeys(DISKSTAT_FIELDS, 0)
+        self.histograms = {'read': collections.Counter(), 'write': collections.Counter()}
+        self.in_flight_sum = 0
+        self.in_flight_max = 0
+        self.ticks = 0
+
+    def add(self, before, after):
+        delta = {field: max(b - a, 0) for field, a, b in zip(DISKSTAT_FIELDS, before, after)}
+        for field in DISKSTAT_FIELDS:
+            if field != 'in_flight':
+                self.totals[field] += delta[field]
+        # diskstats 只有累计的 IO 次数和耗时，每个间隔内以平均延迟代表该间隔内的每一次 IO
+        for kind in ('read', 'write'):
+            count = delta[kind + 's']
+            if count:
+                self.histograms[kind][latency_bucket(delta[kind + '_ms'] / count)] += count
+        self.in_flight_sum += after[DISKSTAT_FIELDS.index('in_flight')]
+        self.in_flight_max = max(self.in_flight_max, after[DISKSTAT_FIELDS.index('in_flight')])
+        self.ticks += 1
+
+    def result(self, elapsed):
+        totals = self.totals
+        result = dict(
+            read_iops=round(totals['reads'] / elapsed, 1),
+            write_iops=round(totals['writes'] / elapsed, 1),
+            read_bytes_per_sec=round(totals['read_sectors'] * SECTOR_SIZE / elapsed, 1),
+            write_bytes_per_sec=round(totals['write_sectors'] * SECTOR_SIZE / elapsed, 1),
+            util_percent=round(min(totals['io_ms'] / (elapsed * 1000) * 100, 100.0), 1),
+            # 与 iostat 的 aqu-sz 相同：加权 IO 耗时 / 时长
+            avg_queue_depth=round(totals['weighted_ms'] / (elapsed * 1000), 2),
+            avg_in_flight=round(self.in_flight_sum / self.ticks, 2) if self.ticks else 0.0,
+            max_in_flight=self.in_flight_max,
+            read_latency_ms=round(totals['read_ms'] / totals['reads'], 3) if totals['reads'] else 0.0,
+            write_latency_ms=round(totals['write_ms'] / totals['writes'], 3) if totals['writes'] else 0.0,
+            latency_histogram={},
+        )
+        for kind, histogram in self.histograms.items():
+            if histogram:
+                # [下限ms, 上限ms, 次数]，从 0 到最大的非空区间连续列出
+                result['latency_histogram'][kind] = [
+                    [0 if bucket == 0 else 1 << (bucket - 1), 1 << bucket, histogram.get(bucket, 0)]
+                    for bucket in range(max(histogram) + 1)]
+        return result
+
+
+def parse_block_devices(devices):
+    """
+    把请求中的 devices 规整为设备名集合：可以是设备名列表，也可以是逗号或空白分隔的字符串。
+    未指定时返回 None；设备名中不能含有路径分隔符
+    """
+    if devices is None:
+        return None
+    if isinstance(devices, str):
+        devices = devices.replace(',', ' ').split()
+    elif not isinstance(devices, (list, tuple)) or not all(isinstance(name, str) for name in devices):
+        raise ValueError(f"devices 应为设备名列表或逗号分隔的字符串: {devices!r}")
+    names = {name.strip() for name in devices if name.strip()}
+    invalid = sorted(name for name in names if '/' in name or name in ('.', '..'))
+    if invalid:
+        raise ValueError(f"无效的设备名: {', '.join(invalid)}")
+    return names or None
+
+
+def sample_block_io(duration=IO_SAMPLE_DURATION, interval=IO_SAMPLE_INTERVAL, devices=None, source='proc'):
+    """
+    以 interval 为间隔在 duration 秒内连续读取块设备计数器，统计每个设备的 IOPS、吞吐、利用率、
+    队列深度和读写延迟直方图。未指定 devices 时只返回采样期间有 IO 的设备。
+    """
+    read_stats = read_diskstats if source != 'sysfs' else lambda: read_sysfs_block_stats(devices)
+    results = {}
+    started = time.monotonic()
+    deadline = started + duration
+    previous = read_stats()
+    while True:
+        time.sleep(max(min(interval, deadline - time.monotonic()), 0))
+        current = read_stats()
+        for name, after in current.items():
+            before = previous.get(name)
+            if before is not None and (not devices or name in devices):
+                results.setdefault(name, BlockIOStats()).add(before, after)
+        previous = current
+        if time.monotonic() >= deadline:
+            break
+    elapsed = max(time.monotonic() - started, 1e-6)
+    report = {}
+    for name, stats in sorted(results.items()):
+        if devices or stats.totals['reads'] or stats.totals['writes']:
+            report[name] = stats.result(elapsed)
+    samples = max((stats.ticks for stats in results.values()), default=0)
+    return dict(duration=round(elapsed, 2), interval=interval, samples=samples, devices=report)
 
 
-# 运行dd命令的函数
-def run_dd():
-    try:
-        # 运行dd命令
-        subprocess.run(['dd', 'if=/dev/vda', 'of=/dev/zero'], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    except subprocess.CalledProcessError as e:
-        print(f"运行dd出错: {e.stderr}")
+# 操作系统信息不会变化，在命令缓存中保存一小时
+def get_os_info_cached():
+    return command_cache.get_or_compute(('collector', 'os'), 3600, get_os_info)
 
 
 # 汇集系统信息
-def gather_monitor_data():
-    return {
-        'hostname': hostname,
-        'os': get_os_info(),
-        'cpu': get_cpu_info(),
-        'memory': get_memory_info(),
-        'disk': get_disk_info(),
-        'network': get_net_info()
-    }
-
-
-# 分解长字符
-def split_string_by_length(string, length):
-    return [string[i:i + length] for i in range(0, len(string), length)]
+# 各子系统对应的采集函数
+MONITOR_COLLECTORS = {
+    'os': get_os_info_cached,
+    'cpu': get_cpu_info,
+    'memory': get_memory_info,
+    'disk': get_disk_info,
+    'network': get_net_info,
+}
+
+
+# subsystems 为空时采集全部子系统，否则只采集列出的子系统
+def gather_monitor_data(subsystems=None):
+    data = {'hostname': hostname}
+    for name, collector in MONITOR_COLLECTORS.items():
+        if not subsystems or name in subsystems:
+            data[name] = collector()
+    return data
+
+
+# 推送会话中只在开始时发送一次的静态信息：整个子系统或子系统中的个别字段
+STATIC_SUBSYSTEMS = ('os',)
+STATIC_FIELDS = {'cpu': ('cpu_model',)}
+
+
+# 把采集结果拆分为 (静态信息, 动态指标)
+def split_static(data):
+    static, metrics = {}, {}
+    for name, values in data.items():
+        if name in STATIC_SUBSYSTEMS or not isinstance(values, dict):
+            static[name] = values
+            continue
+        fields = STATIC_FIELDS.get(name, ())
+        metrics[name] = {k: v for k, v in values.items() if k not in fields}
+        static_values = {k: v for k, v in values.items() if k in fields}
+        if static_values:
+            static[name] = static_values
+    return static, metrics
+
+
+def is_counter(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+# 计算两帧指标的差分：整数计数器发送差值，其余字段只在变化时发送新值；字段集合变化时返回 None
+def diff_metrics(previous, current):
+    if previous.keys() != current.keys():
+        return None
+    changes = {}
+    for name, values in current.items():
+        before = previous[name]
+        if not isinstance(values, dict) or not isinstance(before, dict):
+            if values != before:
+                changes[name] = values
+            continue
+        if before.keys() != values.keys():
+            return None
+        fields = {}
+        for field, value in values.items():
+            old = before[field]
+            if value == old:
+                continue
+            fields[field] = value - old if is_counter(old) and is_counter(value) else value
+        if fields:
+            changes[name] = fields
+    return changes
+
+
+class MetricFrameEncoder:
+    """
+    推送会话的紧凑帧编码。第一帧与每隔 keyframe_interval 帧发送完整帧（full），
+    其余帧在开启差分时只发送变化的字段（delta），字段集合变化时自动退回完整帧。
+    每条连接使用独立的编码器，重连后从完整帧重新开始。
+    """
+
+    def __init__(self, delta=True, keyframe_interval=60):
+        self.delta = delta
+        self.keyframe_interval = keyframe_interval
+        self.previous = None
+        self.count = 0
+
+    def encode(self, metrics):
+        changes = None
+        if self.delta and self.previous is not None and self.count < self.keyframe_interval:
+            changes = diff_metrics(self.previous, metrics)
+        self.previous = metrics
+        if changes is None:
+            self.count = 1
+            return {'type': 'full', 'values': metrics}
+        self.count += 1
+        return {'type': 'delta', 'values': changes}
+
+
+# 负载超过阈值且对端可以接收时使用 zlib 压缩，返回 (标志位, 负载)
+def compress_payload(payload, accept=True, threshold=AGENT_COMPRESS_THRESHOLD):
+    if accept and len(payload) >= threshold:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            return FRAME_FLAG_ZLIB, compressed
+    return 0, payload
+
+
+# 读取恰好 size 字节，数据直接写入预分配的缓冲区
+def recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = sock.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError('连接已被对端关闭')
+        received += n
+    return buf
+
+
+# 按帧协议发送一条消息，帧头与负载合并为一次 sendall
+def send_frame(sock, payload, request_id=0, flags=0):
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, request_id, len(payload))
+    sock.sendall(header + payload)
+
+
+# 读取一条请求，返回 (请求内容, 是否为帧协议, 请求ID)，连接关闭时返回 None
+def recv_request(sock):
+    prefix = sock.recv(len(FRAME_MAGIC))
+    if not prefix:
+        return None
+    if len(prefix) < len(FRAME_MAGIC):
+        prefix += recv_exact(sock, len(FRAME_MAGIC) - len(prefix))
+    if prefix == FRAME_MAGIC:
+        header = prefix + recv_exact(sock, FRAME_HEADER.size - len(FRAME_MAGIC))
+        _, _, _, request_id, length = FRAME_HEADER.unpack(header)
+        return json.loads(recv_exact(sock, length)), True, request_id
+    # 旧版客户端直接发送 JSON 文本
+    data = prefix + sock.recv(1024)
+    command = json.loads(data.decode('utf-8'))
+    request_id = command.get('request_id', 0) if isinstance(command, dict) else 0
+    return command, False, request_id
 
 
 def check_container_exists(container_name):
@@ -239,30 +788,50 @@ def check_container_exists(container_name):
 #        logging.error(f"连接错误: {e}")
 #    finally:
 #        client_socket.close()
+
+
+# 编码响应：支持帧协议的客户端使用字节长度帧头（可压缩），其余保持旧版长度前缀格式
+def encode_response(response, framed, request_id=0, compress=False):
+    back_data = json.dumps(response)
+    if framed:
+        flags, payload = compress_payload(back_data.encode('utf-8'), compress)
+        return FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, request_id, len(payload)) + payload
+    return (str(len(back_data)) + back_data).encode('utf-8')
+
+
+def send_response(client_socket, response, framed, request_id=0, compress=False):
+    client_socket.sendall(encode_response(response, framed, request_id, compress))
+
+
+# 请求是否声明可以接收 zlib 压缩的响应
+def accepts_zlib(command):
+    return isinstance(command, dict) and 'zlib' in (command.get('compress') or ())
+
+
+# 从请求中提取参数并执行命令
+# 请求中的协议字段，其余字段（pid、cpu_id、sort、limit 等）都作为命令参数
+REQUEST_META_FIELDS = ('command', 'proto', 'request_id', 'compress')
+
+
+def execute_request(command):
+    params = {key: value for key, value in command.items() if key not in REQUEST_META_FIELDS}
+    return handle_command(command['command'], **params)
+
+
 def handle_client(client_socket):
     try:
         while True:
-            data = client_socket.recv(1024).decode('utf-8')
-            if not data:
+            request = recv_request(client_socket)
+            if request is None:
                 break
 
-            command = json.loads(data)
+            command, framed, request_id = request
             if isinstance(command, dict) and 'command' in command:
-                # 从 command 中提取 pid
-                cmd = command['command']
-                pid = command.get('pid')  # 提取 pid
-                cpu_id = command.get('cpu_id')
-                cluster_ip = command.get('cluster_ip')
-
-                # 将 pid 传递给 handle_command 函数
-                response = handle_command(cmd, cluster_ip, pid, cpu_id)
-
-                # 返回响应
-                back_data = json.dumps(response)
-                client_socket.send(str(len(back_data)).encode('utf-8'))
-                back_list = split_string_by_length(back_data, 1024)
-                for sub_back in back_list:
-                    client_socket.send(sub_back.encode('utf-8'))
+                response = execute_request(command)
+                framed = framed or command.get('proto', 1) >= FRAME_VERSION
+                send_response(client_socket, response, framed, request_id, accepts_zlib(command))
+            elif framed:
+                send_response(client_socket, {'error': 'Invalid command format'}, framed, request_id)
             else:
                 response = {'error': 'Invalid command format'}
                 client_socket.send(json.dumps(response).encode('utf-8'))
@@ -272,14 +841,189 @@ def handle_client(client_socket):
         client_socket.close()
 
 
-def get_process_cpu_affinity(pid):
-    result = subprocess.run(["taskset", "-pc", str(pid)], capture_output=True, text=True)
-    return result.stdout
+# CPU 亲和性：直接调用 sched_getaffinity/sched_setaffinity，不再为每个进程启动 taskset
+CGROUP_ROOT = '/sys/fs/cgroup'
+AFFINITY_POLICIES = ('spread', 'pack')
+
+
+def parse_cpu_list(value):
+    """把 "0-3,8"、单个编号或编号列表转换为 CPU 编号集合"""
+    if isinstance(value, int):
+        return {value}
+    if isinstance(value, (list, tuple, set)):
+        return {int(cpu) for cpu in value}
+    cpus = set()
+    for part in str(value).split(','):
+        part = part.strip()
+        if '-' in part:
+            start, end = part.split('-', 1)
+            cpus.update(range(int(start), int(end) + 1))
+        elif part:
+            cpus.add(int(part))
+    return cpus
+
+
+def format_cpu_list(cpus):
+    """CPU 编号集合 -> "0-3,8" 形式的列表字符串"""
+    ranges = []
+    for cpu in sorted(cpus):
+        if ranges and cpu == ranges[-1][1] + 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join(str(start) if start == end else f'{start}-{end}' for start, end in ranges)
 
 
-def set_process_cpu_affinity(pid, cpu_id):
-    result = subprocess.run(["taskset", "-pc", str(cpu_id), str(pid)], capture_output=True, text=True)
-    return result.stdout
+def describe_affinity(cpus):
+    """亲和性的结构化表示：CPU 编号、列表字符串与十六进制掩码"""
+    return dict(cpus=sorted(cpus), list=format_cpu_list(cpus), mask=hex(sum(1 << cpu for cpu in cpus)))
+
+
+def get_online_cpus():
+    try:
+        with open('/sys/devices/system/cpu/online') as f:
+            return parse_cpu_list(f.read())
+    except OSError:
+        return set(range(os.cpu_count() or 1))
+
+
+def get_numa_nodes():
+    """返回 {节点编号: CPU编号集合}，系统没有 NUMA 信息时所有在线 CPU 视为节点 0"""
+    base = '/sys/devices/system/node'
+    nodes = {}
+    try:
+        for name in os.listdir(base):
+            if name.startswith('node') and name[4:].isdigit():
+                with open(os.path.join(base, name, 'cpulist')) as f:
+                    cpus = parse_cpu_list(f.read())
+                if cpus:
+                    nodes[int(name[4:])] = cpus
+    except OSError:
+        pass
+    return nodes or {0: get_online_cpus()}
+
+
+def process_tree_pids(pid):
+    root = psutil.Process(int(pid))
+    return [root.pid] + [child.pid for child in root.children(recursive=True)]
+
+
+def cgroup_pids(cgroup):
+    """读取 cgroup 中的进程，cgroup 为 /sys/fs/cgroup 下的路径；cgroup v1 时在 cpuset 层级下查找"""
+    relative = cgroup[len(CGROUP_ROOT):] if cgroup.startswith(CGROUP_ROOT) else cgroup
+    for base in (CGROUP_ROOT, os.path.join(CGROUP_ROOT, 'cpuset')):
+        path = os.path.normpath(os.path.join(base, relative.lstrip('/')))
+        if not path.startswith(CGROUP_ROOT):
+            raise ValueError(f"无效的 cgroup 路径: {cgroup}")
+        procs = os.path.join(path, 'cgroup.procs')
+        if os.path.isfile(procs):
+            with open(procs) as f:
+                return [int(line) for line in f if line.strip()]
+    raise ValueError(f"cgroup 不存在: {cgroup}")
+
+
+def resolve_affinity_targets(pid=None, pids=None, tree=None, cgroup=None):
+    """合并单个进程、进程列表、进程树和 cgroup 指定的进程，去重并保持顺序"""
+    targets = []
+    if pid is not None:
+        targets.append(int(pid))
+    targets.extend(int(value) for value in pids or [])
+    if tree is not None:
+        targets.extend(process_tree_pids(tree))
+    if cgroup:
+        targets.extend(cgroup_pids(cgroup))
+    return list(dict.fromkeys(targets))
+
+
+def plan_affinity(pids, cpus, policy=None):
+    """
+    为每个进程分配 CPU 集合。不指定策略时所有进程绑定到 cpus；
+    spread/pack 为每个进程分配 cpus 中的一个 CPU：spread 轮流使用各 NUMA 节点，pack 用满一个节点再用下一个。
+    """
+    if not policy:
+        return {pid: set(cpus) for pid in pids}
+    if policy not in AFFINITY_POLICIES:
+        raise ValueError(f"未知的亲和性策略: {policy}")
+    nodes = [sorted(node & cpus) for _, node in sorted(get_numa_nodes().items())]
+    nodes = [node for node in nodes if node] or [sorted(cpus)]
+    if policy == 'pack':
+        order = [cpu for node in nodes for cpu in node]
+    else:
+        order = [cpu for _, _, cpu in sorted((index, n, cpu) for n, node in enumerate(nodes)
+                                             for index, cpu in enumerate(node))]
+    return {pid: {order[i % len(order)]} for i, pid in enumerate(pids)}
+
+
+def get_process_cpu_affinity(pid):
+    return dict(pid=int(pid), **describe_affinity(os.sched_getaffinity(int(pid))))
+
+
+def set_process_cpu_affinity(pid, cpus, threads=True):
+    """设置进程的 CPU 亲和性，threads 为真时同时设置其全部线程，返回设置前后的亲和性"""
+    before = os.sched_getaffinity(pid)
+    tids = [pid]
+    if threads:
+        try:
+            tids = [int(tid) for tid in os.listdir(f'/proc/{pid}/task')]
+        except OSError:
+            pass
+    for tid in tids:
+        try:
+            os.sched_setaffinity(tid, cpus)
+        except ProcessLookupError:
+            # 线程已退出
+            if tid == pid:
+                raise
+    return dict(get_process_cpu_affinity(pid), before=format_cpu_list(before))
+
+
+def apply_cpu_affinity(plan, threads=True):
+    """按 {pid: CPU编号集合} 批量设置亲和性，单个进程失败不影响其余进程"""
+    results = []
+    for pid, assigned in plan.items():
+        try:
+            results.append(dict(set_process_cpu_affinity(pid, assigned, threads), ok=True))
+        except OSError as e:
+            results.append(dict(pid=pid, ok=False, error=str(e)))
+    applied = sum(1 for result in results if result['ok'])
+    return dict(results=results, applied=applied, failed=len(results) - applied)
+
+
+def read_sys_value(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return default
+
+
+def get_cpu_topology():
+    """读取 /sys/devices/system 中每个在线 CPU 所在的插槽、物理核、SMT 兄弟线程与 NUMA 节点"""
+    node_of = {cpu: node for node, cpus in get_numa_nodes().items() for cpu in cpus}
+    topology = []
+    for cpu in sorted(get_online_cpus()):
+        base = f'/sys/devices/system/cpu/cpu{cpu}/topology'
+        siblings = read_sys_value(f'{base}/thread_siblings_list', str(cpu))
+        topology.append(dict(cpu=cpu, socket=int(read_sys_value(f'{base}/physical_package_id', 0)),
+                             core=int(read_sys_value(f'{base}/core_id', cpu)), node=node_of.get(cpu, 0),
+                             siblings=sorted(parse_cpu_list(siblings))))
+    return topology
+
+
+def get_process_numa_pages(pid):
+    """从 /proc/[pid]/numa_maps 统计进程在各 NUMA 节点上的内存页数"""
+    pages = {}
+    try:
+        with open(f'/proc/{pid}/numa_maps') as f:
+            for line in f:
+                for token in line.split()[2:]:
+                    if token.startswith('N') and '=' in token:
+                        node, count = token[1:].split('=', 1)
+                        if node.isdigit():
+                            pages[int(node)] = pages.get(int(node), 0) + int(count)
+    except (OSError, ValueError):
+        pass
+    return pages
 
 
 def check_and_fix_su_permissions():
@@ -326,33 +1070,101 @@ def check_and_fix_su_permissions():
         }
 
 
-# 运行Ceph命令并返回结果
-def run_ceph_command(command, cluster_ip=None):
-    # cmd = ['ceph', '-m', cluster_ip] + command if cluster_ip else ['ceph'] + command
-    cmd = ['ssh', f'root@{cluster_ip}', 'docker', 'exec'] + command if cluster_ip else ['ceph'] + command
-    print(cmd)
+# Ceph 采集：ceph 命令的超时（秒）、每个集群结果的缓存时间（秒）、每个集群保留的历史采样点数
+CEPH_COMMAND_TIMEOUT = float(os.environ.get('KYLIN_AGENT_CEPH_TIMEOUT', 30))
+CEPH_CACHE_TTL = float(os.environ.get('KYLIN_AGENT_CEPH_TTL', 10))
+CEPH_HISTORY_SIZE = int(os.environ.get('KYLIN_AGENT_CEPH_HISTORY', 360))
+# 远程集群通过 ssh 登录 monitor 节点后在该容器内执行 ceph，容器名为空时直接执行 ceph
+CEPH_SSH_USER = os.environ.get('KYLIN_AGENT_CEPH_SSH_USER', 'root')
+CEPH_CONTAINER = os.environ.get('KYLIN_AGENT_CEPH_CONTAINER', 'mon')
+# 同一集群的 ssh 会话复用一个控制连接，空闲 CEPH_SSH_PERSIST 秒后关闭
+CEPH_SSH_CONTROL_PATH = os.environ.get('KYLIN_AGENT_CEPH_CONTROL_PATH', '/tmp/kylin-ceph-%r@%h:%p')
+CEPH_SSH_PERSIST = 300
+# 替代 ceph 的本地程序（如测试用的模拟脚本），设置后忽略 ssh 与容器配置
+CEPH_COMMAND = os.environ.get('KYLIN_AGENT_CEPH_COMMAND', '')
+# 采集的 ceph 子命令，均以 JSON 格式输出
+CEPH_SECTIONS = {
+    'status': ['status'],
+    'osd_tree': ['osd', 'tree'],
+    'osd_perf': ['osd', 'perf'],
+    'df': ['df'],
+}
+
+
+def ceph_argv(args, cluster_ip=None):
+    """执行 ceph 子命令的参数列表：本机直接执行，指定集群时经 ssh 控制连接在 monitor 容器内执行"""
+    args = list(args) + ['--format', 'json']
+    if CEPH_COMMAND:
+        return shlex.split(CEPH_COMMAND) + args
+    if not cluster_ip:
+        return ['ceph'] + args
+    ceph = (['docker', 'exec', CEPH_CONTAINER] if CEPH_CONTAINER else []) + ['ceph'] + args
+    return ['ssh', '-o', 'BatchMode=yes', '-o', 'ControlMaster=auto', '-o', f'ControlPath={CEPH_SSH_CONTROL_PATH}',
+            '-o', f'ControlPersist={CEPH_SSH_PERSIST}', f'{CEPH_SSH_USER}@{cluster_ip}', '--'] + ceph
+
+
+# 运行Ceph命令并返回解析后的 JSON
+def run_ceph_command(args, cluster_ip=None):
+    cmd = ceph_argv(args, cluster_ip)
     try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True, text=True)
-        return result.stdout
-    except subprocess.CalledProcessError as e:
-        logging.error(f"运行命令出错 {cmd}: {e.stderr}")
-        return None
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                timeout=CEPH_COMMAND_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(f"{' '.join(args)} 执行超时")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"{' '.join(args)} 退出码 {result.returncode}")
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        raise RuntimeError(f"{' '.join(args)} 的输出不是 JSON")
+
+
+def ceph_health(status):
+    health = status.get('health', {})
+    # Luminous 之前为 overall_status
+    return health.get('status') or health.get('overall_status')
+
+
+def ceph_osdmap(status):
+    osdmap = status.get('osdmap', {})
+    # Nautilus 之前多一层 osdmap
+    osdmap = osdmap.get('osdmap', osdmap)
+    return {key: osdmap.get(key) for key in ('num_osds', 'num_up_osds', 'num_in_osds')}
 
 
-# , '--format', 'json' json.loads(mon_output)
-def get_cluster_status(cluster_ip=None):
-    status_output = run_ceph_command(['mon', 'ceph', 'status'], cluster_ip)
-    return status_output if status_output else None
+def ceph_pg_states(status):
+    """各 PG 状态的数量，如 {'active+clean': 128}"""
+    return {item['state_name']: item['count'] for item in status.get('pgmap', {}).get('pgs_by_state', [])}
 
 
-def get_osd_status(cluster_ip=None):
-    osd_output = run_ceph_command(['mon', 'ceph', 'osd', 'tree'], cluster_ip)
-    return osd_output if osd_output else None
+def ceph_osd_latency(perf):
+    """每个 OSD 的提交/应用延迟（毫秒），兼容 Luminous 前后两种输出结构"""
+    infos = perf.get('osdstats', perf).get('osd_perf_infos', [])
+    return {str(info['id']): {'commit_ms': info['perf_stats']['commit_latency_ms'],
+                              'apply_ms': info['perf_stats']['apply_latency_ms']} for info in infos}
 
 
-def get_mon_status(cluster_ip=None):
-    mon_output = run_ceph_command(['mon', 'ceph', '-s'], cluster_ip)
-    return mon_output if mon_output else None
+def ceph_osds(tree):
+    """osd tree 中的 OSD 列表，附带所在主机"""
+    nodes = tree.get('nodes', [])
+    host_of = {child: node['name'] for node in nodes if node.get('type') == 'host' for child in node.get('children', [])}
+    return [dict(id=node['id'], name=node['name'], host=host_of.get(node['id']), status=node.get('status'),
+                 reweight=node.get('reweight'), crush_weight=node.get('crush_weight'))
+            for node in nodes if node.get('type') == 'osd']
+
+
+def ceph_df(df):
+    """集群与各存储池的容量（字节）"""
+    stats = df.get('stats', {})
+    return dict(
+        total_bytes=stats.get('total_bytes'),
+        used_bytes=stats.get('total_used_raw_bytes', stats.get('total_used_bytes')),
+        avail_bytes=stats.get('total_avail_bytes'),
+        pools=[dict(name=pool['name'], id=pool['id'], stored=pool['stats'].get('stored', pool['stats'].get('bytes_used')),
+                    objects=pool['stats'].get('objects'), max_avail=pool['stats'].get('max_avail'),
+                    percent_used=pool['stats'].get('percent_used'))
+               for pool in df.get('pools', [])],
+    )
 
 
 def Resolve_system_jam():
@@ -375,399 +1187,944 @@ def Solve_auditd_hight_memory():
         return None
 
 
-# 处理输入命令并返回结果
-def handle_command(command, cluster_ip=None, pid=None, cpu_id=None):
-    print(f"进入handle_command，收到命令: {repr(command)}")
-    print(f"命令类型: {type(command)}")
-    print(f"命令长度: {len(command) if command else 0}")
-    print(f"命令去除空格后: {repr(command.strip()) if command else 'None'}")
+# 子进程类命令的默认超时（秒）
+AGENT_COMMAND_TIMEOUT = float(os.environ.get('KYLIN_AGENT_COMMAND_TIMEOUT', 600))
+# 只读命令结果的默认缓存时间（秒），0 表示不缓存
+AGENT_CACHE_TTL = float(os.environ.get('KYLIN_AGENT_CACHE_TTL', 5))
+# 按命令覆盖缓存时间，格式 "命令名=秒数;命令名=秒数"，如 "lscpu=600;df -h=0"
+AGENT_CACHE_TTL_OVERRIDES = {
+    name.strip(): float(ttl)
+    for name, _, ttl in (item.partition('=') for item in os.environ.get('KYLIN_AGENT_CACHE_TTLS', '').split(';'))
+    if name.strip() and ttl.strip()
+}
+# 后台作业：作业线程数、同一命令同时运行的默认上限、结束后结果的保留时间（秒）与保留的作业数上限
+AGENT_JOB_WORKERS = int(os.environ.get('KYLIN_AGENT_JOB_WORKERS', 4))
+AGENT_JOB_LIMIT = int(os.environ.get('KYLIN_AGENT_JOB_LIMIT', 2))
+AGENT_JOB_RESULT_TTL = float(os.environ.get('KYLIN_AGENT_JOB_TTL', 600))
+AGENT_JOB_MAX_ENTRIES = 256
+
+
+class CommandCache:
+    """
+    只读命令的 TTL 缓存。同一键的并发请求合并为一次执行，其余调用方等待同一结果；
+    执行抛出的异常会传给所有等待者，但不会被缓存。
+    clear() 使代数加一，清空前开始执行的结果仍返回给调用方，但不写入缓存，避免写命令之后读到旧状态。
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = {}  # 键 -> (过期时间, 结果)
+        self.inflight = {}  # 键 -> 正在执行的 Future
+        self.generation = 0
+
+    def get_or_compute(self, key, ttl, func):
+        with self.lock:
+            cached = self.entries.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                return cached[1]
+            future = self.inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self.inflight[key] = Future()
+                generation = self.generation
+        if not owner:
+            return future.result()
+        try:
+            value = func()
+        except BaseException as e:
+            with self.lock:
+                if self.inflight.get(key) is future:
+                    self.inflight.pop(key)
+            future.set_exception(e)
+            raise
+        with self.lock:
+            if self.inflight.get(key) is future:
+                self.inflight.pop(key)
+            if generation == self.generation:
+                if len(self.entries) >= self.max_entries:
+                    self._evict()
+                self.entries[key] = (time.monotonic() + ttl, value)
+        future.set_result(value)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            # 正在执行的计算可能读到写命令之前的状态，之后的请求不再与其合并
+            self.inflight.clear()
+            self.generation += 1
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [key for key, (expires, _) in self.entries.items() if expires <= now]:
+            del self.entries[key]
+        # 仍然超出上限时丢弃最早写入的一半
+        if len(self.entries) >= self.max_entries:
+            for key in list(self.entries)[:len(self.entries) // 2]:
+                del self.entries[key]
+
+
+command_cache = CommandCache()
+
+
+class CommandError(Exception):
+    """命令处理函数报告的错误：同步调用时作为响应文本返回，后台作业据此标记为失败，且不写入命令缓存"""
+
+
+class AgentCommand:
+    """
+    命令注册表中的一项。
+
+    handler 为处理函数，接收 (命令参数字符串, **请求参数)；argv 不为空时依次执行这些预先拆分好的命令行。
+    timeout: 子进程超时（秒），None 表示不限制
+    idempotent: 重复执行没有额外副作用，失败后可以安全重试
+    cacheable: 只读命令，结果在 ttl 秒内复用，并发的相同请求只执行一次
+    ttl: 缓存时间（秒），None 时使用 AGENT_CACHE_TTL，可由 KYLIN_AGENT_CACHE_TTLS 按命令覆盖
+    inline: 轻量命令，asyncio 模式下直接在事件循环中执行
+    read_only: 不改变系统状态但不使用本缓存的命令（如自带缓存），执行后不清空命令缓存
+    message: 命令行没有输出时返回的提示
+    job_limit: 作为后台作业提交时同时运行的上限，None 时使用 AGENT_JOB_LIMIT
+    """
+
+    __slots__ = ('name', 'handler', 'argv', 'timeout', 'idempotent', 'cacheable', 'ttl', 'inline', 'read_only',
+                 'message', 'job_limit')
+
+    def __init__(self, name, handler=None, argv=(), timeout=AGENT_COMMAND_TIMEOUT, idempotent=False,
+                 cacheable=False, ttl=None, inline=False, read_only=False, message=None, job_limit=None):
+        self.name = name
+        self.handler = handler
+        self.argv = argv
+        self.timeout = timeout
+        self.idempotent = idempotent
+        self.cacheable = cacheable
+        self.ttl = ttl
+        self.inline = inline
+        self.read_only = read_only
+        self.message = message
+        self.job_limit = job_limit
+
+    def cache_ttl(self):
+        if not self.cacheable:
+            return 0
+        ttl = self.ttl if self.ttl is not None else AGENT_CACHE_TTL
+        return AGENT_CACHE_TTL_OVERRIDES.get(self.name, ttl)
+
+    def is_read_only(self):
+        return self.read_only or self.cacheable or self.inline
+
+    def run(self, args='', **params):
+        if self.handler is not None:
+            return self.handler(args, **params)
+        output = ''
+        for cmd in self.argv:
+            try:
+                result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                        timeout=self.timeout)
+                output += result.stdout + '\n'
+            except Exception as e:
+                output += f'执行{cmd}出错: {e}\n'
+        if self.message is not None and not output.strip():
+            return self.message
+        return output
+
+
+# 命令注册表：规范化后的命令名 -> AgentCommand，一次哈希查找完成分发
+COMMAND_REGISTRY = {}
+# 命令名后带参数的命令，精确匹配失败后按注册顺序做前缀匹配
+COMMAND_PREFIX_REGISTRY = []
+
+
+# 规范化命令名：去掉首尾空白与 "command:" 前缀，带不带前缀的同一命令对应同一处理函数
+def normalize_command(command):
+    name = command.strip()
+    if name.startswith('command:'):
+        name = name[len('command:'):].strip()
+    return name
+
+
+# 注册命令处理函数的装饰器，一个处理函数可以对应多个命令名
+def register_command(*names, prefix=False, **options):
+    def decorator(func):
+        for name in names:
+            entry = AgentCommand(name, handler=func, **options)
+            if prefix:
+                COMMAND_PREFIX_REGISTRY.append(entry)
+            else:
+                COMMAND_REGISTRY[name] = entry
+        return func
+    return decorator
+
+
+# 注册依次执行若干固定命令行的命令，命令行在注册时即拆分为参数列表
+def register_argv_command(name, *argv, **options):
+    COMMAND_REGISTRY[name] = AgentCommand(name, argv=argv, **options)
+
+
+# 查找命令，返回 (AgentCommand 或 None, 命令参数字符串)；未注册的命令返回规范化后的命令名作为参数。
+# 前缀命令要求命令名完全相同或其后紧跟空白，如 get_biotop 不匹配 get_biotopXYZ
+def find_command(command):
+    name = normalize_command(command)
+    entry = COMMAND_REGISTRY.get(name)
+    if entry is not None:
+        return entry, ''
+    for entry in COMMAND_PREFIX_REGISTRY:
+        if name == entry.name or (name.startswith(entry.name) and name[len(entry.name)].isspace()):
+            return entry, name[len(entry.name):].strip()
+    return None, name
+
+
+# 固定命令行，支持直接输入完整命令
+register_argv_command('sudo firewall-cmd --state', ['sudo', 'firewall-cmd', '--state'],
+                      ['sudo', 'systemctl', 'status', 'firewalld'], idempotent=True, cacheable=True)
+register_argv_command('sudo systemctl start firewalld', ['sudo', 'systemctl', 'start', 'firewalld'], idempotent=True)
+register_argv_command('sudo systemctl stop firewalld', ['sudo', 'systemctl', 'stop', 'firewalld'], idempotent=True)
+register_argv_command('sudo tune2fs -o journal_data_writeback /dev/sda1 && sudo mount -o remount /dev/sda1',
+                      ['sudo', 'tune2fs', '-o', 'journal_data_writeback', '/dev/sda1'],
+                      ['sudo', 'mount', '-o', 'remount', '/dev/sda1'], idempotent=True)
+register_argv_command('sudo systemctl stop ntpd', ['sudo', 'systemctl', 'stop', 'ntpd'],
+                      ['sudo', 'systemctl', 'stop', 'chronyd'], idempotent=True)
+register_argv_command('timedatectl status', ['timedatectl', 'status'], ['ntpq', '-p'], idempotent=True, cacheable=True,
+                      ttl=10)
+register_argv_command('sudo systemctl start ntpd', ['sudo', 'systemctl', 'start', 'ntpd'],
+                      ['sudo', 'systemctl', 'start', 'chronyd'], idempotent=True)
+register_argv_command('sudo sysctl -w net.ipv4.tcp_syncookies=1', ['sudo', 'sysctl', '-w', 'net.ipv4.tcp_syncookies=1'],
+                      idempotent=True)
+register_argv_command('mysqldump -u root -p yourpassword aa > aa_backup.sql', ['mysqldump', '-u', 'root', '-pyourpassword', 'aa'],
+                      read_only=True)
+register_argv_command('mysql -e "SET GLOBAL query_cache_size = 1048576;"',
+                      ['mysql', '-e', 'SET GLOBAL query_cache_size = 1048576;'], idempotent=True)
+register_argv_command('timedatectl', ['timedatectl'], idempotent=True, cacheable=True, ttl=10)
+register_argv_command('sudo timedatectl set-ntp true', ['sudo', 'timedatectl', 'set-ntp', 'true'],
+                      ['sudo', 'systemctl', 'restart', 'ntpd'])
+register_argv_command('who', ['who'], ['w'], idempotent=True, cacheable=True)
+register_argv_command('sudo sync && sudo sysctl -w vm.drop_caches=3', ['sudo', 'sync'],
+                      ['sudo', 'sysctl', '-w', 'vm.drop_caches=3'], idempotent=True)
+register_argv_command('df -h', ['df', '-h'], idempotent=True, cacheable=True, ttl=30)
+register_argv_command('sudo systemctl restart nginx', ['sudo', 'systemctl', 'restart', 'nginx'])
+register_argv_command('dmesg', ['dmesg'], idempotent=True, cacheable=True)
+register_argv_command('uptime', ['uptime'], ['top'], idempotent=True, cacheable=True)
+register_argv_command('free -h', ['free', '-h'], ['top'], idempotent=True, cacheable=True)
+# CPU 硬件信息不会变化，缓存较长时间
+register_argv_command('lscpu', ['lscpu'], ['cat', '/proc/cpuinfo'], idempotent=True, cacheable=True, ttl=3600)
+register_argv_command('sudo reboot', ['sudo', 'reboot'])
+register_argv_command('sudo systemctl restart mysqld', ['sudo', 'systemctl', 'restart', 'mysqld'], ['mysql'])
+# ping 不带 -c 时不会退出，依赖超时结束
+register_argv_command('ping 127.0.0.1', ['ping', '127.0.0.1'], timeout=10, idempotent=True, cacheable=True)
+register_argv_command('curl -I http://127.0.0.1', ['curl', '-I', 'http://127.0.0.1'], idempotent=True, cacheable=True)
+register_argv_command('sudo lsof -i :80', ['sudo', 'lsof', '-i', ':80'], ['sudo', 'netstat', '-tulnp'],
+                      idempotent=True, cacheable=True)
+register_argv_command('sudo kill -9 $(lsof -t -i:80)', ['sudo', 'kill', '-9', '$(lsof -t -i:80)'])
+register_argv_command('netstat -an', ['netstat', '-an'], idempotent=True, cacheable=True)
+register_argv_command('sudo systemctl restart docker', ['sudo', 'systemctl', 'restart', 'docker'])
+register_argv_command('journalctl -k', ['journalctl', '-k'], idempotent=True, cacheable=True)
+register_argv_command('ps -eo pid,psr,comm', ['ps', '-eo', 'pid,psr,comm'], idempotent=True, cacheable=True)
+register_argv_command('ps aux', ['ps', 'aux'], idempotent=True, cacheable=True)
+register_argv_command('top -b -n 1 > system_status.txt && dmesg > dmesg.log && free -h > memory.log',
+                      ['top', '-b', '-n', '1'], ['dmesg'], ['free', '-h'], idempotent=True, cacheable=True)
+
+# 调优策略中使用的中文命令
+register_argv_command('查看防火墙', ['systemctl', 'status', 'firewalld'], idempotent=True, cacheable=True)
+register_argv_command('开启防火墙', ['sudo', 'systemctl', 'start', 'firewalld'], idempotent=True)
+register_argv_command('关闭防火墙', ['sudo', 'systemctl', 'stop', 'firewalld'], idempotent=True)
+register_argv_command('关闭NTP同步服务器', ['sudo', 'systemctl', 'stop', 'ntpd'], idempotent=True)
+register_argv_command('查看NTP同步服务器', ['sudo', 'systemctl', 'status', 'ntpd'], idempotent=True, cacheable=True)
+register_argv_command('开启NTP同步服务器', ['sudo', 'systemctl', 'start', 'ntpd'], idempotent=True)
+register_argv_command('优化文件系统', ['sudo', 'tune2fs', '-o', 'journal_data_writeback', '/dev/sda1'], idempotent=True)
+register_argv_command('查看时间同步', ['chronyc', 'sources', '-v'], idempotent=True, cacheable=True)
+register_argv_command('启用SYN Cookie', ['sudo', 'sysctl', '-w', 'net.ipv4.tcp_syncookies=1'], idempotent=True)
+register_argv_command('查看当前登录用户', ['who'], idempotent=True, cacheable=True)
+register_argv_command('查看磁盘使用情况', ['df', '-h'], idempotent=True, cacheable=True, ttl=30)
+register_argv_command('重启Nginx服务', ['sudo', 'systemctl', 'restart', 'nginx'], message="Nginx 服务已重启")
+register_argv_command('检查系统内核日志', ['dmesg'], idempotent=True, cacheable=True)
+register_argv_command('查看系统负载', ['uptime'], idempotent=True, cacheable=True)
+register_argv_command('查看内存使用情况', ['free', '-h'], idempotent=True, cacheable=True)
+register_argv_command('查看CPU信息', ['lscpu'], idempotent=True, cacheable=True, ttl=3600)
+register_argv_command('重启服务器', ['sudo', 'reboot'], message="服务器重启命令已发送")
+register_argv_command('重启MySQL服务', ['sudo', 'systemctl', 'restart', 'mysqld'], message="MySQL 服务已重启")
+register_argv_command('检测网络连接状态', ['ping', '-c', '4', 'baidu.com'], idempotent=True, cacheable=True)
+register_argv_command('查看端口占用情况', ['sudo', 'lsof', '-i', '-P', '-n'], idempotent=True, cacheable=True)
+register_argv_command('终止占用端口的进程', ['sudo', 'fuser', '-k', '端口号/tcp'], message="占用端口的进程已终止")
+register_argv_command('查看活跃连接数', ['netstat', '-an'], idempotent=True, cacheable=True)
+register_argv_command('重启Docker服务', ['sudo', 'systemctl', 'restart', 'docker'], message="Docker 服务已重启")
+register_argv_command('查看内核日志', ['journalctl', '-k', '--no-pager'], idempotent=True, cacheable=True)
+register_argv_command('检查CPU绑定情况', ['ps', '-eo', 'pid,psr,comm'], idempotent=True, cacheable=True)
+register_argv_command('查看运行进程', ['ps', 'aux'], idempotent=True, cacheable=True)
+
+
+# 采样线程已经保存了最新数据，get_info 本身不缓存；静态的 os 子系统在 MONITOR_COLLECTORS 中缓存
+@register_command('get_info', idempotent=True, inline=True)
+def command_get_info(args, subsystems=None, **params):
+    return {"os_information": gather_monitor_data(subsystems)}
+
+
+# 连接池健康检查
+@register_command('ping', idempotent=True, inline=True)
+def command_ping(args, **params):
+    return 'pong'
+
+
+# 后台采样线程环形缓冲区中的历史采样点
+@register_command('get_samples', idempotent=True, inline=True)
+def command_get_samples(args, **params):
+    metric_sampler.ensure_started()
+    return metric_sampler.history()
+
+
+@register_command('slove_su')
+def command_slove_su(args, **params):
+    return check_and_fix_su_permissions()
+
+
+@register_command('slove_system_jam', idempotent=True)
+def command_slove_system_jam(args, **params):
+    subprocess.run(['sync'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    subprocess.run(['bash', '-c', 'echo 3 > /proc/sys/vm/drop_caches'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return "已尝试释放缓存，建议检查高负载进程"
+
+
+@register_command('清理系统缓存', idempotent=True)
+def command_drop_caches(args, **params):
+    subprocess.run(['sync'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    subprocess.run(['bash', '-c', 'echo 3 > /proc/sys/vm/drop_caches'], stdout=subprocess.PIPE,
+                   stderr=subprocess.PIPE, text=True)
+    return "系统缓存已清理"
+
+
+@register_command('slove_auditd', idempotent=True)
+def command_slove_auditd(args, **params):
+    Solve_auditd_hight_memory()
+    return '解决银河麒麟V10 SP3 审计工具 auditd 引发的内存占用过高'
+
+
+# 查询进程的 CPU 亲和性，可用 pid、pids、tree（进程树根）、cgroup 指定一批进程
+@register_command('get_cpuhe', idempotent=True, cacheable=True)
+def command_get_cpuhe(args, pid=None, pids=None, tree=None, cgroup=None, **params):
     try:
-        # 指令映射表，支持直接输入完整命令
-        COMMAND_MAP = {
-            'command:sudo firewall-cmd --state': [['sudo', 'firewall-cmd', '--state'], ['sudo', 'systemctl', 'status', 'firewalld']],
-            'command:sudo systemctl start firewalld': [['sudo', 'systemctl', 'start', 'firewalld']],
-            'command:sudo systemctl stop firewalld': [['sudo', 'systemctl', 'stop', 'firewalld']],
-            'command:sudo tune2fs -o journal_data_writeback /dev/sda1 && sudo mount -o remount /dev/sda1': [
-                ['sudo', 'tune2fs', '-o', 'journal_data_writeback', '/dev/sda1'],
-                ['sudo', 'mount', '-o', 'remount', '/dev/sda1']
-            ],
-            'command:sudo systemctl stop ntpd': [['sudo', 'systemctl', 'stop', 'ntpd'], ['sudo', 'systemctl', 'stop', 'chronyd']],
-            'command:timedatectl status': [['timedatectl', 'status'], ['ntpq', '-p']],
-            'command:sudo systemctl start ntpd': [['sudo', 'systemctl', 'start', 'ntpd'], ['sudo', 'systemctl', 'start', 'chronyd']],
-            'command:sudo sysctl -w net.ipv4.tcp_syncookies=1': [['sudo', 'sysctl', '-w', 'net.ipv4.tcp_syncookies=1']],
-            'command:mysqldump -u root -p yourpassword aa > aa_backup.sql': [['mysqldump', '-u', 'root', '-pyourpassword', 'aa']],
-            'command:mysql -e "SET GLOBAL query_cache_size = 1048576;"': [['mysql', '-e', 'SET GLOBAL query_cache_size = 1048576;']],
-            'command:timedatectl': [['timedatectl']],
-            'command:sudo timedatectl set-ntp true': [['sudo', 'timedatectl', 'set-ntp', 'true'], ['sudo', 'systemctl', 'restart', 'ntpd']],
-            'command:who': [['who'], ['w']],
-            'command:sudo sync && sudo sysctl -w vm.drop_caches=3': [['sudo', 'sync'], ['sudo', 'sysctl', '-w', 'vm.drop_caches=3']],
-            'command:df -h': [['df', '-h']],
-            'command:sudo systemctl restart nginx': [['sudo', 'systemctl', 'restart', 'nginx']],
-            'command:dmesg': [['dmesg']],
-            'command:uptime': [['uptime'], ['top']],
-            'command:free -h': [['free', '-h'], ['top']],
-            'command:lscpu': [['lscpu'], ['cat', '/proc/cpuinfo']],
-            'command:sudo reboot': [['sudo', 'reboot']],
-            'command:sudo systemctl restart mysqld': [['sudo', 'systemctl', 'restart', 'mysqld'], ['mysql']],
-            'command:ping 127.0.0.1': [['ping', '127.0.0.1']],
-            'command:curl -I http://127.0.0.1': [['curl', '-I', 'http://127.0.0.1']],
-            'command:sudo lsof -i :80': [['sudo', 'lsof', '-i', ':80'], ['sudo', 'netstat', '-tulnp']],
-            'command:sudo kill -9 $(lsof -t -i:80)': [['sudo', 'kill', '-9', '$(lsof -t -i:80)']],
-            'command:netstat -an': [['netstat', '-an']],
-            'command:sudo systemctl restart docker': [['sudo', 'systemctl', 'restart', 'docker']],
-            'command:journalctl -k': [['journalctl', '-k']],
-            'command:ps -eo pid,psr,comm': [['ps', '-eo', 'pid,psr,comm']],
-            'command:ps aux': [['ps', 'aux']],
-            'command:top -b -n 1 > system_status.txt && dmesg > dmesg.log && free -h > memory.log': [
-                ['top', '-b', '-n', '1'],
-                ['dmesg'],
-                ['free', '-h']
-            ],
-        }
-        cmd_key = command.strip()
-        if not cmd_key.startswith("command:"):
-            cmd_key = "command:" + cmd_key
-        cmd_key = cmd_key.strip()
-        print(f"收到的cmd_key: [{cmd_key}], 长度: {len(cmd_key)}")
-        for k in COMMAND_MAP.keys():
-            print(f"可匹配key: [{k}], 长度: {len(k)}")
-        # 匹配时也strip key
-        match_key = None
-        for k in COMMAND_MAP.keys():
-            if cmd_key == k.strip():
-                match_key = k
-                break
-        if match_key:
-            output = ''
-            for cmd in COMMAND_MAP[match_key]:
-                try:
-                    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    output += result.stdout + '\n'
-                except Exception as e:
-                    output += f'执行{cmd}出错: {e}\n'
-            return output
-        # 自定义函数分支
-        elif cmd_key == 'command:slove_su' or cmd_key == 'slove_su':
-            return check_and_fix_su_permissions()
-        elif cmd_key == 'command:slove_system_jam' or cmd_key == 'slove_system_jam':
-            subprocess.run(['sync'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            subprocess.run(['bash', '-c', 'echo 3 > /proc/sys/vm/drop_caches'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return "已尝试释放缓存，建议检查高负载进程"
-        elif command.strip() == 'get_info':
-            data = {
-                "os_information": gather_monitor_data()
-            }
-            return data
-        elif command.strip() == 'slove_su':
-            data = check_and_fix_su_permissions()
-            return data
-        elif command.strip() == 'slove_system_jam':
-            data = '优化银河麒麟V10 SP3 系统卡顿未响应'
-            Resolve_system_jam()
-            return data
-        elif command.strip() == 'slove_auditd':
-            data = '解决银河麒麟V10 SP3 审计工具 auditd 引发的内存占用过高'
-            solve_auditd_hight_memory()
-            return data
-        elif command.strip() == 'get_cpuhe':
-            data = get_process_cpu_affinity(pid)
-            return data
-        elif command.strip() == 'set_cpu_affinity' and pid is not None:
-            # 示例：将进程迁移到指定的 CPU 核心上
-            # 假设目标 CPU 核编号为 0
-            data = set_process_cpu_affinity(pid, cpu_id)
-            return data
-        elif command.strip() == 'get_ps':
-            input_string = get_ps()
-            # 创建一个空字典，用于存储每一行的数据
-            data = {
-                'CPU核心': [],
-                '进程号': [],
-                '启动命令': []
-            }
-
-            # 分割字符串为多行
-            lines = input_string.strip().split('\n')[1:]  # 跳过第一行标题
-            # 遍历每一行数据
-            for line in lines:
-                # 去除行首的空白字符
-                line = line.lstrip()
-                # 分割行数据
-                parts = line.split(maxsplit=2)
-                if len(parts) == 3:
-                    cpu_core, pid, command = parts
-                    # 将数据存储到字典中
-                    data['CPU核心'].append(int(cpu_core))
-                    data['进程号'].append(int(pid))
-                    data['启动命令'].append(command)
-
-            return data
-        elif command.strip() == 'get_top':
-            input_string = run_top()
-            # 初始化存储数据的字典
-            process_data = {}
-
-            # 使用正则表达式匹配进程信息的行
-            pattern = re.compile(
-                r'^\s*(\d+)\s+(\S+)\s+(\S+)\s+(\S+)\s+(\d+K?)\s+(\d+K?)\s+(\d+K?)\s+(\S+)\s+(\d+\.\d+)\s+(\d+\.\d+)\s+(\S+)\s+(.+)$')
-
-            # 逐行解析 top 输出
-            for line in input_string.splitlines():
-                match = pattern.match(line)
-                if match:
-                    pid = match.group(1)
-                    process_data[pid] = {
-                        "PID": pid,
-                        "USER": match.group(2),
-                        "PR": match.group(3),
-                        "NI": match.group(4),
-                        "VIRT": match.group(5),
-                        "RES": match.group(6),
-                        "SHR": match.group(7),
-                        "S": match.group(8),
-                        "%CPU": match.group(9),
-                        "%MEM": match.group(10),
-                        "TIME+": match.group(11),
-                        "COMMAND": match.group(12)
-                    }
-
-            return process_data
-        elif command.startswith('command:get_biotop'):
-            new_multiprocess1 = multiprocessing.Process(target=run_biolatency())
-            new_multiprocess2 = multiprocessing.Process(target=run_dd)
-            new_multiprocess1.start()
-            new_multiprocess2.start()
-            time.sleep(30)
-            with open('/opt/biotop_output.txt', 'r') as f:
-                data = f.read()
-            return data
-        elif command.strip() == 'get_flame_graph':
-            flame_graph_path = generate_flame_graph()
-            with open(flame_graph_path, 'r') as f:
-                data = f.read()
-            return data
-        # elif command.startswith('command:ls '):
-        #     directory = command.split(' ', 1)[1]
-        #     result = subprocess.run(['ls', directory], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        #     return result.stdout
-        elif command.strip() == 'command:查看防火墙':
-            result = subprocess.run(['systemctl', 'status', 'firewalld'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:get_io_stack':
-            # 定义 docker run 命令及其参数
-
-            docker_command = [
-                "docker", "run", "-itd", "--name", "ebpf", "--privileged",
-                "-v", "/lib/modules:/lib/modules:rw",
-                "-v", "/sys:/sys",
-                "-v", "/root:/root",
-                "-v", "/usr/src:/usr/src",
-                "-v", "/etc/localtime:/etc/localtime:rw",
-                "-v", "/usr/src/kernels/:/usr/src/kernels/",
-                '--restart=always',
-                "--pid=host",
-                "ebpf:v1", "python3", "wudipaima.py"
-            ]
-            # 使用 subprocess.run 执行 docker run 命令
+        targets = resolve_affinity_targets(pid, pids, tree, cgroup)
+    except (ValueError, OSError, psutil.Error) as e:
+        return dict(error=str(e))
+    results = []
+    for target in targets:
+        try:
+            results.append(get_process_cpu_affinity(target))
+        except OSError as e:
+            results.append(dict(pid=target, error=str(e)))
+    if pid is not None and len(results) == 1:
+        return results[0]
+    return dict(results=results)
+
+
+# 将进程迁移到指定的 CPU 核心上：目标同 get_cpuhe，CPU 由 cpus（"0-3,8" 或列表）或 cpu_id 指定，
+# policy 为 spread/pack 时按 NUMA 节点为每个进程分配一个 CPU（未指定 cpus 时使用全部在线 CPU）
+# assignments 为 {pid: cpus} 时按其逐个设置（亲和性规划的结果）
+@register_command('set_cpu_affinity', idempotent=True)
+def command_set_cpu_affinity(args, pid=None, pids=None, tree=None, cgroup=None, cpus=None, cpu_id=None,
+                             policy=None, threads=True, assignments=None, **params):
+    try:
+        if assignments:
+            plan = {int(target): parse_cpu_list(value) for target, value in assignments.items()}
+        else:
+            targets = resolve_affinity_targets(pid, pids, tree, cgroup)
+            if cpus is None:
+                cpus = cpu_id
+            if cpus is None and not policy:
+                return '缺少 cpus 参数'
+            if not targets:
+                return '缺少 pid 参数'
+            plan = plan_affinity(targets, parse_cpu_list(cpus) if cpus is not None else get_online_cpus(), policy)
+    except (ValueError, OSError, psutil.Error) as e:
+        return dict(error=str(e))
+    return apply_cpu_affinity(plan, threads)
+
+
+# 亲和性规划所需的数据：CPU 拓扑，以及 CPU 占用最高的 limit 个进程的资源占用、当前亲和性和各 NUMA 节点上的内存页数
+@register_command('get_affinity_profile', idempotent=True, cacheable=True, ttl=2)
+def command_get_affinity_profile(args, limit=16, **params):
+    processes = []
+    for row in process_sampler.top('cpu', int(limit))['processes']:
+        try:
+            affinity = sorted(os.sched_getaffinity(row['PID']))
+        except OSError:
+            # 进程已退出
+            continue
+        processes.append(dict(pid=row['PID'], name=row['COMMAND'], cpu_percent=row['%CPU'], rss=row['RES'],
+                              affinity=affinity, numa_pages=get_process_numa_pages(row['PID'])))
+    return dict(topology=get_cpu_topology(), processes=processes)
+
+
+@register_command('get_ps', idempotent=True, cacheable=True, ttl=2)
+def command_get_ps(args, session=None, version=None, **params):
+    if session:
+        # 增量模式：客户端保存进程表副本，只下发变化的行
+        return process_table_tracker.sync(str(session), version)
+    input_string = get_ps()
+    # 创建一个空字典，用于存储每一行的数据
+    data = {
+        'CPU核心': [],
+        '进程号': [],
+        '启动命令': []
+    }
+
+    # 分割字符串为多行
+    lines = input_string.strip().split('\n')[1:]  # 跳过第一行标题
+    # 遍历每一行数据
+    for line in lines:
+        # 去除行首的空白字符
+        line = line.lstrip()
+        # 分割行数据
+        parts = line.split(maxsplit=2)
+        if len(parts) == 3:
+            cpu_core, pid, command = parts
+            # 将数据存储到字典中
+            data['CPU核心'].append(int(cpu_core))
+            data['进程号'].append(int(pid))
+            data['启动命令'].append(command)
+
+    return data
+
+
+@register_command('get_top', idempotent=True, cacheable=True, ttl=2)
+def command_get_top(args, sort='cpu', limit=None, **params):
+    # 请求可带 sort（cpu/mem）和 limit，只返回排序后的前 limit 个进程
+    try:
+        limit = int(limit) if limit else None
+    except (TypeError, ValueError):
+        return f"无效的 limit: {limit!r}"
+    return process_sampler.top(sort, limit)
+
+
+# 块设备 IO 分析：采样 /proc/diskstats，不再运行 biolatency 和 dd 压测
+@register_command('get_biotop', prefix=True, idempotent=True, cacheable=True, ttl=5, job_limit=2)
+def command_get_biotop(args, duration=IO_SAMPLE_DURATION, interval=IO_SAMPLE_INTERVAL, devices=None, source='proc',
+                       **params):
+    try:
+        duration = min(max(float(duration), 0.1), IO_SAMPLE_MAX_DURATION)
+        interval = min(max(float(interval), 0.01), duration)
+    except (TypeError, ValueError):
+        raise CommandError(f"无效的采样参数: duration={duration!r}, interval={interval!r}")
+    try:
+        devices = parse_block_devices(devices)
+    except ValueError as e:
+        raise CommandError(str(e))
+    try:
+        return sample_block_io(duration, interval, devices, source)
+    except OSError as e:
+        raise CommandError(f"读取块设备统计失败: {e}")
+
+
+# 采样本身需要一分钟，同时打开页面的多个用户共享同一次采样
+# output 为 folded 时返回折叠栈，由服务端按需生成 SVG；否则按旧版返回 flamegraph.pl 生成的 SVG。
+# 折叠栈结果带有本次采样的 sample_id，缓存命中时返回的是同一次采样，服务端据此去重
+@register_command('get_flame_graph', idempotent=True, cacheable=True, ttl=60, job_limit=1)
+def command_get_flame_graph(args, duration=FLAME_GRAPH_DURATION, frequency=FLAME_GRAPH_FREQUENCY, output='svg',
+                            **params):
+    try:
+        duration = min(max(int(duration), 1), FLAME_GRAPH_MAX_DURATION)
+        frequency = max(int(frequency), 1)
+    except (TypeError, ValueError):
+        raise CommandError(f"无效的采样参数: duration={duration!r}, frequency={frequency!r}")
+    try:
+        stacks = record_folded_stacks(duration, frequency)
+    except (OSError, RuntimeError) as e:
+        raise CommandError(f"火焰图采样失败: {e}")
+    folded = format_folded_stacks(stacks)
+    if output == 'folded':
+        return dict(folded=folded, samples=sum(stacks.values()), duration=duration, frequency=frequency,
+                    sample_id=uuid.uuid4().hex)
+    try:
+        result = subprocess.run([FLAME_GRAPH_SCRIPT], input=folded, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                text=True)
+    except OSError as e:
+        raise CommandError(f"火焰图生成失败: {e}")
+    if result.returncode != 0:
+        raise CommandError(f"火焰图生成失败: {result.stderr.strip() or f'flamegraph.pl 退出码 {result.returncode}'}")
+    return result.stdout
+
+
+@register_command('get_io_stack', job_limit=1)
+def command_get_io_stack(args, **params):
+    # 定义 docker run 命令及其参数
+    docker_command = [
+        "docker", "run", "-itd", "--name", "ebpf", "--privileged",
+        "-v", "/lib/modules:/lib/modules:rw",
+        "-v", "/sys:/sys",
+        "-v", "/root:/root",
+        "-v", "/usr/src:/usr/src",
+        "-v", "/etc/localtime:/etc/localtime:rw",
+        "-v", "/usr/src/kernels/:/usr/src/kernels/",
+        '--restart=always',
+        "--pid=host",
+        "ebpf:v1", "python3", "wudipaima.py"
+    ]
+    # 使用 subprocess.run 执行 docker run 命令
+    try:
+        subprocess.run(docker_command)
+
+        print(f"Please wait 30s ,Container started successfully")
+        with open('/root/io_stats.txt', 'r') as f:
+            data = f.read()
+        return data
+    except subprocess.CalledProcessError as e:
+        print(f"Error occurred while starting the container", e)
+
+
+@register_command('设置NTP', prefix=True, idempotent=True)
+def command_set_ntp(args, **params):
+    subprocess.run(["sed", "-i", "'3a server ntp1.aliyun.com iburst'", "/etc/chrony.conf"],
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    subprocess.run(['systemctl', 'restart', 'chronyd'])
+    return "设置成功"
+
+
+# 命令格式：备份数据库 <数据库名>
+@register_command('备份数据库', prefix=True)
+def command_backup_database(args, **params):
+    if not args:
+        return '缺少数据库名'
+    db_name = args.split()[0]
+    result = subprocess.run(['sudo', 'pg_dump', db_name, '>', f'/backup/{db_name}.sql'], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, text=True)
+    return result.stdout
+
+
+@register_command('添加数据库缓存', idempotent=True)
+def command_add_database_cache(args, **params):
+    resize_commands = [
+        'sudo', 'sed', '-i',
+        '-e', '/^lower_case_table_names=/c\\lower_case_table_names = 0',
+        '-e', '/^innodb_buffer_pool_size=/c\\innodb_buffer_pool_size = 4G',
+        '-e', '/^innodb_log_buffer_size=/c\\innodb_log_buffer_size = 64M',
+        '-e', '/^innodb_log_file_size=/c\\innodb_log_file_size = 256M',
+        '-e', '/^innodb_log_files_in_group=/c\\innodb_log_files_in_group = 2',
+        '-e', '/^query_cache_type=/c\\query_cache_type = 1',
+        '-e', '/^query_cache_size=/c\\query_cache_size = 600000',
+        # 如果以下行不存在，则在文件末尾添加它们
+        '-e', '$a\\lower_case_table_names = 0',
+        '-e', '$a\\innodb_buffer_pool_size = 4G',
+        '-e', '$a\\innodb_log_buffer_size = 64M',
+        '-e', '$a\\innodb_log_file_size = 256M',
+        '-e', '$a\\innodb_log_files_in_group = 2',
+        '-e', '$a\\query_cache_type = 1',
+        '-e', '$a\\query_cache_size = 600000',
+        '/etc/my.cnf'
+    ]
+    subprocess.run(resize_commands, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return "数据库缓存已添加"
+
+
+@register_command('导出当前系统状态', idempotent=True, read_only=True)
+def command_export_system_status(args, **params):
+    result = subprocess.run(['top', '-b', '-n', '1'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    with open('/tmp/system_snapshot.txt', 'w') as f:
+        f.write(result.stdout)
+    return "系统状态已导出到 /tmp/system_snapshot.txt"
+
+
+class CephCollector:
+    """
+    按集群缓存 ceph 子命令的 JSON 结果，并记录每次刷新时的 OSD 延迟与 PG 状态作为历史采样点。
+    缓存有效期内同一集群的同一子命令只执行一次，并发请求共享同一次执行。
+    """
+
+    def __init__(self, ttl=CEPH_CACHE_TTL, history_size=CEPH_HISTORY_SIZE):
+        self.ttl = ttl
+        self.history_size = history_size
+        self.cache = CommandCache()
+        self.lock = threading.Lock()
+        self.history = {}  # 集群 -> deque[(时间, PG 状态, OSD 延迟)]
+
+    def fetch(self, section, cluster):
+        return self.cache.get_or_compute((cluster, section), self.ttl,
+                                         lambda: run_ceph_command(CEPH_SECTIONS[section], cluster or None))
+
+    def sample(self, cluster):
+        """status 与 osd perf 一起刷新，每次刷新追加一个历史采样点"""
+        def refresh():
+            status = run_ceph_command(CEPH_SECTIONS['status'], cluster or None)
+            perf = run_ceph_command(CEPH_SECTIONS['osd_perf'], cluster or None)
+            with self.lock:
+                history = self.history.setdefault(cluster, collections.deque(maxlen=self.history_size))
+                history.append((round(time.time(), 3), ceph_pg_states(status), ceph_osd_latency(perf)))
+            return status, perf
+        return self.cache.get_or_compute((cluster, 'sample'), self.ttl, refresh)
+
+    def series(self, cluster, since=0):
+        """历史采样点按列返回，便于页面直接绘制时间序列"""
+        with self.lock:
+            points = [point for point in self.history.get(cluster, ()) if point[0] > since]
+        pg_names = sorted({name for _, states, _ in points for name in states})
+        osd_ids = sorted({osd for _, _, latency in points for osd in latency}, key=int)
+        return dict(
+            time=[point[0] for point in points],
+            pg_states={name: [states.get(name, 0) for _, states, _ in points] for name in pg_names},
+            osd_latency={osd: {field: [latency.get(osd, {}).get(field) for _, _, latency in points]
+                               for field in ('commit_ms', 'apply_ms')} for osd in osd_ids},
+        )
+
+    def collect(self, cluster, raw=False, since=0):
+        result = dict(cluster=cluster or 'local', time=round(time.time(), 3), errors={})
+        sections = {}
+        try:
+            sections['status'], sections['osd_perf'] = self.sample(cluster)
+        except RuntimeError as e:
+            result['errors']['status'] = str(e)
+        for section in ('osd_tree', 'df'):
             try:
-                subprocess.run(docker_command)
-
-                print(f"Please wait 30s ,Container started successfully")
-                with open('/root/io_stats.txt', 'r') as f:
-                    data = f.read()
-                result = subprocess.run(['docker', 'exec', '-it', 'ebpf', 'cat', '/root/io_stats.json'],
-                                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                # 将 result.stdout 转换为 JSON 格式并返回
-                return data
-                # time.sleep(30)
-                # with open('/root/io_stats.txt','r') as f:
-                # print(f.read())
-                # data = f.read()
+                sections[section] = self.fetch(section, cluster)
+            except RuntimeError as e:
+                result['errors'][section] = str(e)
+        if 'status' in sections:
+            status = sections['status']
+            result.update(health=ceph_health(status), fsid=status.get('fsid'), quorum=status.get('quorum_names', []),
+                          osdmap=ceph_osdmap(status),
+                          pg_states=ceph_pg_states(status), osd_latency=ceph_osd_latency(sections['osd_perf']))
+        if 'osd_tree' in sections:
+            result['osds'] = ceph_osds(sections['osd_tree'])
+        if 'df' in sections:
+            result['df'] = ceph_df(sections['df'])
+        if raw:
+            result['raw'] = sections
+        result['series'] = self.series(cluster, since)
+        return result
+
+
+ceph_collector = CephCollector()
+
+
+# cluster_ip 为空时采集本机所在集群；raw 为真时附带各子命令的原始 JSON；since 之后的历史采样点。
+# CephCollector 按集群缓存采集结果，不使用命令缓存
+@register_command('get_ceph_info', idempotent=True, read_only=True)
+def command_get_ceph_info(args, cluster_ip=None, raw=False, since=0, **params):
+    return ceph_collector.collect(cluster_ip or '', bool(raw), float(since or 0))
 
-            except subprocess.CalledProcessError as e:
-                print(f"Error occurred while starting the container", e)
-        elif command.strip() == 'command:开启防火墙':
-            result = subprocess.run(['sudo', 'systemctl', 'start', 'firewalld'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:关闭防火墙':
-            result = subprocess.run(['sudo', 'systemctl', 'stop', 'firewalld'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:关闭NTP同步服务器':
-            result = subprocess.run(['sudo', 'systemctl', 'stop', 'ntpd'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:查看NTP同步服务器':
-            result = subprocess.run(['sudo', 'systemctl', 'status', 'ntpd'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:开启NTP同步服务器':
-            result = subprocess.run(['sudo', 'systemctl', 'start', 'ntpd'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:优化文件系统':
-            result = subprocess.run(['sudo', 'tune2fs', '-o', 'journal_data_writeback', '/dev/sda1'],
-                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看时间同步':
-            result = subprocess.run(['chronyc', 'sources', '-v'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                    text=True)
-            return result.stdout
-        elif command.startswith('command:设置NTP'):
-            subprocess.run(["sed", "-i", "'3a server ntp1.aliyun.com iburst'", "/etc/chrony.conf"],
-                           stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            subprocess.run(['systemctl', 'restart', 'chronyd'])
-            return "设置成功"
-        elif command.strip() == 'command:启用SYN Cookie':
-            result = subprocess.run(['sudo', 'sysctl', '-w', 'net.ipv4.tcp_syncookies=1'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.startswith('command:备份数据库'):
-            db_name = command.split(' ', 1)[1]
-            result = subprocess.run(['sudo', 'pg_dump', db_name, '>', f'/backup/{db_name}.sql'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout
-        elif command.strip() == 'command:添加数据库缓存':
-            resize_commands = [
-                'sudo', 'sed', '-i',
-                '-e', '/^lower_case_table_names=/c\\lower_case_table_names = 0',
-                '-e', '/^innodb_buffer_pool_size=/c\\innodb_buffer_pool_size = 4G',
-                '-e', '/^innodb_log_buffer_size=/c\\innodb_log_buffer_size = 64M',
-                '-e', '/^innodb_log_file_size=/c\\innodb_log_file_size = 256M',
-                '-e', '/^innodb_log_files_in_group=/c\\innodb_log_files_in_group = 2',
-                '-e', '/^query_cache_type=/c\\query_cache_type = 1',
-                '-e', '/^query_cache_size=/c\\query_cache_size = 600000',
-                # 如果以下行不存在，则在文件末尾添加它们
-                '-e', '$a\\lower_case_table_names = 0',
-                '-e', '$a\\innodb_buffer_pool_size = 4G',
-                '-e', '$a\\innodb_log_buffer_size = 64M',
-                '-e', '$a\\innodb_log_file_size = 256M',
-                '-e', '$a\\innodb_log_files_in_group = 2',
-                '-e', '$a\\query_cache_type = 1',
-                '-e', '$a\\query_cache_size = 600000',
-                '/etc/my.cnf'
-            ]
-            subprocess.run(resize_commands, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return "数据库缓存已添加"
-        # 新增指令
-        elif command.strip() == 'command:查看当前登录用户':
-            print("执行查看当前登录用户命令")
-            result = subprocess.run(['who'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            print("who命令输出:", result.stdout)
-            return result.stdout
-
-        elif command.strip() == 'command:清理系统缓存':
-            subprocess.run(['sync'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            subprocess.run(['bash', '-c', 'echo 3 > /proc/sys/vm/drop_caches'], stdout=subprocess.PIPE,
-                           stderr=subprocess.PIPE, text=True)
-            return "系统缓存已清理"
-
-        elif command.strip() == 'command:查看磁盘使用情况':
-            result = subprocess.run(['df', '-h'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:重启Nginx服务':
-            result = subprocess.run(['sudo', 'systemctl', 'restart', 'nginx'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout or "Nginx 服务已重启"
-
-        elif command.strip() == 'command:检查系统内核日志':
-            result = subprocess.run(['dmesg', '|', 'tail'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
-                                    shell=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看系统负载':
-            result = subprocess.run(['uptime'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看内存使用情况':
-            result = subprocess.run(['free', '-h'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看CPU信息':
-            result = subprocess.run(['lscpu'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:重启服务器':
-            result = subprocess.run(['sudo', 'reboot'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return "服务器重启命令已发送"
-
-        elif command.strip() == 'command:重启MySQL服务':
-            result = subprocess.run(['sudo', 'systemctl', 'restart', 'mysqld'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout or "MySQL 服务已重启"
-
-        elif command.strip() == 'command:检测网络连接状态':
-            result = subprocess.run(['ping', '-c', '4', 'baidu.com'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                    text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看端口占用情况':
-            result = subprocess.run(['sudo', 'lsof', '-i', '-P', '-n'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                    text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:终止占用端口的进程':
-            result = subprocess.run(['sudo', 'fuser', '-k', '端口号/tcp'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout or "占用端口的进程已终止"
-
-        elif command.strip() == 'command:查看活跃连接数':
-            result = subprocess.run(['netstat', '-an'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:重启Docker服务':
-            result = subprocess.run(['sudo', 'systemctl', 'restart', 'docker'], stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE, text=True)
-            return result.stdout or "Docker 服务已重启"
-
-        elif command.strip() == 'command:查看内核日志':
-            result = subprocess.run(['journalctl', '-k', '--no-pager'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                    text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:检查CPU绑定情况':
-            result = subprocess.run(['ps', '-eo', 'pid,psr,comm'], stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                    text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:查看运行进程':
-            result = subprocess.run(['ps', 'aux'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            return result.stdout
-
-        elif command.strip() == 'command:导出当前系统状态':
-            result = subprocess.run(['top', '-b', '-n', '1'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            with open('/tmp/system_snapshot.txt', 'w') as f:
-                f.write(result.stdout)
-            return "系统状态已导出到 /tmp/system_snapshot.txt"
-        else:
-            # 支持自定义shell命令（仅开发/测试环境建议）
-            if cmd_key.startswith('command:'):
-                shell_cmd = cmd_key[len('command:'):].strip()
-                print(f"执行自定义shell命令: {shell_cmd}")
-                try:
-                    result = subprocess.run(shell_cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                    return result.stdout + result.stderr
-                except Exception as e:
-                    return f'执行自定义命令出错: {e}'
-            print(f"接收到的命令: {command}")
-            print(f"收到命令: {repr(command)}")  # repr 能把不可见字符都打印出来
-            print(f"命令不匹配，返回unknown command")
-            return 'unknown command'
+
+# 处理输入命令并返回结果
+def dispatch_command(command, **params):
+    """执行一条命令，处理函数的异常（包括 CommandError）原样抛出，由调用方决定如何报告"""
+    entry, args = find_command(command)
+    if entry is not None:
+        ttl = entry.cache_ttl()
+        if ttl > 0:
+            key = (entry.name, args, json.dumps(params, sort_keys=True, default=str))
+            return command_cache.get_or_compute(key, ttl, lambda: entry.run(args, **params))
+        try:
+            return entry.run(args, **params)
+        finally:
+            # 写命令可能改变系统状态，之后的只读命令重新执行
+            if not entry.is_read_only():
+                command_cache.clear()
+    # 支持自定义shell命令（仅开发/测试环境建议），只接受带 command: 前缀的输入，其余未知命令不执行
+    if not command.strip().startswith('command:'):
+        logging.info(f"未知命令: {command!r}")
+        return 'unknown command'
+    logging.info(f"执行自定义shell命令: {args}")
+    try:
+        result = subprocess.run(args, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                timeout=AGENT_COMMAND_TIMEOUT)
+        return result.stdout + result.stderr
+    except Exception as e:
+        return f'执行自定义命令出错: {e}'
+    finally:
+        command_cache.clear()
+
+
+def handle_command(command, **params):
+    logging.debug(f"收到命令: {command!r}")
+    try:
+        return dispatch_command(command, **params)
+    except CommandError as e:
+        logging.warning(f"执行命令 {command!r} 失败: {e}")
+        return str(e)
     except Exception as e:
-        print(f"进入handle_command，收到命令: {repr(command)}")
-        print(f"执行命令出错: {e}")
-        logging.error(f"执行命令出错: {e}")
+        logging.error(f"执行命令 {command!r} 出错: {e}")
         return f"执行命令出错: {e}"
 
 
+class AgentJob:
+    __slots__ = ('job_id', 'command', 'options', 'status', 'result', 'error', 'submitted', 'started', 'finished')
+
+    def __init__(self, command, options):
+        self.job_id = uuid.uuid4().hex
+        self.command = command
+        self.options = options
+        self.status = 'queued'  # queued / running / done / failed
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def describe(self, with_result=False):
+        info = dict(job_id=self.job_id, command=self.command, status=self.status, submitted=self.submitted,
+                    started=self.started, finished=self.finished)
+        if self.error is not None:
+            info['error'] = self.error
+        if with_result and self.status == 'done':
+            info['result'] = self.result
+        return info
+
+
+class JobManager:
+    """
+    长耗时命令的后台作业：提交后立即返回作业ID，作业在独立的线程池中通过 dispatch_command 执行，
+    不占用请求处理线程；同一命令同时运行的作业数受 job_limit 限制，超出的排队等待。
+    作业结束后结果保留 ttl 秒，期间可以反复查询。
+    """
+
+    def __init__(self, workers=AGENT_JOB_WORKERS, ttl=AGENT_JOB_RESULT_TTL, max_entries=AGENT_JOB_MAX_ENTRIES):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='agent-job')
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.jobs = collections.OrderedDict()
+        self.running = collections.Counter()
+        self.pending = collections.defaultdict(collections.deque)
+        self.lock = threading.Lock()
+
+    def submit(self, command, options):
+        entry, _ = find_command(command)
+        if entry is None:
+            raise ValueError(f"未注册的命令不能作为作业提交: {command}")
+        job = AgentJob(command, options)
+        with self.lock:
+            self._purge()
+            self.jobs[job.job_id] = job
+            if self.running[entry.name] < (entry.job_limit or AGENT_JOB_LIMIT):
+                self._start(entry.name, job)
+            else:
+                self.pending[entry.name].append(job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            self._purge()
+            return self.jobs.get(job_id)
+
+    def _start(self, name, job):
+        # 调用方持有 self.lock
+        self.running[name] += 1
+        job.status = 'running'
+        self.executor.submit(self._run, name, job)
+
+    def _run(self, name, job):
+        job.started = time.time()
+        try:
+            job.result = dispatch_command(job.command, **job.options)
+            job.status = 'done'
+        except Exception as e:
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = time.time()
+            with self.lock:
+                self.running[name] -= 1
+                if self.pending[name]:
+                    self._start(name, self.pending[name].popleft())
+
+    def _purge(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and now - job.finished > self.ttl]:
+            del self.jobs[job_id]
+        # 仍然超出上限时丢弃最早结束的作业
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[:max(len(self.jobs) - self.max_entries, 0)]:
+            del self.jobs[job_id]
+
+
+job_manager = JobManager()
+
+
+# 提交后台作业：job 为命令，options 为该命令的请求参数，立即返回作业ID
+@register_command('submit_job', inline=True)
+def command_submit_job(args, job=None, options=None, **params):
+    if not job:
+        return dict(error='缺少 job 参数')
+    try:
+        return job_manager.submit(job, options or {}).describe()
+    except ValueError as e:
+        return dict(error=str(e))
+
+
+# 查询作业状态，result 为真且作业已完成时附带结果
+@register_command('job_status', inline=True)
+def command_job_status(args, job_id=None, result=False, **params):
+    job = job_manager.get(job_id)
+    if job is None:
+        return dict(job_id=job_id, status='unknown', error='作业不存在或结果已过期')
+    return job.describe(with_result=bool(result))
+
+
+# 异步读取一条请求，返回值与 recv_request 相同
+async def read_request_async(reader):
+    prefix = await reader.read(len(FRAME_MAGIC))
+    if not prefix:
+        return None
+    if len(prefix) < len(FRAME_MAGIC):
+        prefix += await reader.readexactly(len(FRAME_MAGIC) - len(prefix))
+    if prefix == FRAME_MAGIC:
+        header = prefix + await reader.readexactly(FRAME_HEADER.size - len(FRAME_MAGIC))
+        _, _, _, request_id, length = FRAME_HEADER.unpack(header)
+        return json.loads(await reader.readexactly(length)), True, request_id
+    # 旧版客户端直接发送 JSON 文本
+    data = prefix + await reader.read(1024)
+    command = json.loads(data.decode('utf-8'))
+    request_id = command.get('request_id', 0) if isinstance(command, dict) else 0
+    return command, False, request_id
+
+
+# 执行一条请求：轻量命令直接执行，其余命令交给有界线程池，避免阻塞事件循环
+async def execute_request_async(command, executor):
+    if not isinstance(command, dict) or 'command' not in command:
+        return {'error': 'Invalid command format'}
+    entry, _ = find_command(command['command'])
+    if entry is not None and entry.inline:
+        return execute_request(command)
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(executor, execute_request, command)
+
+
+# 异步处理客户端连接
+# 帧协议客户端的请求并发执行、按请求ID乱序返回；旧版客户端没有请求ID，只能逐条处理
+async def handle_client_async(reader, writer, executor, max_inflight):
+    client_address = writer.get_extra_info('peername')
+    logging.info(f"客户端连接: {client_address}")
+    inflight = asyncio.Semaphore(max_inflight)
+    write_lock = asyncio.Lock()
+    tasks = set()
+
+    async def process(command, framed, request_id):
+        try:
+            response = await execute_request_async(command, executor)
+            framed = framed or (isinstance(command, dict) and command.get('proto', 1) >= FRAME_VERSION)
+            async with write_lock:
+                writer.write(encode_response(response, framed, request_id, accepts_zlib(command)))
+                await writer.drain()
+        except (ConnectionError, BrokenPipeError) as e:
+            logging.error(f"连接错误: {e}")
+        finally:
+            inflight.release()
+
+    try:
+        while True:
+            # 背压：在途请求达到上限时不再读取新请求，由 TCP 窗口反压客户端
+            await inflight.acquire()
+            request = await read_request_async(reader)
+            if request is None:
+                inflight.release()
+                break
+            command, framed, request_id = request
+            if framed:
+                task = asyncio.ensure_future(process(command, framed, request_id))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            else:
+                await process(command, framed, request_id)
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+        logging.error(f"连接错误: {e}")
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        writer.close()
+
+
+# 异步服务器主函数
+async def serve_async(host, port, max_concurrency, max_inflight):
+    executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='agent-worker')
+    server = await asyncio.start_server(
+        lambda reader, writer: handle_client_async(reader, writer, executor, max_inflight),
+        host, port, reuse_address=True)
+    logging.info(f"探针以 asyncio 模式监听 {host}:{port}，最大并发命令数 {max_concurrency}")
+    async with server:
+        await server.serve_forever()
+
+
+class TelemetryPusher(threading.Thread):
+    """
+    推送模式：保持一条到采集端的出站长连接，按固定间隔以帧协议发送指标。
+    每条连接是一个会话：静态主机信息随 hello 发送一次，指标为原始数值并由 MetricFrameEncoder 差分编码，
+    较大的帧使用 zlib 压缩。连接断开后按指数退避重连，期间的采样点不补发。
+    """
+
+    def __init__(self, address, interval=AGENT_PUSH_INTERVAL, host_id=AGENT_PUSH_ID,
+                 subsystems=('cpu', 'memory', 'disk', 'network'), delta=AGENT_PUSH_DELTA):
+        super().__init__(name='telemetry-pusher', daemon=True)
+        self.address = address
+        self.interval = interval
+        self.host_id = host_id
+        self.subsystems = subsystems
+        self.delta = delta
+        self.sequence = 0
+
+    def run(self):
+        backoff = 1
+        while True:
+            try:
+                with socket.create_connection(self.address, timeout=10) as sock:
+                    logging.info(f"已连接推送采集端 {self.address[0]}:{self.address[1]}")
+                    backoff = 1
+                    self._stream(sock)
+            except OSError as e:
+                logging.error(f"推送连接失败: {e}，{backoff} 秒后重连")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _send(self, sock, message):
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        flags, payload = compress_payload(json.dumps(message, separators=(',', ':')).encode('utf-8'))
+        send_frame(sock, payload, self.sequence, flags)
+
+    def _stream(self, sock):
+        encoder = MetricFrameEncoder(self.delta)
+        static, metrics = split_static(gather_monitor_data(STATIC_SUBSYSTEMS + tuple(self.subsystems)))
+        self._send(sock, {'type': 'hello', 'hostname': hostname, 'host': self.host_id or None,
+                          'static': static})
+        deadline = time.monotonic()
+        while True:
+            if metrics is None:
+                _, metrics = split_static(gather_monitor_data(self.subsystems))
+            self._send(sock, encoder.encode(metrics))
+            metrics = None
+            # 以固定节拍推送，采集耗时不累积到间隔中
+            deadline += self.interval
+            time.sleep(max(deadline - time.monotonic(), 0))
+
+
+# 解析 "主机:端口" 形式的采集端地址
+def parse_push_address(value):
+    host, _, port = value.rpartition(':')
+    if not host or not port.isdigit():
+        raise argparse.ArgumentTypeError(f"采集端地址应为 主机:端口，实际为 {value!r}")
+    return host, int(port)
+
+
 # 服务器主函数
 def main():
+    parser = argparse.ArgumentParser(description='KylinTuningSystem 探针')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=7788)
+    parser.add_argument('--mode', choices=['asyncio', 'thread'], default=AGENT_SERVER_MODE,
+                        help='asyncio: 事件循环 + 有界线程池；thread: 每个连接一个线程')
+    parser.add_argument('--max-concurrency', type=int, default=AGENT_MAX_CONCURRENCY)
+    parser.add_argument('--max-inflight', type=int, default=AGENT_MAX_INFLIGHT_PER_CLIENT)
+    parser.add_argument('--sample-interval', type=float, default=AGENT_SAMPLE_INTERVAL,
+                        help='后台采样间隔（秒）')
+    parser.add_argument('--push', type=parse_push_address, default=AGENT_PUSH_ADDR or None,
+                        help='推送模式采集端地址，如 10.0.0.1:7789；设置后主动上报指标')
+    parser.add_argument('--push-interval', type=float, default=AGENT_PUSH_INTERVAL, help='推送间隔（秒）')
+    parser.add_argument('--push-id', default=AGENT_PUSH_ID, help='上报的主机标识，默认使用连接的源IP')
+    args = parser.parse_args()
+    # 提前启动采样线程，保证首个 get_info 请求就能拿到使用率
+    metric_sampler.interval = args.sample_interval
+    metric_sampler.ensure_started()
+    if args.push:
+        TelemetryPusher(args.push, args.push_interval, args.push_id).start()
+
+    if args.mode == 'asyncio':
+        asyncio.run(serve_async(args.host, args.port, args.max_concurrency, args.max_inflight))
+        return
+
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
-        server_socket.bind(('0.0.0.0', 7788))
+        server_socket.bind((args.host, args.port))
         server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         # server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8000000)
         # server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 8000000)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'KylinTuningSystem.settings')
 
 application = get_asgi_application()
+
+# 服务进程启动后恢复数据库中的采集计划（KYLIN_COLLECTION_AUTOSTART=0 时不恢复）
+from kylinApp.utils.background_tasks import resume_on_startup  # noqa: E402
+
+resume_on_startup()
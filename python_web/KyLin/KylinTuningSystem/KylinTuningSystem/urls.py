@@ -76,8 +76,11 @@ urlpatterns = [
     path("api/userManager/<str:tp>", api.userManager),
     path("api/realtimeUpdatePidData", api.realtime_update_pid_data),
     path("api/pidInfo", api.pid_info),
+    path("api/affinityPlan", api.affinity_plan),
+    path("api/flameGraph/<str:tp>", api.flame_graph_api),
     # 策略包接口
     path("api/strategy/apply", api.apply_strategy),
+    path("api/strategy/fanout", api.apply_strategy_fanout),
 
     # 火焰图
     path('no_cache_image/<str:image_name>/',api.NoCacheImageView.as_view(), name='no_cache_image'),
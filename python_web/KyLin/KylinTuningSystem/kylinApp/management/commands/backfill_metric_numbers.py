@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from kylinApp.utils.metric_backfill import BACKFILL_BATCH_SIZE, backfill
+
+
+class Command(BaseCommand):
+    help = ('把性能指标表中以字符串保存的旧数据转换为数值。数据量大时先执行 migrate kylinApp 0009，'
+            '再执行本命令分批转换（可在采集运行时执行、中断后重新执行），最后执行 migrate 修改列类型')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, help='每批读取的行数')
+        parser.add_argument('--dry-run', action='store_true', help='只统计需要转换的行数，不修改数据')
+
+    def handle(self, *args, **options):
+        report = backfill(lambda name: apps.get_model('kylinApp', name), batch_size=options['batch_size'],
+                          dry_run=options['dry_run'], log=self.stdout.write)
+        converted = sum(counts[0] for columns in report.values() for counts in columns.values())
+        cleared = sum(counts[1] for columns in report.values() for counts in columns.values())
+        action = '需要转换' if options['dry_run'] else '已转换'
+        self.stdout.write(f'{action} {converted} 行，无法识别置为 NULL {cleared} 行')
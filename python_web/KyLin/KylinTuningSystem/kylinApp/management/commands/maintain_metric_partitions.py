@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from kylinApp.utils.metric_partitions import METRIC_PARTITION_MODELS, METRIC_PARTITION_UNIT, \
+    METRIC_PARTITIONS_AHEAD, METRIC_RETENTION_DAYS, PARTITION_UNITS, maintain
+
+
+class Command(BaseCommand):
+    help = ('维护性能指标表的时间分区：提前创建未来分区，删除超过保留天数的分区。'
+            '首次执行时加 --init 把表改为分区表（会重建整张表），之后可由 cron 每天执行一次')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unit', choices=sorted(PARTITION_UNITS), default=METRIC_PARTITION_UNIT,
+                            help='分区粒度，按天或按周')
+        parser.add_argument('--retention-days', type=int, default=METRIC_RETENTION_DAYS,
+                            help='数据保留天数，0 表示不删除')
+        parser.add_argument('--ahead', type=int, default=METRIC_PARTITIONS_AHEAD, help='提前创建的未来分区数')
+        parser.add_argument('--tables', nargs='+', choices=sorted(METRIC_PARTITION_MODELS), help='只处理指定的表')
+        parser.add_argument('--init', action='store_true', help='把未分区的表改为分区表')
+        parser.add_argument('--dry-run', action='store_true', help='只输出将要执行的语句')
+
+    def handle(self, *args, **options):
+        if options['ahead'] < 1:
+            raise CommandError('--ahead 至少为 1')
+        report = maintain(tables=options['tables'], unit=options['unit'], retention_days=options['retention_days'],
+                          ahead=options['ahead'], init=options['init'], dry_run=options['dry_run'])
+        for table, result in report.items():
+            for statement in result['statements']:
+                self.stdout.write(f'{statement};')
+            if result['partitioned']:
+                action = '将执行' if options['dry_run'] else '已执行'
+                self.stdout.write(f'{table}: {action} {len(result["statements"])} 条分区维护语句')
+            else:
+                self.stdout.write(f'{table}: 未分区，按保留天数删除 {result["deleted"]} 行'
+                                  f'（MySQL 可使用 --init 改为分区表）')
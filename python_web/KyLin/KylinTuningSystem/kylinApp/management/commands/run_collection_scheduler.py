@@ -0,0 +1,18 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from kylinApp.utils.background_tasks import task_manager
+
+
+class Command(BaseCommand):
+    help = '启动独立的采集调度进程，执行数据库中的采集计划（Web 进程可设置 KYLIN_COLLECTION_ROLE=none 只登记计划）'
+
+    def handle(self, *args, **options):
+        task_manager.role = 'all'
+        task_manager.resume()
+        self.stdout.write(f'采集调度进程已启动: {task_manager.owner}')
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            self.stdout.write('采集调度进程已停止')
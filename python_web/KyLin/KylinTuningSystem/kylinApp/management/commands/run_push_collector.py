@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from kylinApp.model.SocketServer.push_server import PUSH_BUFFER_POLICIES, PUSH_DEFAULT_PORT, TelemetryCollector
+
+
+class Command(BaseCommand):
+    help = '启动推送模式采集端，接收探针主动上报的指标并批量入库'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0')
+        parser.add_argument('--port', type=int, default=PUSH_DEFAULT_PORT)
+        parser.add_argument('--batch-size', type=int, default=500, help='缓存行数达到该值时立即写库')
+        parser.add_argument('--flush-interval', type=float, default=2.0, help='最长写库间隔（秒）')
+        parser.add_argument('--max-rows', type=int, default=100000, help='写缓冲最多缓存的行数')
+        parser.add_argument('--policy', choices=PUSH_BUFFER_POLICIES, default='drop_oldest',
+                            help='写缓冲已满时丢弃最早的行或新收到的行')
+
+    def handle(self, *args, **options):
+        collector = TelemetryCollector(host=options['host'], port=options['port'],
+                                       batch_size=options['batch_size'],
+                                       flush_interval=options['flush_interval'],
+                                       max_rows=options['max_rows'], policy=options['policy'])
+        try:
+            collector.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('推送采集端已停止')
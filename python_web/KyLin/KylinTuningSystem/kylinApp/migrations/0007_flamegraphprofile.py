@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-17 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kylinApp', '0006_logrecord_file_blob_logrecord_original_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlameGraphProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=64, verbose_name='主机IP')),
+                ('label', models.CharField(blank=True, default='', max_length=100, verbose_name='标签')),
+                ('start_time', models.DateTimeField(verbose_name='采样开始时间')),
+                ('end_time', models.DateTimeField(verbose_name='采样结束时间')),
+                ('frequency', models.IntegerField(default=99, verbose_name='采样频率')),
+                ('samples', models.IntegerField(default=0, verbose_name='样本数')),
+                ('stack_count', models.IntegerField(default=0, verbose_name='调用栈数')),
+                ('data', models.BinaryField(verbose_name='折叠栈')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+            ],
+            options={
+                'db_table': 'flame_profiles',
+                'ordering': ['-end_time'],
+                'indexes': [models.Index(fields=['host', 'end_time'], name='flame_profiles_host_end')],
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.13 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kylinApp', '0007_flamegraphprofile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.CharField(max_length=100, unique=True, verbose_name='任务ID')),
+                ('ip', models.CharField(max_length=64, verbose_name='ip地址')),
+                ('port', models.IntegerField(verbose_name='端口')),
+                ('interval', models.IntegerField(default=30, verbose_name='采集间隔（秒）')),
+                ('enabled', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('owner', models.CharField(blank=True, default='', max_length=128, verbose_name='执行进程')),
+                ('lease_expires', models.DateTimeField(blank=True, null=True, verbose_name='租约到期时间')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('last_run', models.DateTimeField(blank=True, null=True, verbose_name='最后采集时间')),
+                ('last_success', models.DateTimeField(blank=True, null=True, verbose_name='最后成功时间')),
+                ('last_latency', models.FloatField(blank=True, null=True, verbose_name='最后采集耗时（秒）')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='最后错误')),
+                ('run_count', models.IntegerField(default=0, verbose_name='采集次数')),
+                ('error_count', models.IntegerField(default=0, verbose_name='连续错误次数')),
+                ('total_errors', models.IntegerField(default=0, verbose_name='累计错误次数')),
+            ],
+            options={
+                'db_table': 'collection_schedules',
+                'indexes': [models.Index(fields=['enabled', 'lease_expires'], name='collection_sched_lease')],
+            },
+        ),
+    ]
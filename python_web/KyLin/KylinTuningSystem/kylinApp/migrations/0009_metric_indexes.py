@@ -0,0 +1,146 @@
+# Generated by Django 4.2.13 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+# 指标表按 (ipaddress, currentTime) 建索引；数值列先允许 NULL，
+# 以便 backfill_metric_numbers 或 0010 把无法识别的旧数据置空
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kylinApp', '0008_collectionschedule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='userTime',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='SystemTime',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='waitIO',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='Idle',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='total',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='used',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='free',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='buffers',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='cache',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='swap',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='total',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='used',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='free',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readCount',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeCount',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readBytes',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeBytes',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readTime',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeTime',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='sent',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='recv',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='packetSent',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='packetRecv',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='cpuperformancemetrics',
+            index=models.Index(fields=['ipaddress', 'currentTime'], name='cpuinfo_ip_time'),
+        ),
+        migrations.AddIndex(
+            model_name='memoryperformancemetrics',
+            index=models.Index(fields=['ipaddress', 'currentTime'], name='memoryinfo_ip_time'),
+        ),
+        migrations.AddIndex(
+            model_name='diskperformancemetrics',
+            index=models.Index(fields=['ipaddress', 'currentTime'], name='dfinfo_ip_time'),
+        ),
+        migrations.AddIndex(
+            model_name='networkperformancemetrics',
+            index=models.Index(fields=['ipaddress', 'currentTime'], name='networkinfo_ip_time'),
+        ),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 4.2.13 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+from kylinApp.utils.metric_backfill import backfill
+
+
+def convert_legacy_values(apps, schema_editor):
+    # 数据量大时可先执行 backfill_metric_numbers 分批转换，此处只剩少量或没有需要转换的行
+    backfill(lambda name: apps.get_model('kylinApp', name))
+
+
+# 指标列改为数值类型：CPU 时间与使用率为浮点数，字节数、次数与耗时为 BIGINT
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kylinApp', '0009_metric_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(convert_legacy_values, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='userTime',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='SystemTime',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='waitIO',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='Idle',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cpuperformancemetrics',
+            name='percent',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='total',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='used',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='free',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='buffers',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='cache',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='swap',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='memoryperformancemetrics',
+            name='percent',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='total',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='used',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='free',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readCount',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeCount',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readBytes',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeBytes',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='readTime',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='writeTime',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='diskperformancemetrics',
+            name='percent',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='sent',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='recv',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='packetSent',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='networkperformancemetrics',
+            name='packetRecv',
+            field=models.BigIntegerField(null=True),
+        ),
+    ]
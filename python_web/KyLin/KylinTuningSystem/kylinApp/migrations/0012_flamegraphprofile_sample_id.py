@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kylinApp', '0011_flamegraphprofile_job_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='flamegraphprofile',
+            name='sample_id',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True, verbose_name='采样ID'),
+        ),
+    ]
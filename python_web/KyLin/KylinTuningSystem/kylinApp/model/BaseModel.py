@@ -1,56 +1,224 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import pymysql
 from django.conf import settings
 
+# 连接池：每个数据库最多的连接数、等待空闲连接的超时（秒）、空闲超过该时间的连接在检出时先 ping（秒）
+DB_POOL_SIZE = int(os.getenv('KYLIN_DB_POOL_SIZE', 8))
+DB_POOL_TIMEOUT = float(os.getenv('KYLIN_DB_POOL_TIMEOUT', 10))
+DB_PING_INTERVAL = float(os.getenv('KYLIN_DB_PING_INTERVAL', 30))
+
+# 连接断开类错误，出现时丢弃该连接而不是归还连接池
+DB_DISCONNECT_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+
+
+class ConnectionPool:
+    """
+    pymysql 连接池：每次检出一个独占的连接，用完归还给其他线程复用，连接按需创建，最多 max_size 个。
+    检出空闲超过 ping_interval 秒的连接时先 ping，被 MySQL wait_timeout 断开的连接会自动重连。
+    keep_idle 为假时归还的连接直接关闭，只限制并发连接数而不保持空闲连接。
+    """
+
+    def __init__(self, connect, max_size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT, ping_interval=DB_PING_INTERVAL,
+                 keep_idle=True):
+        self.connect = connect
+        self.max_size = max_size
+        self.keep_idle = keep_idle
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.lock = threading.Condition()
+        self.idle = []  # [(连接, 归还时间)]，后进先出，较久未用的连接自然排到底部
+        self.size = 0  # 已创建且未关闭的连接数
+
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        with self.lock:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"等待数据库连接超时（连接池上限 {self.max_size}）")
+                self.lock.wait(remaining)
+            if self.idle:
+                conn, released = self.idle.pop()
+            else:
+                conn, released = None, None
+                self.size += 1
+        if conn is None:
+            return self._create()
+        if time.monotonic() - released > self.ping_interval:
+            try:
+                conn.ping(reconnect=True)
+            except Exception:
+                # 无法重连时换一个新连接，仍失败则把异常交给调用方
+                self._close(conn)
+                with self.lock:
+                    self.size += 1
+                return self._create()
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken or not self.keep_idle:
+            self._close(conn)
+            return
+        with self.lock:
+            self.idle.append((conn, time.monotonic()))
+            self.lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """检出一个连接，退出时归还；发生异常时回滚，连接已断开则丢弃"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException as e:
+            self.release_after_error(conn, e)
+            raise
+        self.release(conn)
+
+    def release_after_error(self, conn, error):
+        """出错后归还连接：先回滚，连接已断开或无法回滚时丢弃"""
+        broken = isinstance(error, DB_DISCONNECT_ERRORS)
+        if not broken:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        self.release(conn, broken)
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn, _ in idle:
+            self._close(conn)
+
+    def _create(self):
+        try:
+            return self.connect()
+        except BaseException:
+            with self.lock:
+                self.size -= 1
+                self.lock.notify()
+            raise
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self.lock:
+            self.size -= 1
+            self.lock.notify()
+
 
 class DBBase:
+    """
+    数据库访问基类。同一数据库的所有实例共用一个连接池：db_insert/db_insert_many/db_delete/db_select
+    每次检出一个连接执行并提交；db_cursor/db_commit/db_rollback/db_close 使用当前线程检出的连接，db_close 时归还，
+    建议通过 db_scope() 使用，出错时也会归还。
+    pooled 为假时不共用连接池，连接用完即关闭。
+    """
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def __init__(self, user, password, host, port, db, charset, pooled=True):
+        def connect():
+            return pymysql.connect(user=user, password=password, host=host, port=port, db=db, charset=charset,
+                                   cursorclass=pymysql.cursors.DictCursor)
 
-    def __init__(self, user, password, host, port, db, charset):
-        self.mydb = pymysql.connect(user=user,
-                                    password=password,
-                                    host=host,
-                                    port=port,
-                                    db=db,
-                                    charset=charset)
-        self.cursor = self.mydb.cursor(pymysql.cursors.DictCursor)
+        if pooled:
+            key = (user, password, host, port, db, charset)
+            with DBBase.pools_lock:
+                if key not in DBBase.pools:
+                    DBBase.pools[key] = ConnectionPool(connect)
+                self.pool = DBBase.pools[key]
+        else:
+            self.pool = ConnectionPool(connect, keep_idle=False)
+        self.local = threading.local()
+
+    def db_connection(self):
+        """当前线程检出的连接，首次调用时从连接池检出"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.pool.acquire()
+            self.local.cursor = conn.cursor()
+        return conn
 
     def db_cursor(self):
         """返回游标"""
-        return self.cursor
+        self.db_connection()
+        return self.local.cursor
 
     def db_rollback(self):
         """发生错误回滚"""
-        self.mydb.rollback()
+        self.db_connection().rollback()
 
     def db_commit(self):
         """提交"""
-        self.mydb.commit()
+        self.db_connection().commit()
+
+    def db_close(self, error=None):
+        """归还当前线程检出的连接；error 为执行中出现的异常时先回滚，连接已断开则丢弃"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            return
+        cursor = self.local.cursor
+        self.local.conn = self.local.cursor = None
+        try:
+            cursor.close()
+        except Exception:
+            pass
+        if error is None:
+            self.pool.release(conn)
+        else:
+            self.pool.release_after_error(conn, error)
 
-    def db_close(self):
-        """关闭"""
-        self.cursor.close()
-        self.mydb.close()
+    @contextmanager
+    def db_scope(self):
+        """检出当前线程的连接并返回游标，退出时归还（出错时同样归还）"""
+        cursor = self.db_cursor()
+        try:
+            yield cursor
+        except BaseException as e:
+            self.db_close(e)
+            raise
+        self.db_close()
 
     def db_insert(self, sql, format_sql: tuple):
         """"占位符Insert Into Table Values(s%,s%,s%,s%),format_slq=(value1,value2,value3,value4)"""
         try:
-            if not format_sql:
-                self.cursor.execute(sql)
-            else:
-                self.cursor.execute(sql, format_sql)
-            self.db_commit()
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.execute(sql, format_sql or None)
+                conn.commit()
         except Exception as e:
-            self.db_rollback()
             print("错误：%s" % e)
 
+    def db_insert_many(self, sql, rows):
+        """批量插入，rows 为多组占位符参数，一次 executemany 后统一提交"""
+        if not rows:
+            return 0
+        try:
+            with self.pool.connection() as conn, conn.cursor() as cursor:
+                cursor.executemany(sql, rows)
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            print("错误：%s" % e)
+            return 0
+
     def db_delete(self, sql, format_sql):
-        self.cursor.execute(sql, format_sql)
-        affected_rows = self.cursor.rowcount
-        self.db_commit()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, format_sql)
+            affected_rows = cursor.rowcount
+            conn.commit()
         return affected_rows
 
     def db_select(self, sql, format_sql):
-        self.cursor.execute(sql, format_sql)
-        query_data = self.cursor.fetchall()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(sql, format_sql)
+            query_data = cursor.fetchall()
         return query_data
 
 
@@ -66,6 +234,7 @@ class DBInitialize(DBBase):
         super().__init__(user, password, host, port, db, charset)
 
 
+# 被监控的用户数据库：不保持空闲连接，避免影响其 Threads_connected 等统计
 class SelectDBInitialize(DBBase):
     def __init__(self, user, password, host,db , port, charset):
-        super().__init__(user, password, host, port, db, charset)
+        super().__init__(user, password, host, port, db, charset, pooled=False)
@@ -9,21 +9,17 @@ import time
 # 连接数据库
 def get_questions_count(host, user, password, db, port, charset):
     db_session = SelectDBInitialize(user=user,password=password,host=host,port=port,db=db,charset=charset)
-    cursor = db_session.db_cursor()
-    # 通过db_session对象获取了一个数据库游标cursor，用于执行sql查询
-    cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_connected'")
-    # 执行sql查询，用于获取当前数据库的连接线程数
-    threads_connected = cursor.fetchone()['Value']
-    # 获取查询结果的第一行，并提取value字段的值，即当前的连接线程数，存储在变量threads_connected
-
-    cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
-    # 执行sql查询语句，用户获取数据库的总查询数量
-    result = cursor.fetchone()
-    # 获取查询结果的第一行，存储在变量result中
-    cursor.close()
-    # 关闭游标，释放资源
-    db_session.db_close()
-    # 调用db_session.db_close方法，关闭数据库连接
+    with db_session.db_scope() as cursor:
+        # 通过db_session对象获取了一个数据库游标cursor，用于执行sql查询；退出 with 时（包括出错时）关闭连接
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Threads_connected'")
+        # 执行sql查询，用于获取当前数据库的连接线程数
+        threads_connected = cursor.fetchone()['Value']
+        # 获取查询结果的第一行，并提取value字段的值，即当前的连接线程数，存储在变量threads_connected
+
+        cursor.execute("SHOW GLOBAL STATUS LIKE 'Questions'")
+        # 执行sql查询语句，用户获取数据库的总查询数量
+        result = cursor.fetchone()
+        # 获取查询结果的第一行，存储在变量result中
     return int(result["Value"]), threads_connected
 #     返回两个值：总查询数量（转换为整数）和连接线程数
 
@@ -2,11 +2,17 @@ from ..BaseModel import DBInitialize
 
 db_session = DBInitialize()
 
+INSERT_SQL = """INSERT INTO cpuInfo(type, ipaddress, userTime, SystemTime, waitIO, Idle, count, percent, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
 
 def insert(tp, ip, user_t, system_t, wait_io, idle, count, percent, current_t):
-    sql = """INSERT INTO cpuInfo(type, ipaddress, userTime, SystemTime, waitIO, Idle, count, percent, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s)"""
     data = (tp, ip, user_t, system_t, wait_io, idle, count, percent, current_t)
-    db_session.db_insert(sql, data)
+    db_session.db_insert(INSERT_SQL, data)
+
+
+# 批量插入，rows 中每一项与 insert 的参数顺序一致
+def insert_many(rows):
+    return db_session.db_insert_many(INSERT_SQL, rows)
 
 
 
@@ -2,8 +2,14 @@ from ..BaseModel import DBInitialize
 
 db_session = DBInitialize()
 
+INSERT_SQL = """INSERT INTO DfInfo(type, ipaddress,total,used,free,percent, readCount, writeCount, readBytes, writeBytes, readTime, writeTime, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
 
 def insert(tp, ip, total, used, free, percent, r_count, w_count, r_bytes, w_bytes, r_time, w_time, current_t):
-    sql = """INSERT INTO DfInfo(type, ipaddress,total,used,free,percent, readCount, writeCount, readBytes, writeBytes, readTime, writeTime, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
     data = (tp, ip, total, used, free, percent, r_count, w_count, r_bytes, w_bytes, r_time, w_time, current_t)
-    db_session.db_insert(sql, data)
+    db_session.db_insert(INSERT_SQL, data)
+
+
+# 批量插入，rows 中每一项与 insert 的参数顺序一致
+def insert_many(rows):
+    return db_session.db_insert_many(INSERT_SQL, rows)
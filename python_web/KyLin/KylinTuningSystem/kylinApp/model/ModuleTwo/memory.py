@@ -2,9 +2,15 @@ from ..BaseModel import DBInitialize
 
 db_session = DBInitialize()
 
+INSERT_SQL = """INSERT INTO memoryInfo(type, ipaddress, total, used, free, buffers, cache, swap, percent, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
 def insert(tp, ip, total, used, free, buffers, cache, swap, percent,current_t):
-    sql = """INSERT INTO memoryInfo(type, ipaddress, total, used, free, buffers, cache, swap, percent, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
     data = (tp, ip, total, used, free, buffers, cache, swap, percent, current_t)
-    db_session.db_insert(sql, data)
+    db_session.db_insert(INSERT_SQL, data)
+
+
+# 批量插入，rows 中每一项与 insert 的参数顺序一致
+def insert_many(rows):
+    return db_session.db_insert_many(INSERT_SQL, rows)
 
 
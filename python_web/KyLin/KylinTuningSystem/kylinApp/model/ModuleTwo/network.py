@@ -2,7 +2,13 @@ from ..BaseModel import DBInitialize
 
 db_session = DBInitialize()
 
+INSERT_SQL = """INSERT INTO networkInfo(type, ipaddress,sent,recv, packetSent, packetRecv, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s)"""
+
 def insert(tp, ip, sent, recv, packet_sent, packet_recv, current_t):
-    sql = """INSERT INTO networkInfo(type, ipaddress,sent,recv, packetSent, packetRecv, currentTime) VALUES(%s, %s, %s, %s, %s, %s, %s)"""
     data = (tp, ip, sent, recv, packet_sent, packet_recv, current_t)
-    db_session.db_insert(sql, data)
+    db_session.db_insert(INSERT_SQL, data)
+
+
+# 批量插入，rows 中每一项与 insert 的参数顺序一致
+def insert_many(rows):
+    return db_session.db_insert_many(INSERT_SQL, rows)
@@ -0,0 +1,204 @@
+import datetime
+import json
+import logging
+import selectors
+import socket
+import zlib
+
+from ..ModuleTwo import cpu, disk, memory, network
+from ..write_buffer import MetricWriteBuffer
+from .select_client import FRAME_HEADER, FRAME_MAGIC, cpu_row, decode_payload, disk_row, memory_row, network_row
+
+logger = logging.getLogger(__name__)
+
+# 推送模式默认监听端口，探针通过 --push <地址>:<端口> 连接
+PUSH_DEFAULT_PORT = 7789
+# 单帧负载上限，超过即视为异常连接并断开
+PUSH_MAX_FRAME_SIZE = 16 * 1024 * 1024
+# 写缓冲已满时的处理方式：所有连接共用一个事件循环，不能阻塞等待写线程，只能丢弃最早或最新的行
+PUSH_BUFFER_POLICIES = ('drop_oldest', 'drop_newest')
+
+# 子系统 -> (行转换函数, 批量写入模块)
+PUSH_WRITERS = {
+    'cpu': (cpu_row, cpu),
+    'memory': (memory_row, memory),
+    'disk': (disk_row, disk),
+    'network': (network_row, network),
+}
+
+
+def is_counter(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class MetricFrameDecoder:
+    """
+    还原探针 MetricFrameEncoder 编码的推送会话：full 帧替换全部指标，
+    delta 帧中整数计数器为差值、其余字段为新值，hello 帧中的静态信息合并到每一帧的结果中。
+    """
+
+    def __init__(self):
+        self.static = {}
+        self.current = None
+
+    def decode(self, message):
+        if message['type'] == 'full':
+            self.current = message['values']
+        elif self.current is None:
+            raise ValueError("会话尚未收到完整帧")
+        else:
+            current = dict(self.current)
+            for name, changes in message['values'].items():
+                before = current.get(name)
+                if not isinstance(changes, dict) or not isinstance(before, dict):
+                    current[name] = changes
+                    continue
+                values = dict(before)
+                for field, value in changes.items():
+                    old = values.get(field)
+                    values[field] = old + value if is_counter(old) and is_counter(value) else value
+                current[name] = values
+            self.current = current
+        result = dict(self.current)
+        for name, values in self.static.items():
+            if isinstance(values, dict) and isinstance(result.get(name), dict):
+                result[name] = dict(values, **result[name])
+            else:
+                result.setdefault(name, values)
+        return result
+
+
+class PushConnection:
+    """单个探针的推送连接：累积接收缓冲区并从中切分完整的帧"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        # 探针未在 hello 中声明身份时，以对端IP作为主机标识，与拉取模式入库的 ipaddress 一致
+        self.host = address[0]
+        self.buffer = bytearray()
+        self.frames = 0
+        self.decoder = MetricFrameDecoder()
+
+    def feed(self, data):
+        """追加数据并返回其中所有完整帧的 (标志位, 负载)"""
+        self.buffer += data
+        frames = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            magic, _, flags, _, length = FRAME_HEADER.unpack_from(self.buffer, offset)
+            if magic != FRAME_MAGIC or length > PUSH_MAX_FRAME_SIZE:
+                raise ValueError("无效的帧头")
+            end = offset + FRAME_HEADER.size + length
+            if len(self.buffer) < end:
+                break
+            frames.append((flags, bytes(self.buffer[offset + FRAME_HEADER.size:end])))
+            offset = end
+        if offset:
+            del self.buffer[:offset]
+        return frames
+
+
+class TelemetryCollector:
+    """
+    推送模式采集端：单线程 selectors 事件循环接收所有探针的长连接，
+    把指标帧转换为数据行后交给写缓冲，按条数或时间间隔批量写入 cpuInfo/memoryInfo/DfInfo/networkInfo。
+    写缓冲已满时按 policy 丢弃数据（计入写缓冲的 dropped 计数），事件循环不会因数据库变慢而停止接收。
+    """
+
+    def __init__(self, host='0.0.0.0', port=PUSH_DEFAULT_PORT, batch_size=500, flush_interval=2.0,
+                 max_rows=100000, policy='drop_oldest'):
+        if policy not in PUSH_BUFFER_POLICIES:
+            raise ValueError(f"推送采集端不支持的缓冲策略: {policy}")
+        self.host = host
+        self.port = port
+        self.selector = selectors.DefaultSelector()
+        # 缓存行数达到 batch_size 时立即写库，最长写库间隔 flush_interval 秒
+        self.buffer = MetricWriteBuffer({name: writer.insert_many for name, (_, writer) in PUSH_WRITERS.items()},
+                                        batch_size=batch_size, flush_interval=flush_interval, max_rows=max_rows,
+                                        policy=policy)
+        self.running = False
+
+    def serve_forever(self):
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(128)
+        server_socket.setblocking(False)
+        self.selector.register(server_socket, selectors.EVENT_READ, None)
+        logger.info(f"推送采集端监听 {self.host}:{self.port}")
+        self.running = True
+        try:
+            while self.running:
+                for key, _ in self.selector.select(1.0):
+                    if key.data is None:
+                        self._accept(key.fileobj)
+                    else:
+                        self._read(key.data)
+        finally:
+            self.buffer.close()
+            logger.info(f"推送采集端写入统计: {self.buffer.stats()}")
+            for key in list(self.selector.get_map().values()):
+                key.fileobj.close()
+            self.selector.close()
+
+    def stop(self):
+        self.running = False
+
+    def _accept(self, server_socket):
+        sock, address = server_socket.accept()
+        sock.setblocking(False)
+        self.selector.register(sock, selectors.EVENT_READ, PushConnection(sock, address))
+        logger.info(f"探针接入推送: {address}")
+
+    def _close(self, conn):
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
+        logger.info(f"探针推送连接断开: {conn.host} {conn.address}，共接收 {conn.frames} 帧")
+
+    def _read(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._close(conn)
+            return
+        try:
+            frames = conn.feed(data)
+        except ValueError as e:
+            logger.warning(f"{conn.address} {e}，断开连接")
+            self._close(conn)
+            return
+        for flags, payload in frames:
+            conn.frames += 1
+            try:
+                self._handle_message(conn, json.loads(decode_payload(flags, payload)))
+            except (ValueError, KeyError, AttributeError, TypeError, zlib.error) as e:
+                logger.warning(f"{conn.host} 上报数据无法解析: {e}")
+
+    def _handle_message(self, conn, message):
+        if message.get('type') == 'hello':
+            conn.host = message.get('host') or conn.host
+            # 新会话：重置差分状态
+            conn.decoder = MetricFrameDecoder()
+            conn.decoder.static = message.get('static') or {}
+            logger.info(f"探针 {message.get('hostname')} 以 {conn.host} 身份推送")
+            return
+        if message.get('type') not in ('full', 'delta'):
+            return
+        info = conn.decoder.decode(message)
+        # 与拉取模式一致，使用采集端接收时间作为入库时间，避免各探针时钟偏差
+        insert_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        for name, (to_row, _) in PUSH_WRITERS.items():
+            data = info.get(name)
+            if not data:
+                continue
+            data = dict(data, host=conn.host, time=insert_time)
+            self.buffer.put(name, to_row(data))
+
+    def flush(self):
+        """立即写入缓存的数据行"""
+        self.buffer.flush()
@@ -1,111 +1,428 @@
 import socket, os, datetime, json
+import atexit
+import itertools
+import struct
 import time
+import uuid
+import zlib
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
 from ..ModuleTwo import cpu, disk, memory, network, other
+from ...util import metric_column
+from ..write_buffer import MetricWriteBuffer
 import threading
 # from kylinApp.utils import draw,write_data
 import re
 
 
-def match_leading_digits(text):
+# 帧协议（版本2）：魔数 + 版本 + 标志位 + 请求ID + 负载字节长度，均为网络字节序，与 python_agent.py 保持一致
+FRAME_MAGIC = b'KY'
+FRAME_VERSION = 2
+FRAME_HEADER = struct.Struct('!2sBBII')
+# 帧标志位：负载经 zlib 压缩；请求中携带 compress 字段告知探针可以返回压缩响应
+FRAME_FLAG_ZLIB = 0x01
+ACCEPT_COMPRESSION = ['zlib']
+
+
+def recv_exact(client_socket, size):
+    """读取恰好 size 字节，数据直接写入预分配的 bytearray"""
+    buf = bytearray(size)
+    view = memoryview(buf)
+    received = 0
+    while received < size:
+        n = client_socket.recv_into(view[received:], size - received)
+        if n == 0:
+            raise ConnectionError("连接已被探针关闭")
+        received += n
+    return buf
+
+
+def send_frame(client_socket, payload, request_id=0, flags=0):
+    """按帧协议发送一条消息，帧头与负载合并为一次 sendall"""
+    header = FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, flags, request_id, len(payload))
+    client_socket.sendall(header + payload)
+
+
+def recv_legacy(client_socket, prefix=b""):
     """
-    从字符串的开头开始匹配，直到遇到第一个非数字字符为止。
+    接收旧版探针的响应：十进制长度与 JSON 文本之间没有分隔符。
 
-    :param text: 输入字符串
-    :return: 匹配到的数字部分，如果没有匹配到则返回空字符串
+    :param prefix: 已经读取到的开头字节
+    :return: 去掉长度前缀后的响应文本
     """
-    match = re.match(r'^\d+', text)
-    if match:
-        return match.group(0)
-    else:
-        return ""
-
-def recv_data(client_socket):
-    # 分段接收数据
-    recv_info = ""
-    leng = 0
-    while True:
-        recv_data = client_socket.recv(1024).decode('utf-8')
-        if leng == 0:
-            # print(recv_data)
-            try:
-                len_data = int(recv_data)
-            except ValueError:
-                str_length = int(match_leading_digits(recv_data))
-                len_data = str_length
-
-        recv_info = recv_info + recv_data
-        if isinstance(recv_data, int):
-            leng = leng + len(str(recv_data))
-        else:
-            leng = leng + len(recv_data)
-        if leng >= len_data:
-            break
-    return recv_info
+    buf = bytearray(prefix)
+    match = re.match(rb'^(\d+)\D', buf)
+    while match is None:
+        chunk = client_socket.recv(1024)
+        if not chunk:
+            raise ConnectionError("连接已被探针关闭")
+        buf += chunk
+        match = re.match(rb'^(\d+)\D', buf)
+    length = int(match.group(1))
+    body = buf[match.end(1):]
+    if len(body) < length:
+        body += recv_exact(client_socket, length - len(body))
+    return body[:length].decode('utf-8')
+
+
+def recv_response(client_socket):
+    """
+    接收一条响应，根据开头的魔数区分帧协议与旧版格式。
 
+    :return: (请求ID, 响应文本)，旧版探针的请求ID为 None
+    """
+    prefix = recv_exact(client_socket, len(FRAME_MAGIC))
+    if prefix != FRAME_MAGIC:
+        return None, recv_legacy(client_socket, prefix)
+    header = prefix + recv_exact(client_socket, FRAME_HEADER.size - len(FRAME_MAGIC))
+    _, _, flags, request_id, length = FRAME_HEADER.unpack(header)
+    return request_id, decode_payload(flags, recv_exact(client_socket, length)).decode('utf-8')
 
 
-def remove_leading_numbers(input_string):
-    # 正则表达式模式：匹配开头的一个或多个数字
-    pattern = r'^\d+'
-    # 使用sub函数替换匹配到的部分为空字符串
-    result = re.sub(pattern, '', input_string)
-    return result
+def decode_payload(flags, payload):
+    """按帧标志位还原负载"""
+    if flags & FRAME_FLAG_ZLIB:
+        return zlib.decompress(payload)
+    if flags:
+        raise ValueError(f"不支持的帧标志: {flags}")
+    return payload
 
 
-def set_network_info(data):
+def request_once(host, port: int, command_data: dict, timeout=10.0):
+    """
+    使用一次性连接向探针发送一条命令并返回响应文本。
+
+    请求中携带 proto 字段协商帧协议，新版探针以字节长度帧头回复，旧版探针忽略该字段仍按原格式回复。
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
+        # 设置连接超时和读取超时
+        client_socket.settimeout(timeout)
+        client_socket.connect((host, port))
+        command_data = dict(command_data, proto=FRAME_VERSION, compress=ACCEPT_COMPRESSION)
+        client_socket.sendall(json.dumps(command_data).encode('utf-8'))
+        _, recv_info = recv_response(client_socket)
+        return recv_info
+
+
+class StaleConnectionError(ConnectionError):
+    """请求尚未写入连接时连接已失效，可以安全地换一条连接重试"""
+
+
+class AgentConnection:
+    """到单个探针的长连接，多个请求通过请求ID在同一连接上复用"""
+
+    def __init__(self, host, port: int, timeout=10.0):
+        self.host = host
+        self.port = port
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        self.send_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending = {}
+        # 已超时放弃但探针可能仍在处理的请求ID，收到迟到的响应后移除
+        self.abandoned = set()
+        self.request_ids = itertools.count(1)
+        self.alive = True
+        self.last_used = time.monotonic()
+
+    def handshake(self, command_data, timeout=10.0):
+        """
+        以 JSON 文本发送连接上的第一个请求并协商帧协议。
+
+        :return: (探针是否支持帧协议, 响应文本)
+        """
+        request_id = next(self.request_ids)
+        command_data = dict(command_data, proto=FRAME_VERSION, request_id=request_id)
+        self.sock.settimeout(timeout)
+        self.sock.sendall(json.dumps(command_data).encode('utf-8'))
+        response_id, recv_info = recv_response(self.sock)
+        if response_id is None:
+            return False, recv_info
+        # 升级为帧协议后由读线程按请求ID分发响应
+        self.sock.settimeout(None)
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        return True, recv_info
+
+    def call(self, command_data, timeout=10.0):
+        """在连接上发送一个请求并等待对应请求ID的响应"""
+        self.last_used = time.monotonic()
+        try:
+            return self._send_and_wait(command_data, timeout)
+        finally:
+            self.last_used = time.monotonic()
+
+    def ping(self, timeout=5.0):
+        """健康检查，不刷新连接的最近使用时间"""
+        try:
+            return json.loads(self._send_and_wait({'command': 'ping'}, timeout)) == 'pong'
+        except (OSError, ValueError):
+            return False
+
+    def _send_and_wait(self, command_data, timeout):
+        future = Future()
+        with self.pending_lock:
+            if not self.alive:
+                raise StaleConnectionError(f"到探针 {self.host}:{self.port} 的连接已关闭")
+            request_id = next(self.request_ids)
+            self.pending[request_id] = future
+        payload = json.dumps(command_data).encode('utf-8')
+        try:
+            with self.send_lock:
+                send_frame(self.sock, payload, request_id)
+        except OSError as e:
+            self.close(e)
+            raise StaleConnectionError(f"发送到探针 {self.host}:{self.port} 失败: {e}")
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # 只放弃本次请求，连接上的其他请求不受影响；连接只在读写出错时关闭。
+            # 旧版探针按连接串行处理请求，放弃的请求在收到响应前仍计入连接负载，新请求优先选择其他连接
+            with self.pending_lock:
+                if self.pending.pop(request_id, None) is not None:
+                    self.abandoned.add(request_id)
+            if future.done():
+                return future.result()
+            raise socket.timeout(f"等待探针 {self.host}:{self.port} 响应超时")
+
+    def busy(self):
+        return len(self.pending) + len(self.abandoned)
+
+    def close(self, reason=None):
+        with self.pending_lock:
+            if not self.alive:
+                return
+            self.alive = False
+            pending, self.pending = self.pending, {}
+            self.abandoned.clear()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+        for future in pending.values():
+            future.set_exception(ConnectionError(f"到探针 {self.host}:{self.port} 的连接已断开: {reason}"))
+
+    def _read_loop(self):
+        try:
+            while True:
+                request_id, recv_info = recv_response(self.sock)
+                with self.pending_lock:
+                    future = self.pending.pop(request_id, None)
+                    self.abandoned.discard(request_id)
+                if future is not None:
+                    future.set_result(recv_info)
+        except (OSError, ValueError, zlib.error) as e:
+            self.close(e)
+
+
+class AgentConnectionPool:
+    """
+    按 (host, port) 维护到探针的长连接池。
+
+    新连接的第一个请求用于协商帧协议；旧版探针不支持请求ID，对其退回一次性连接。
+    后台线程定期对空闲连接做健康检查，关闭失效或长期空闲的连接。
+    """
+
+    def __init__(self, max_connections=4, idle_timeout=300, health_interval=30, legacy_recheck=300):
+        self.max_connections = max_connections  # 每个探针的最大连接数
+        self.idle_timeout = idle_timeout  # 空闲超过该时间的连接被关闭（秒）
+        self.health_interval = health_interval  # 健康检查间隔（秒）
+        self.legacy_recheck = legacy_recheck  # 旧版探针重新协商间隔（秒）
+        self.lock = threading.Condition()
+        self.connections = {}
+        self.connecting = {}  # 正在协商中的连接数
+        self.legacy_hosts = {}
+        self.health_thread = None
+
+    def request(self, host, port: int, command_data: dict, timeout=10.0):
+        key = (host, port)
+        command_data = dict(command_data, compress=ACCEPT_COMPRESSION)
+        with self.lock:
+            legacy_since = self.legacy_hosts.get(key, float('-inf'))
+        if time.monotonic() - legacy_since < self.legacy_recheck:
+            return request_once(host, port, command_data, timeout)
+        while True:
+            conn = self._acquire(key, timeout)
+            if conn is None:
+                return self._connect(key, command_data, timeout)
+            try:
+                return conn.call(command_data, timeout)
+            except StaleConnectionError:
+                # 请求尚未发出，丢弃失效连接后重试
+                self._discard(key, conn)
+
+    def close_all(self):
+        with self.lock:
+            connections = [conn for conns in self.connections.values() for conn in conns]
+            self.connections.clear()
+        for conn in connections:
+            conn.close("连接池关闭")
+
+    def _acquire(self, key, timeout):
+        """
+        选择负载最小的可用连接。
+
+        :return: 可用连接；空闲连接不足且未达上限时返回 None，由调用方新建连接
+        """
+        deadline = time.monotonic() + timeout
+        with self.lock:
+            while True:
+                conns = [conn for conn in self.connections.get(key, []) if conn.alive]
+                self.connections[key] = conns
+                idle = [conn for conn in conns if not conn.busy()]
+                if idle:
+                    return idle[0]
+                if len(conns) + self.connecting.get(key, 0) < self.max_connections:
+                    self.connecting[key] = self.connecting.get(key, 0) + 1
+                    return None
+                if conns:
+                    return min(conns, key=AgentConnection.busy)
+                # 连接数已满且全部处于协商中，等待协商完成
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise socket.timeout(f"等待到探针 {key[0]}:{key[1]} 的连接超时")
+                self.lock.wait(remaining)
+
+    def _connect(self, key, command_data, timeout):
+        """新建连接并用当前请求完成协商，调用前须已通过 _acquire 占用协商名额"""
+        try:
+            conn = AgentConnection(key[0], key[1], timeout)
+            try:
+                framed, recv_info = conn.handshake(command_data, timeout)
+            except Exception:
+                conn.close("协商失败")
+                raise
+            if not framed:
+                conn.close("旧版探针")
+                with self.lock:
+                    self.legacy_hosts[key] = time.monotonic()
+                return recv_info
+            with self.lock:
+                self.legacy_hosts.pop(key, None)
+                self.connections.setdefault(key, []).append(conn)
+                if self.health_thread is None:
+                    self.health_thread = threading.Thread(target=self._health_loop, daemon=True)
+                    self.health_thread.start()
+            return recv_info
+        finally:
+            with self.lock:
+                self.connecting[key] -= 1
+                self.lock.notify_all()
+
+    def _discard(self, key, conn):
+        conn.close("连接失效")
+        with self.lock:
+            conns = self.connections.get(key, [])
+            if conn in conns:
+                conns.remove(conn)
+
+    def _health_loop(self):
+        while True:
+            time.sleep(self.health_interval)
+            with self.lock:
+                candidates = [(key, conn) for key, conns in self.connections.items() for conn in conns]
+            now = time.monotonic()
+            for key, conn in candidates:
+                # 只有放弃的请求时仍做健康检查，探针卡住不再响应时 ping 超时并关闭该连接
+                if conn.pending:
+                    continue
+                idle = now - conn.last_used
+                if idle > self.idle_timeout or (idle > self.health_interval and not conn.ping()):
+                    self._discard(key, conn)
+
+
+# 全局连接池实例
+connection_pool = AgentConnectionPool()
+
+
+def request(host, port: int, command_data: dict, timeout=10.0):
+    """通过连接池向探针发送一条命令并返回响应文本"""
+    return connection_pool.request(host, port, command_data, timeout)
+
+
+# 拉取方式采集的数据经写缓冲批量入库，各主机的数据合并为每张表一次多行插入
+metric_buffer = MetricWriteBuffer({
+    'cpu': cpu.insert_many,
+    'memory': memory.insert_many,
+    'disk': disk.insert_many,
+    'network': network.insert_many,
+})
+# 进程退出时写入缓冲区中剩余的数据
+atexit.register(metric_buffer.close)
+
+
+# 以下 *_row 函数把探针上报的数据转换为对应表的一行插入参数，拉取与推送两种采集方式共用。
+# 指标列为数值类型，旧版探针上报的带单位字符串在此换算，无法识别的值写入 NULL
+def network_row(data):
     tp = "recieveNetWorkIfo"
     ip = data.get("host")
-    sent = data.get("net_bytes_sent")
-    recv = data.get("net_bytes_recv")
-    packet_sent = data.get("net_packets_sent")
-    packet_recv = data.get("net_packets_recv")
+    sent = metric_column(data.get("net_bytes_sent"), integer=True)
+    recv = metric_column(data.get("net_bytes_recv"), integer=True)
+    packet_sent = metric_column(data.get("net_packets_sent"), integer=True)
+    packet_recv = metric_column(data.get("net_packets_recv"), integer=True)
     current_t = data.get("time")
-    network.insert(tp, ip, sent, recv, packet_sent, packet_recv, current_t)
+    return tp, ip, sent, recv, packet_sent, packet_recv, current_t
 
 
-def set_memory_info(data):
+def set_network_info(data):
+    metric_buffer.put('network', network_row(data))
+
+
+def memory_row(data):
     tp = "recievememoryInfo"
     ip = data.get("host")
-    total = data.get("mem_total")
-    used = data.get("mem_used")
-    free = data.get("mem_free")
-    buffers = data.get("mem_buffers")
-    cache = data.get("mem_cache")
-    swap = data.get("mem_swap_used")
-    percent = data.get("mem_percent")
+    total = metric_column(data.get("mem_total"), integer=True)
+    used = metric_column(data.get("mem_used"), integer=True)
+    free = metric_column(data.get("mem_free"), integer=True)
+    buffers = metric_column(data.get("mem_buffers"), integer=True)
+    cache = metric_column(data.get("mem_cache"), integer=True)
+    swap = metric_column(data.get("mem_swap_used"), integer=True)
+    percent = metric_column(data.get("mem_percent")) or 0.0
     current_t = data.get("time")
-    memory.insert(tp, ip, total, used, free, buffers, cache, swap, percent, current_t)
+    return tp, ip, total, used, free, buffers, cache, swap, percent, current_t
 
 
-def set_disk_info(data):
+def set_memory_info(data):
+    metric_buffer.put('memory', memory_row(data))
+
+
+def disk_row(data):
     tp = "recieveHDInfo"
     ip = data.get("host")
-    total = data.get("disk_total")
-    used = data.get("disk_used")
-    free = data.get("disk_free")
-    percent = data.get("disk_percent")
-    read_count = data.get("disk_read")
-    write_count = data.get("disk_write")
-    r_bytes = data.get("disk_read")
-    w_bytes = data.get("disk_write")
-    r_time = data.get("time")
-    w_time = data.get("time")
+    total = metric_column(data.get("disk_total"), integer=True)
+    used = metric_column(data.get("disk_used"), integer=True)
+    free = metric_column(data.get("disk_free"), integer=True)
+    percent = metric_column(data.get("disk_percent")) or 0.0
+    # 旧版探针没有读写次数与耗时，写入 NULL
+    read_count = metric_column(data.get("disk_read_count"), integer=True)
+    write_count = metric_column(data.get("disk_write_count"), integer=True)
+    r_bytes = metric_column(data.get("disk_read"), integer=True)
+    w_bytes = metric_column(data.get("disk_write"), integer=True)
+    r_time = metric_column(data.get("disk_read_time"), integer=True)
+    w_time = metric_column(data.get("disk_write_time"), integer=True)
     current_t = data.get("time")
-    disk.insert(tp, ip, total, used, free, percent, read_count, write_count, r_bytes, w_bytes, r_time, w_time, current_t)
+    return tp, ip, total, used, free, percent, read_count, write_count, r_bytes, w_bytes, r_time, w_time, current_t
 
 
-def set_cpu_info(data):
+def set_disk_info(data):
+    metric_buffer.put('disk', disk_row(data))
+
+
+def cpu_row(data):
     tp = "recieveCPUInfo"
     ip = data.get("host")
-    user_t = data.get("cpu_user_time")
-    system_t = data.get("cpu_system_time")
-    wait_io = data.get("cpu_wait_time")
-    idle = data.get("cpu_idle_time")
+    user_t = metric_column(data.get("cpu_user_time"))
+    system_t = metric_column(data.get("cpu_system_time"))
+    wait_io = metric_column(data.get("cpu_wait_time"))
+    idle = metric_column(data.get("cpu_idle_time"))
     count = data.get("cpu_count")
-    percent = data.get("cpu_percent")
+    percent = metric_column(data.get("cpu_percent")) or 0.0
     current_t = data.get("time")
-    cpu.insert(tp, ip, user_t, system_t,wait_io, idle, count, percent,current_t)
+    return tp, ip, user_t, system_t, wait_io, idle, count, percent, current_t
+
+
+def set_cpu_info(data):
+    metric_buffer.put('cpu', cpu_row(data))
 
 
 def set_os_info(data):
@@ -155,93 +472,189 @@ def category(data, tp):
         return {}
 
 
+# 后台采集任务每个周期采集的子系统
+COLLECTION_SUBSYSTEMS = ("cpu", "memory", "disk", "network")
+# Ceph 采集可能需要经 ssh 执行多条 ceph 命令
+CEPH_TIMEOUT = 60.0
+
+
 def get_info(host, port: int, tp):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        # 设置连接超时和读取超时
-        client_socket.settimeout(10.0)  # 10秒超时
-        client_socket.connect((host, port))
-        data = json.dumps({'command': 'get_info',"cluster_ip": "10.21.17.25"})
-        # data = json.dumps({'command': 'get_info'})]]
-        client_socket.sendall(data.encode('utf-8'))
-        recv_info = recv_data(client_socket)
-        recv_info = remove_leading_numbers(recv_info)
-        recv_info = json.loads(recv_info)
-
-        if tp != "ceph_info":
-            recv_info = recv_info["os_information"]
-            set_info(recv_info, host, tp)
-            data_dict = {
-                "info": category(recv_info, tp),
-                "state": "ok"
-            }
-        else:
-            data_dict = {
-                "info": recv_info,
-                "state": "ok"
-            }
-        return data_dict
+    if tp == "ceph_info":
+        return get_ceph_info(host, port)
+    # 只请求需要的子系统，旧版探针会忽略该字段并返回全部数据
+    command_data = {'command': 'get_info', "subsystems": [tp]}
+    recv_info = request(host, port, command_data)
+    recv_info = json.loads(recv_info)["os_information"]
+    set_info(recv_info, host, tp)
+    data_dict = {
+        "info": category(recv_info, tp),
+        "state": "ok"
+    }
+    return data_dict
+
+
+def get_ceph_info(host, port: int, cluster_ip=None, since=0, raw=False):
+    """
+    由 host:port 上的探针采集 Ceph 集群状态，cluster_ip 为空时采集探针所在集群。
+    探针按集群缓存结果并记录 OSD 延迟与 PG 状态的历史，since 之后的采样点在 info.series 中按列返回。
+    """
+    command_data = {'command': 'get_ceph_info', 'cluster_ip': cluster_ip or '', 'since': since, 'raw': raw}
+    recv_info = json.loads(request(host, port, command_data, timeout=CEPH_TIMEOUT))
+    if not isinstance(recv_info, dict):
+        # 旧版探针不认识该命令，返回 unknown command 等文本
+        return {"info": recv_info, "state": "error"}
+    return {"info": recv_info, "state": "ok"}
+
+
+def get_info_batch(host, port: int, subsystems=COLLECTION_SUBSYSTEMS):
+    """
+    一次请求采集多个子系统并分别入库。
+
+    :return: {子系统: {"info": 数据, "state": "ok"}}，结构与 get_info 的返回值一致
+    """
+    command_data = {'command': 'get_info', 'subsystems': list(subsystems)}
+    recv_info = json.loads(request(host, port, command_data))["os_information"]
+    results = {}
+    for tp in subsystems:
+        set_info(recv_info, host, tp)
+        results[tp] = {
+            "info": category(recv_info, tp),
+            "state": "ok"
+        }
+    return results
+
+
+# 火焰图文件：新版探针上报折叠栈，查看 SVG 时由 kylinApp.utils.flamegraph 按需生成
+FLAME_GRAPH_SVG = "./kylinApp/static/img/perf.svg"
+FLAME_GRAPH_FOLDED = "./kylinApp/static/img/perf.folded"
+
+
+def store_flame_graph(result):
+    """保存探针返回的火焰图：新版探针返回折叠栈（返回该结果），旧版探针返回 SVG 文本"""
+    if isinstance(result, dict):
+        with open(FLAME_GRAPH_FOLDED, mode="w") as f:
+            f.write(result["folded"])
+        return result
+    if result.lstrip().startswith("<"):
+        with open(FLAME_GRAPH_SVG, mode="w") as f:
+            f.write(result)
+    else:
+        print(f"火焰图采样失败: {result}")
+
+
+def submit_job(host, port: int, command, options=None):
+    """把耗时命令提交为探针后台作业并返回作业ID；旧版探针不支持后台作业时返回 None"""
+    try:
+        response = json.loads(request(host, port, {'command': 'submit_job', 'job': command, 'options': options or {}}))
+    except ValueError:
+        return None
+    if not isinstance(response, dict):
+        return None
+    return response.get('job_id')
+
+
+def get_job(host, port: int, job_id):
+    """查询后台作业状态，作业完成时 result 字段为命令结果"""
+    return json.loads(request(host, port, {'command': 'job_status', 'job_id': job_id, 'result': True}))
 
 
 # 发送远程执行命令
-def send_command(command_string, host, port: int, change_cpu=None, pid=None):
+def send_command(command_string, host, port: int, change_cpu=None, pid=None, options=None, timeout=10.0):
     print(f"select_client.send_command 被调用")
     print(f"参数: command_string={repr(command_string)}, host={host}, port={port}")
-    
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        # 设置连接超时和读取超时
-        client_socket.settimeout(10.0)  # 10秒超时
-        client_socket.connect((host, port))
-        command_data = {'command': command_string}
-        if change_cpu and pid:
-            command_data["pid"] = pid
-            hex_string = change_cpu
-            decimal_value = int(hex_string, 16)
-            command_data["cpu_id"] = decimal_value
-        data = json.dumps(command_data)
-        print(f"发送的JSON数据: {data}")
-        client_socket.sendall(data.encode('utf-8'))
-        if command_string == "get_flame_graph":
-            recv_info = recv_data(client_socket)
-            recv_info = remove_leading_numbers(recv_info)
-            recv_info = json.loads(recv_info)
-            with open("./kylinApp/static/img/perf.svg", mode="w") as f:
-                f.write(recv_info)
-            return
-        recv_info = recv_data(client_socket)
-        recv_info = remove_leading_numbers(recv_info)
-        print(f"接收到的原始响应: {repr(recv_info)}")
-        if command_string == "get_ps":
-            return recv_info
+
+    command_data = {'command': command_string}
+    if change_cpu and pid:
+        command_data["pid"] = pid
+        hex_string = change_cpu
+        decimal_value = int(hex_string, 16)
+        command_data["cpu_id"] = decimal_value
+    # 附加的命令参数，如 get_top 的 sort、limit
+    if options:
+        command_data.update(options)
+    print(f"发送的JSON数据: {json.dumps(command_data)}")
+    recv_info = request(host, port, command_data, timeout)
+    if command_string == "get_flame_graph":
+        return store_flame_graph(json.loads(recv_info))
+    print(f"接收到的原始响应: {repr(recv_info)}")
+    if command_string == "get_ps":
+        return recv_info
+    else:
+        processed_response = recv_info.encode(errors="ignore").decode('unicode-escape', errors="ignore")
+        print(f"处理后的响应: {repr(processed_response)}")
+        return processed_response
+
+
+class ProcessTableMirror:
+    """
+    某个探针进程表在本端的副本：首次同步取得完整进程表，之后带上会话与版本号，
+    探针只返回新增、消失以及核心/CPU使用率变化的进程。
+    """
+
+    def __init__(self):
+        self.session = uuid.uuid4().hex
+        self.version = None
+        self.rows = {}  # pid -> [CPU核心, CPU使用率, 启动命令]
+        self.lock = threading.Lock()
+
+    def apply(self, response):
+        if response['type'] == 'full':
+            self.rows = {int(pid): row for pid, row in response['rows'].items()}
         else:
-            processed_response = recv_info.encode(errors="ignore").decode('unicode-escape', errors="ignore")
-            print(f"处理后的响应: {repr(processed_response)}")
-            return processed_response
+            for pid in response['removed']:
+                self.rows.pop(int(pid), None)
+            for pid, row in response['added'].items():
+                self.rows[int(pid)] = row
+            for pid, (core, cpu_percent) in response['changed'].items():
+                self.rows[int(pid)][:2] = [core, cpu_percent]
+        self.version = response['version']
+
+    def columns(self):
+        """转换为 get_ps 的按列格式，按进程号排序"""
+        pids = sorted(self.rows)
+        return {
+            'CPU核心': [self.rows[pid][0] for pid in pids],
+            '进程号': pids,
+            '启动命令': [self.rows[pid][2] for pid in pids],
+            'CPU使用率': [self.rows[pid][1] for pid in pids],
+        }
+
+
+# (host, port) -> ProcessTableMirror
+process_tables = {}
+process_tables_lock = threading.Lock()
+
+
+def get_process_table(host, port: int):
+    """增量同步并返回探针的进程表，格式与 get_ps 相同，另附 CPU使用率 列"""
+    with process_tables_lock:
+        mirror = process_tables.setdefault((host, port), ProcessTableMirror())
+    with mirror.lock:
+        options = {'session': mirror.session, 'version': mirror.version}
+        response = json.loads(request(host, port, dict(command='get_ps', **options)))
+        if 'session' not in response:
+            # 旧版探针不支持增量同步，直接返回完整进程表
+            return response
+        mirror.apply(response)
+        return mirror.columns()
+
+
+def get_affinity_profile(host, port: int, limit=16):
+    """读取亲和性规划所需的 CPU 拓扑，以及 CPU 占用最高的 limit 个进程的资源占用"""
+    return json.loads(request(host, port, {'command': 'get_affinity_profile', 'limit': limit}))
+
+
+def apply_affinity(host, port: int, assignments):
+    """按 {pid: CPU编号列表} 批量设置进程亲和性，返回每个进程设置前后的亲和性"""
+    return json.loads(request(host, port, {'command': 'set_cpu_affinity', 'assignments': assignments}))
 
 
 """以下命令使用待定"""
 
 
-# 发送Ceph集群命令的函数
-def send_ceph_command(command, ceph_ip):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as client_socket:
-        client_socket.connect(('10.21.17.85' , 7788))
-        data = json.dumps({'command': command, 'cluster_ip': ceph_ip})
-        client_socket.sendall(data.encode('utf-8'))
-        recv_info = ""
-        leng = 0
-        while True:
-            recv_data = client_socket.recv(1024).decode('utf-8')
-            if leng == 0:
-                len_data = int(recv_data)
-            recv_info = recv_info + recv_data
-            if isinstance(recv_data,int):
-                leng  = leng + len(str(recv_data))
-            else:
-                leng = leng + len(recv_data)
-            if leng == len_data:
-                break
-            print(leng,len_data)
-        print(recv_info)
+# 发送Ceph集群命令的函数，由 host:port 上的探针对 ceph_ip 所在集群执行
+def send_ceph_command(command, ceph_ip, host, port: int):
+    return json.loads(request(host, port, {'command': command, 'cluster_ip': ceph_ip}, timeout=CEPH_TIMEOUT))
 
 # 创建线程的函数
 def create_thread(target_function, args=()):
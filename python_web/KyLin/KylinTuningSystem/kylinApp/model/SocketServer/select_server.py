@@ -15,10 +15,12 @@ def bytes2human(n):
     return "%sB" % n
 # 获取主机名
 hostname = socket.gethostname()
+# 非阻塞方式统计CPU使用率：每次调用返回距上次调用期间的使用率，这里先做一次基准读数
+psutil.cpu_percent(interval=None)
 '''获取CPU信息'''
 def get_cpu_info():
     cpu_count = psutil.cpu_count()
-    cpu_percent = psutil.cpu_percent(interval=2)
+    cpu_percent = psutil.cpu_percent(interval=None)
     return dict(cpu_count=cpu_count, cpu_percent=cpu_percent)
 
 '''获取内存信息'''
@@ -0,0 +1,139 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# 缓冲区满时的处理方式
+BUFFER_POLICIES = ('block', 'drop_oldest', 'drop_newest')
+
+
+class MetricWriteBuffer:
+    """
+    采集数据的写缓冲：各主机的数据行按表累积，缓存行数达到 batch_size 或距上次写库超过 flush_interval 秒时，
+    由后台写线程对每张表执行一次批量插入（executemany 会被 pymysql 合并为多行 INSERT）并提交一次。
+
+    缓冲区最多保存 max_rows 行，已满时按 policy 处理：
+    block 等待写线程腾出空间，超过 put_timeout 秒仍已满则丢弃该行；drop_oldest 丢弃最早的行；drop_newest 丢弃新行。
+    """
+
+    def __init__(self, writers, batch_size=1000, flush_interval=1.0, max_rows=100000, policy='block',
+                 put_timeout=5.0):
+        if policy not in BUFFER_POLICIES:
+            raise ValueError(f"未知的缓冲策略: {policy}")
+        self.writers = writers  # 表名 -> 批量写入函数 insert_many(rows)，返回写入行数
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.policy = policy
+        self.put_timeout = put_timeout
+        self.lock = threading.Condition()
+        self.pending = {name: collections.deque() for name in writers}
+        self.pending_rows = 0
+        self.flushing = 0  # 写线程已取出、尚未写完的行数
+        self.last_flush = time.monotonic()
+        self.counters = collections.Counter()  # written / failed / dropped / batches
+        self.last_flush_latency = None
+        self.writer = None
+        self.closed = False
+
+    def put(self, name, row):
+        """追加一行，返回是否进入缓冲区"""
+        with self.lock:
+            if self.pending_rows >= self.max_rows:
+                if self.policy == 'drop_newest':
+                    self.counters['dropped'] += 1
+                    return False
+                if self.policy == 'drop_oldest':
+                    self._drop_oldest()
+                else:
+                    deadline = time.monotonic() + self.put_timeout
+                    self.lock.notify_all()
+                    while self.pending_rows >= self.max_rows:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.counters['dropped'] += 1
+                            logger.warning(f"写缓冲区已满 {self.max_rows} 行，丢弃 {name} 数据")
+                            return False
+                        self.lock.wait(remaining)
+            self.pending[name].append(row)
+            self.pending_rows += 1
+            if self.writer is None:
+                self.writer = threading.Thread(target=self._writer_loop, name='metric-writer', daemon=True)
+                self.writer.start()
+            if self.pending_rows >= self.batch_size:
+                self.lock.notify_all()
+            return True
+
+    def flush(self):
+        """在当前线程立即写入全部缓存的行"""
+        with self.lock:
+            batches = self._take()
+        self._write(batches)
+
+    def close(self):
+        """停止写线程并写入剩余数据"""
+        with self.lock:
+            self.closed = True
+            self.lock.notify_all()
+            writer = self.writer
+        if writer is not None:
+            writer.join()
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters, pending=self.pending_rows, flushing=self.flushing,
+                        last_flush_latency=self.last_flush_latency)
+
+    def _drop_oldest(self):
+        """丢弃缓存最多的表中最早的一行，调用方须持有 self.lock"""
+        name = max(self.pending, key=lambda key: len(self.pending[key]))
+        self.pending[name].popleft()
+        self.pending_rows -= 1
+        self.counters['dropped'] += 1
+
+    def _take(self):
+        """取出全部缓存的行，调用方须持有 self.lock"""
+        batches = {name: list(rows) for name, rows in self.pending.items() if rows}
+        for rows in self.pending.values():
+            rows.clear()
+        self.flushing += self.pending_rows
+        self.pending_rows = 0
+        self.last_flush = time.monotonic()
+        # 唤醒因缓冲区已满而等待的生产者
+        self.lock.notify_all()
+        return batches
+
+    def _write(self, batches):
+        start = time.monotonic()
+        for name, rows in batches.items():
+            for offset in range(0, len(rows), self.batch_size):
+                chunk = rows[offset:offset + self.batch_size]
+                try:
+                    written = self.writers[name](chunk) or 0
+                except Exception as e:
+                    logger.error(f"批量写入 {name} 失败: {e}")
+                    written = 0
+                with self.lock:
+                    self.counters['batches'] += 1
+                    self.counters['written'] += written
+                    self.counters['failed'] += len(chunk) - written
+                    self.flushing -= len(chunk)
+        if batches:
+            with self.lock:
+                self.last_flush_latency = round(time.monotonic() - start, 3)
+
+    def _writer_loop(self):
+        while True:
+            with self.lock:
+                while not self.closed and self.pending_rows < self.batch_size:
+                    remaining = self.last_flush + self.flush_interval - time.monotonic()
+                    if remaining <= 0 and self.pending_rows:
+                        break
+                    self.lock.wait(remaining if remaining > 0 else self.flush_interval)
+                if self.closed:
+                    return
+                batches = self._take()
+            self._write(batches)
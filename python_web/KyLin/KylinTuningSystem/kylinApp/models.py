@@ -50,41 +50,45 @@ class ServerManagement(models.Model):
         db_table = "fuwuxingxiguanli"
 
 
+# 以下四张指标表可由 maintain_metric_partitions 按 currentTime 分区，分区后的唯一约束必须包含 currentTime
 class CPUPerformanceMetrics(models.Model):
-    # 采集CPU性能指标
+    # 采集CPU性能指标，各项为累计秒数
     type = models.CharField(max_length=64)
     ipaddress = models.CharField(max_length=64)
-    userTime = models.CharField(max_length=64)
-    SystemTime = models.CharField(max_length=64)
-    waitIO = models.CharField(max_length=64)
-    Idle = models.CharField(max_length=64)
+    userTime = models.FloatField(null=True)
+    SystemTime = models.FloatField(null=True)
+    waitIO = models.FloatField(null=True)
+    Idle = models.FloatField(null=True)
 
     count = models.IntegerField(default=0)
-    percent = models.DecimalField(max_digits=5, decimal_places=2,default=0.00)
+    percent = models.FloatField(default=0.0)
 
     currentTime = models.DateTimeField()
 
     class Meta:
         db_table = "cpuInfo"
+        # 按主机查询最新值与时间范围
+        indexes = [models.Index(fields=['ipaddress', 'currentTime'], name='cpuinfo_ip_time')]
 
 
 class MemoryPerformanceMetrics(models.Model):
-    # 采集内存性能指标
+    # 采集内存性能指标，各项为字节数
     type = models.CharField(max_length=64)
     ipaddress = models.CharField(max_length=64)
-    total = models.CharField(max_length=64)
-    used = models.CharField(max_length=64)
-    free = models.CharField(max_length=64)
-    buffers = models.CharField(max_length=64)
-    cache = models.CharField(max_length=64)
-    swap = models.CharField(max_length=64)
+    total = models.BigIntegerField(null=True)
+    used = models.BigIntegerField(null=True)
+    free = models.BigIntegerField(null=True)
+    buffers = models.BigIntegerField(null=True)
+    cache = models.BigIntegerField(null=True)
+    swap = models.BigIntegerField(null=True)
 
-    percent = models.DecimalField(max_digits=5, decimal_places=2, default=0.00)
+    percent = models.FloatField(default=0.0)
 
     currentTime = models.DateTimeField()
 
     class Meta:
         db_table = "memoryInfo"
+        indexes = [models.Index(fields=['ipaddress', 'currentTime'], name='memoryinfo_ip_time')]
 
 
 class DiskPerformanceMetrics(models.Model):
@@ -92,21 +96,23 @@ class DiskPerformanceMetrics(models.Model):
     type = models.CharField(max_length=64)
     ipaddress = models.CharField(max_length=64)
 
-    total = models.CharField(max_length=64, default="")
-    used = models.CharField(max_length=64, default="")
-    free = models.CharField(max_length=64, default="")
-    percent = models.DecimalField(max_digits=5,decimal_places=2, default=0.00)
-
-    readCount = models.CharField(max_length=64)
-    writeCount = models.CharField(max_length=64)
-    readBytes = models.CharField(max_length=64)
-    writeBytes = models.CharField(max_length=64)
-    readTime = models.CharField(max_length=64)
-    writeTime = models.CharField(max_length=64)
+    total = models.BigIntegerField(null=True)
+    used = models.BigIntegerField(null=True)
+    free = models.BigIntegerField(null=True)
+    percent = models.FloatField(default=0.0)
+
+    # 累计读写次数、字节数与耗时（毫秒）
+    readCount = models.BigIntegerField(null=True)
+    writeCount = models.BigIntegerField(null=True)
+    readBytes = models.BigIntegerField(null=True)
+    writeBytes = models.BigIntegerField(null=True)
+    readTime = models.BigIntegerField(null=True)
+    writeTime = models.BigIntegerField(null=True)
     currentTime = models.DateTimeField()
 
     class Meta:
         db_table = "DfInfo"
+        indexes = [models.Index(fields=['ipaddress', 'currentTime'], name='dfinfo_ip_time')]
 
 
 class NetworkPerformanceMetrics(models.Model):
@@ -114,16 +120,17 @@ class NetworkPerformanceMetrics(models.Model):
     type = models.CharField(max_length=64)
     ipaddress = models.CharField(max_length=64)
 
-    sent = models.CharField(max_length=64,default="")
-    recv = models.CharField(max_length=64,default="")
+    sent = models.BigIntegerField(null=True)
+    recv = models.BigIntegerField(null=True)
 
 
-    packetSent = models.CharField(max_length=64)
-    packetRecv = models.CharField(max_length=64)
+    packetSent = models.BigIntegerField(null=True)
+    packetRecv = models.BigIntegerField(null=True)
     currentTime = models.DateTimeField()
 
     class Meta:
         db_table = "networkInfo"
+        indexes = [models.Index(fields=['ipaddress', 'currentTime'], name='networkinfo_ip_time')]
 
 
 class AdditionalInformation(models.Model):
@@ -177,3 +184,56 @@ class LogRecord(models.Model):
         
     def __str__(self):
         return self.title
+
+
+class FlameGraphProfile(models.Model):
+    """火焰图采样记录：按主机和采样时间窗口保存折叠栈"""
+    host = models.CharField(verbose_name="主机IP", max_length=64)
+    label = models.CharField(verbose_name="标签", max_length=100, blank=True, default='')
+    start_time = models.DateTimeField(verbose_name="采样开始时间")
+    end_time = models.DateTimeField(verbose_name="采样结束时间")
+    frequency = models.IntegerField(verbose_name="采样频率", default=99)
+    samples = models.IntegerField(verbose_name="样本数", default=0)
+    stack_count = models.IntegerField(verbose_name="调用栈数", default=0)
+    # 帧名去重后的字符串表 + 调用栈帧编号数组 + 样本数数组，zlib 压缩，见 kylinApp.utils.flamegraph.encode_stacks
+    data = models.BinaryField(verbose_name="折叠栈")
+    # 探针后台作业ID，同一作业的结果被多次轮询到时只保存一次；旧版探针同步返回时为空
+    job_id = models.CharField(verbose_name="作业ID", max_length=64, unique=True, null=True, blank=True)
+    # 探针每次实际采样生成的ID，探针缓存命中时多个作业或请求返回的是同一次采样，只保存一次；旧版探针为空
+    sample_id = models.CharField(verbose_name="采样ID", max_length=64, unique=True, null=True, blank=True)
+    created_at = models.DateTimeField(verbose_name="创建时间", auto_now_add=True)
+
+    class Meta:
+        db_table = "flame_profiles"
+        ordering = ['-end_time']
+        indexes = [models.Index(fields=['host', 'end_time'], name='flame_profiles_host_end')]
+
+    def __str__(self):
+        return f"{self.host} {self.start_time} ~ {self.end_time}"
+
+
+class CollectionSchedule(models.Model):
+    """后台采集计划：由持有租约的进程执行，并记录最近一次采集的耗时与错误统计"""
+    task_id = models.CharField(verbose_name="任务ID", max_length=100, unique=True)
+    ip = models.CharField(verbose_name="ip地址", max_length=64)
+    port = models.IntegerField(verbose_name="端口")
+    interval = models.IntegerField(verbose_name="采集间隔（秒）", default=30)
+    enabled = models.BooleanField(verbose_name="是否启用", default=True)
+    # 租约：owner 为执行该计划的进程，lease_expires 之前其他进程不会接管
+    owner = models.CharField(verbose_name="执行进程", max_length=128, blank=True, default='')
+    lease_expires = models.DateTimeField(verbose_name="租约到期时间", null=True, blank=True)
+    created_at = models.DateTimeField(verbose_name="创建时间", auto_now_add=True)
+    last_run = models.DateTimeField(verbose_name="最后采集时间", null=True, blank=True)
+    last_success = models.DateTimeField(verbose_name="最后成功时间", null=True, blank=True)
+    last_latency = models.FloatField(verbose_name="最后采集耗时（秒）", null=True, blank=True)
+    last_error = models.TextField(verbose_name="最后错误", blank=True, default='')
+    run_count = models.IntegerField(verbose_name="采集次数", default=0)
+    error_count = models.IntegerField(verbose_name="连续错误次数", default=0)
+    total_errors = models.IntegerField(verbose_name="累计错误次数", default=0)
+
+    class Meta:
+        db_table = "collection_schedules"
+        indexes = [models.Index(fields=['enabled', 'lease_expires'], name='collection_sched_lease')]
+
+    def __str__(self):
+        return f"{self.task_id} {self.ip}:{self.port}"
@@ -0,0 +1,28 @@
+import time
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase
+
+from kylinApp.utils.background_tasks import BackgroundTaskManager
+
+
+class CollectionSchedulerTests(SimpleTestCase):
+    """采集调度：同一任务ID停止后重新启动（如租约被其他进程接管后再次接管）时只保留一条调度链"""
+
+    def test_restarted_task_dispatches_only_new_entry(self):
+        manager = BackgroundTaskManager(max_workers=1, jitter=0)
+        dispatched = []
+        manager._collect = lambda task_id, task_info: dispatched.append(task_info)
+        schedule = SimpleNamespace(task_id='127.0.0.1:8000', ip='127.0.0.1', port=8000, interval=30)
+        # 持有锁期间调度线程无法出队，两次启动的条目同时留在堆中
+        with manager.lock:
+            manager._start_local(schedule)
+            manager._stop_local(schedule.task_id)
+            manager._start_local(schedule)
+            task_info = manager.tasks[schedule.task_id]
+            self.assertEqual(len(manager.queue), 2)
+        deadline = time.monotonic() + 5
+        while (manager.queue or not dispatched) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        time.sleep(0.1)
+        self.assertEqual(dispatched, [task_info])
@@ -1,6 +1,117 @@
+import re
+
+
 def dict_to_custom_str(data):
     return "; ".join([f"{k}={v}" for k, v in data.items()])
 
+
+# 探针上报与数据库保存的都是原始数值（字节数、秒数），只在展示时格式化
+# 以字节为单位的字段，包括探针上报的字段名与 get_info_to_ai 中的字段名
+METRIC_BYTE_FIELDS = {
+    'mem_total', 'mem_used', 'mem_free', 'mem_buffers', 'mem_cache', 'mem_cached',
+    'mem_swap', 'mem_swap_total', 'mem_swap_used', 'mem_swap_free', 'swap_total', 'swap_used',
+    'disk_total', 'disk_used', 'disk_free', 'disk_read', 'disk_write',
+    'net_bytes_sent', 'net_bytes_recv', 'net_sent', 'net_recv',
+    'VIRT', 'RES', 'SHR',
+}
+# 以字节/秒为单位的速率字段
+METRIC_RATE_FIELDS = {'disk_read_rate', 'disk_write_rate', 'net_sent_rate', 'net_recv_rate'}
+# 以秒为单位的累计时间字段
+METRIC_SECONDS_FIELDS = {
+    'cpu_user_time', 'cpu_system_time', 'cpu_idle_time', 'cpu_wait_time',
+    'cpu_userTime', 'cpu_SystemTime', 'cpu_waitIO', 'cpu_Idle', 'TIME+',
+}
+HUMAN_UNITS = ('B', 'K', 'M', 'G', 'T', 'P', 'E', 'Z', 'Y')
+
+
+def bytes2human(n):
+    for i in range(len(HUMAN_UNITS) - 1, 0, -1):
+        if n >= 1 << i * 10:
+            return f'{n / (1 << i * 10):.1f}{HUMAN_UNITS[i]}'
+    return f"{int(n)}B"
+
+
+def seconds2human(n):
+    days, rest = divmod(int(n), 86400)
+    clock = f"{rest // 3600:02d}:{rest % 3600 // 60:02d}:{rest % 60:02d}"
+    return f"{days}天 {clock}" if days else clock
+
+
+def parse_metric_number(value, default=0.0):
+    """
+    把指标值转换为数值。新数据为原始数值；
+    旧数据可能是带单位的字符串（如 "12.3G"）或 时:分:秒，也一并换算为字节数或秒数。
+    """
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return value
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    match = re.fullmatch(r'([\d.]+)([BKMGTPEZY])', text)
+    if match:
+        return float(match.group(1)) * (1 << HUMAN_UNITS.index(match.group(2)) * 10)
+    match = re.fullmatch(r'(\d+):(\d{2}):(\d{2})', text)
+    if match:
+        hours, minutes, seconds = map(int, match.groups())
+        return hours * 3600 + minutes * 60 + seconds
+    return default
+
+
+def metric_column(value, integer=False):
+    """把指标值转换为数值列的取值：字节数、次数等整数列取整，无法识别的值为 None"""
+    number = parse_metric_number(value, None)
+    if number is None or not integer:
+        return number
+    return int(number)
+
+
+def format_io_latency(data):
+    """把探针 get_biotop 返回的块设备统计格式化为 biolatency 风格的文本，用于 IO 分析页面展示"""
+    lines = [f"采样 {data['duration']} 秒，间隔 {data['interval']} 秒，共 {data['samples']} 次"]
+    if not data['devices']:
+        lines.append("采样期间没有块设备 IO")
+    for name, stats in data['devices'].items():
+        lines.append("")
+        lines.append(f"设备 {name}")
+        lines.append(f"  读 {stats['read_iops']} IOPS {bytes2human(stats['read_bytes_per_sec'])}/s，"
+                     f"写 {stats['write_iops']} IOPS {bytes2human(stats['write_bytes_per_sec'])}/s")
+        lines.append(f"  利用率 {stats['util_percent']}%，平均队列深度 {stats['avg_queue_depth']}，"
+                     f"最大在途 IO {stats['max_in_flight']}")
+        lines.append(f"  平均延迟 读 {stats['read_latency_ms']}ms，写 {stats['write_latency_ms']}ms")
+        for kind, label in (('read', '读'), ('write', '写')):
+            buckets = stats['latency_histogram'].get(kind)
+            if not buckets:
+                continue
+            peak = max(count for _, _, count in buckets) or 1
+            lines.append(f"  {label}延迟(ms)      : 次数     分布")
+            for low, high, count in buckets:
+                bar = '*' * round(count * 40 / peak)
+                lines.append(f"  {low:>6} -> {high:<6} : {count:<8} |{bar:<40}|")
+    return "\n".join(lines)
+
+
+def humanize_metrics(data):
+    """返回格式化后的副本，用于页面展示与 AI 摘要；嵌套的子系统字典同样处理"""
+    result = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            value = humanize_metrics(value)
+        elif key in METRIC_BYTE_FIELDS | METRIC_RATE_FIELDS | METRIC_SECONDS_FIELDS:
+            number = parse_metric_number(value, None)
+            if number is not None:
+                if key in METRIC_BYTE_FIELDS:
+                    value = bytes2human(number)
+                elif key in METRIC_RATE_FIELDS:
+                    value = bytes2human(number) + '/s'
+                else:
+                    value = seconds2human(number)
+        result[key] = value
+    return result
+
 # 新增：AI推理用的数据获取函数
 from kylinApp.models import CPUPerformanceMetrics, MemoryPerformanceMetrics, DiskPerformanceMetrics, NetworkPerformanceMetrics
 
@@ -56,4 +167,4 @@ def get_info_to_ai():
             'net_packetRecv': net.packetRecv,
             'net_time': net.currentTime.strftime('%Y-%m-%d %H:%M:%S'),
         })
-    return data 
+    return humanize_metrics(data) 
@@ -0,0 +1,87 @@
+import math
+
+
+# 规划时每个进程至少分配一个物理核；CPU 使用率低于该值的进程不参与规划
+PLAN_MIN_CPU_PERCENT = 1.0
+
+
+def physical_cores(topology):
+    """按 NUMA 节点分组物理核，每个物理核为其 SMT 兄弟线程的 CPU 编号元组"""
+    nodes = {}
+    seen = set()
+    for cpu in topology:
+        core = tuple(cpu['siblings']) or (cpu['cpu'],)
+        if core in seen:
+            continue
+        seen.add(core)
+        nodes.setdefault(cpu['node'], []).append(core)
+    return nodes
+
+
+def evaluate(processes, assignments, topology):
+    """
+    评估一组亲和性：每个进程可运行的 NUMA 节点、本地内存比例（内存页位于可运行节点上的比例），
+    以及与其他被评估进程共享的物理核数。assignments 为 {pid: CPU编号列表}。
+    """
+    node_of = {cpu['cpu']: cpu['node'] for cpu in topology}
+    core_of = {cpu['cpu']: tuple(cpu['siblings']) or (cpu['cpu'],) for cpu in topology}
+    cores = {proc['pid']: {core_of[cpu] for cpu in assignments[proc['pid']] if cpu in core_of} for proc in processes}
+    rows = []
+    local_pages = total_pages = 0
+    for proc in processes:
+        cpus = assignments[proc['pid']]
+        nodes = sorted({node_of[cpu] for cpu in cpus if cpu in node_of})
+        pages = {int(node): count for node, count in proc.get('numa_pages', {}).items()}
+        local = sum(count for node, count in pages.items() if node in nodes)
+        total = sum(pages.values())
+        local_pages += local
+        total_pages += total
+        shared = set()
+        for other in processes:
+            if other['pid'] != proc['pid']:
+                shared |= cores[proc['pid']] & cores[other['pid']]
+        rows.append(dict(pid=proc['pid'], cpus=sorted(cpus), nodes=nodes,
+                         local_memory_ratio=round(local / total, 3) if total else 1.0,
+                         shared_cores=len(shared)))
+    return dict(
+        processes=rows,
+        local_memory_ratio=round(local_pages / total_pages, 3) if total_pages else 1.0,
+        cross_node_processes=sum(1 for row in rows if len(row['nodes']) > 1),
+        smt_conflicts=sum(1 for row in rows if row['shared_cores']),
+    )
+
+
+def plan(profile, min_cpu_percent=PLAN_MIN_CPU_PERCENT):
+    """
+    根据探针 get_affinity_profile 返回的数据为 CPU 占用最高的进程分配 CPU：
+    按 CPU 使用率从高到低，每个进程按需要的物理核数（使用率/100 向上取整）独占整个物理核（含 SMT 兄弟线程），
+    优先放在其内存页最多的 NUMA 节点上；该节点空闲物理核不足时换到能容纳它的节点，
+    都不足时跨节点分配，没有空闲物理核时与负载最低的物理核共享。
+    返回 {pid: CPU编号列表} 以及规划前后的评估报告。
+    """
+    topology = profile['topology']
+    processes = [proc for proc in profile['processes'] if proc['cpu_percent'] >= min_cpu_percent]
+    processes.sort(key=lambda proc: proc['cpu_percent'], reverse=True)
+    nodes = physical_cores(topology)
+    load = {core: 0 for cores in nodes.values() for core in cores}
+    assignments = {}
+    for proc in processes:
+        need = max(1, math.ceil(proc['cpu_percent'] / 100))
+        pages = {int(node): count for node, count in proc.get('numa_pages', {}).items()}
+
+        def free_cores(node):
+            return [core for core in nodes[node] if not load[core]]
+
+        # 首选内存页最多的节点，其次空闲物理核多的节点
+        order = sorted(nodes, key=lambda node: (-pages.get(node, 0), -len(free_cores(node)), node))
+        chosen = next((free_cores(node)[:need] for node in order if len(free_cores(node)) >= need), None)
+        if chosen is None:
+            chosen = [core for node in order for core in free_cores(node)][:need]
+        if not chosen:
+            chosen = [min(nodes[order[0]], key=lambda core: load[core])]
+        for core in chosen:
+            load[core] += 1
+        assignments[proc['pid']] = sorted(cpu for core in chosen for cpu in core)
+    before = evaluate(processes, {proc['pid']: proc['affinity'] for proc in processes}, topology)
+    return dict(assignments=assignments, processes=processes, before=before,
+                after=evaluate(processes, assignments, topology))
@@ -1,10 +1,20 @@
+import heapq
+import itertools
+import os
+import random
+import socket
 import threading
 import time
 import json
 import logging
-from datetime import datetime
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from django.db import close_old_connections
+from django.db.models import F, Q
 from django.utils import timezone
-from ..models import CPUPerformanceMetrics, MemoryPerformanceMetrics, DiskPerformanceMetrics, NetworkPerformanceMetrics
+from ..models import CPUPerformanceMetrics, MemoryPerformanceMetrics, DiskPerformanceMetrics, NetworkPerformanceMetrics, \
+    CollectionSchedule
 from ..model.SocketServer import select_client
 
 # 配置日志
@@ -18,287 +28,298 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 每个采集周期采集的子系统及其日志名称
+COLLECTION_LABELS = {
+    'cpu': 'CPU',
+    'memory': '内存',
+    'disk': '磁盘',
+    'network': '网络',
+}
+# 执行采集的工作线程数，所有任务共用
+COLLECTION_WORKERS = 16
+# 采集间隔的随机抖动比例，避免大量任务在同一时刻采集
+COLLECTION_JITTER = 0.1
+# 采集计划保存在数据库中，由持有租约的进程执行：租约时长与续约/同步间隔（秒）
+COLLECTION_LEASE_SECONDS = 30
+COLLECTION_SYNC_INTERVAL = 10
+# all：本进程参与执行采集计划；none：只登记计划，由其他进程（如 run_collection_scheduler）执行
+COLLECTION_ROLE = os.getenv('KYLIN_COLLECTION_ROLE', 'all')
+# Web 服务进程（wsgi/asgi 入口，包括 runserver）启动时是否恢复数据库中的采集计划，设为 0 时不恢复
+COLLECTION_AUTOSTART = os.getenv('KYLIN_COLLECTION_AUTOSTART', '1') != '0'
+
 class BackgroundTaskManager:
-    """后台任务管理器"""
+    """
+    后台任务管理器。
+
+    采集计划保存在 CollectionSchedule 表中，进程重启或多进程部署时不会丢失。每个计划带有租约，
+    同一时刻只有持有租约的进程执行它；同步线程定期续约、接管无人执行或租约过期的计划，
+    并使本进程的调度与数据库一致。
+
+    本进程的采集共用一个调度线程：按下次采集时间维护最小堆，到期的任务交给有界的工作线程池执行，
+    采集完成后按间隔（带随机抖动）重新入堆。每个任务以自己的 Event 作为停止信号，停止立即生效。
+    """
     
-    def __init__(self):
-        self.tasks = {}  # 存储正在运行的任务
-        self.lock = threading.Lock()
-        self.max_retries = 3  # 最大重试次数
+    def __init__(self, max_workers=COLLECTION_WORKERS, jitter=COLLECTION_JITTER, role=COLLECTION_ROLE):
+        self.tasks = {}  # 本进程正在执行的任务
+        self.lock = threading.Condition()
+        self.max_retries = 3  # 连续失败达到该次数后延长重试间隔
         self.retry_interval = 5  # 重试间隔（秒）
+        self.jitter = jitter
+        self.role = role
+        # 租约持有者标识
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.queue = []  # (到期时间, 序号, 任务ID, 任务信息) 最小堆
+        self.sequence = itertools.count()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='collection')
+        self.scheduler = None
+        self.sync_thread = None
     
-    def start_collection_task(self, task_id, ip, port, interval=30):
-        """启动采集任务"""
+    def resume(self):
+        """启动同步线程：恢复数据库中的采集计划并定期续约，重复调用无副作用"""
         with self.lock:
-            if task_id in self.tasks:
-                logger.warning(f"任务已存在: {task_id}")
-                return False, "任务已存在"
-            
-            # 创建任务线程
-            task_thread = threading.Thread(
-                target=self._collection_worker,
-                args=(task_id, ip, port, interval),
-                daemon=True
-            )
-            
-            self.tasks[task_id] = {
-                'thread': task_thread,
-                'running': True,
-                'ip': ip,
-                'port': port,
-                'interval': interval,
-                'start_time': timezone.now(),
-                'error_count': 0,  # 错误计数
-                'last_success': None,  # 最后一次成功时间
-                'status': 'starting'  # 任务状态
-            }
-            
-            logger.info(f"启动采集任务: {task_id}, IP: {ip}, Port: {port}, Interval: {interval}s")
-            task_thread.start()
-            return True, "任务启动成功"
+            if self.sync_thread is not None:
+                return
+            self.sync_thread = threading.Thread(target=self._sync_loop, name='collection-sync', daemon=True)
+            self.sync_thread.start()
+        logger.info(f"采集计划同步已启动: {self.owner}, 角色: {self.role}")
+    
+    def start_collection_task(self, task_id, ip, port, interval=30):
+        """登记采集计划，本进程参与执行时立即接管"""
+        if CollectionSchedule.objects.filter(task_id=task_id).exists():
+            logger.warning(f"任务已存在: {task_id}")
+            return False, "任务已存在"
+        schedule = CollectionSchedule.objects.create(task_id=task_id, ip=ip, port=port, interval=interval)
+        logger.info(f"启动采集任务: {task_id}, IP: {ip}, Port: {port}, Interval: {interval}s")
+        if self.role != 'none' and self._claim(schedule):
+            self._start_local(schedule)
+        self.resume()
+        return True, "任务启动成功"
     
     def stop_collection_task(self, task_id):
-        """停止采集任务"""
-        with self.lock:
-            if task_id not in self.tasks:
-                logger.warning(f"任务不存在: {task_id}")
-                return False, "任务不存在"
-            
-            logger.info(f"停止采集任务: {task_id}")
-            
-            # 立即设置停止标志
-            self.tasks[task_id]['running'] = False
-            self.tasks[task_id]['status'] = 'stopping'
-            
-            # 等待线程真正停止
-            thread = self.tasks[task_id]['thread']
-            if thread.is_alive():
-                logger.info(f"等待任务线程停止: {task_id}")
-                
-                # 多次尝试停止，每次等待较短时间
-                for attempt in range(3):
-                    thread.join(timeout=5)  # 每次等待5秒
-                    if not thread.is_alive():
-                        logger.info(f"任务线程已停止: {task_id}")
-                        break
-                    else:
-                        logger.warning(f"任务线程仍在运行，尝试 {attempt + 1}/3: {task_id}")
-                
-                if thread.is_alive():
-                    logger.warning(f"任务线程未能及时停止，强制标记为停止: {task_id}")
-            
-            # 确保状态更新为stopped
-            self.tasks[task_id]['status'] = 'stopped'
-            self.tasks[task_id]['running'] = False
-            logger.info(f"任务已停止: {task_id}")
-            return True, "任务停止成功"
+        """停止采集任务：本进程执行的任务立即停止，其他进程执行的任务在其下次同步时停止"""
+        if not CollectionSchedule.objects.filter(task_id=task_id).update(enabled=False, owner='', lease_expires=None):
+            logger.warning(f"任务不存在: {task_id}")
+            return False, "任务不存在"
+        self._stop_local(task_id)
+        logger.info(f"任务已停止: {task_id}")
+        return True, "任务停止成功"
     
     def cleanup_task(self, task_id):
         """清理已停止的任务"""
-        with self.lock:
-            if task_id in self.tasks and self.tasks[task_id]['status'] == 'stopped':
-                del self.tasks[task_id]
-                logger.info(f"清理任务: {task_id}")
+        if CollectionSchedule.objects.filter(task_id=task_id, enabled=False).delete()[0]:
+            logger.info(f"清理任务: {task_id}")
     
     def cleanup_stopped_tasks(self):
         """清理所有已停止的任务"""
-        with self.lock:
-            stopped_tasks = []
-            for task_id, task_info in self.tasks.items():
-                if task_info['status'] == 'stopped':
-                    stopped_tasks.append(task_id)
-            
-            for task_id in stopped_tasks:
-                del self.tasks[task_id]
-                logger.info(f"自动清理已停止任务: {task_id}")
-            
-            if stopped_tasks:
-                logger.info(f"共清理了 {len(stopped_tasks)} 个已停止的任务")
+        count = CollectionSchedule.objects.filter(enabled=False).delete()[0]
+        if count:
+            logger.info(f"共清理了 {count} 个已停止的任务")
     
     def force_stop_all_tasks(self):
-        """强制停止所有任务"""
+        """强制停止并删除所有采集计划"""
+        logger.warning("执行强制停止所有任务操作")
+        stopped_count = CollectionSchedule.objects.all().delete()[0]
         with self.lock:
-            logger.warning("执行强制停止所有任务操作")
-            stopped_count = 0
-            
-            for task_id, task_info in list(self.tasks.items()):
-                try:
-                    # 设置停止标志
-                    task_info['running'] = False
-                    task_info['status'] = 'force_stopped'
-                    
-                    # 强制终止线程
-                    thread = task_info.get('thread')
-                    if thread and thread.is_alive():
-                        logger.warning(f"强制停止任务线程: {task_id}")
-                        # 注意：Python中无法强制杀死线程，只能设置标志让线程自己退出
-                        # 这里我们设置较短的超时时间
-                        thread.join(timeout=2)
-                        if thread.is_alive():
-                            logger.error(f"任务线程无法停止: {task_id}")
-                    
-                    stopped_count += 1
-                    logger.info(f"强制停止任务: {task_id}")
-                    
-                except Exception as e:
-                    logger.error(f"强制停止任务 {task_id} 时出错: {e}")
-            
-            # 清空所有任务
+            for task_info in self.tasks.values():
+                task_info['cancel'].set()
+            # 堆中残留的条目属于已取消的任务信息，出队时被忽略
             self.tasks.clear()
-            logger.warning(f"已强制停止并清理 {stopped_count} 个任务")
-            
-            return stopped_count
+        logger.warning(f"已强制停止并清理 {stopped_count} 个任务")
+        return stopped_count
     
     def get_task_status(self, task_id):
-        """获取任务状态"""
-        with self.lock:
-            if task_id not in self.tasks:
-                return None
-            task_info = self.tasks[task_id].copy()
-            # 移除不可序列化的线程对象
-            task_info.pop('thread', None)
-            # 转换时间对象为字符串
-            task_info['start_time'] = task_info['start_time'].strftime('%Y-%m-%d %H:%M:%S')
-            if task_info['last_success']:
-                task_info['last_success'] = task_info['last_success'].strftime('%Y-%m-%d %H:%M:%S')
-            return task_info
+        """获取任务状态及最近一次采集的耗时与错误统计"""
+        schedule = CollectionSchedule.objects.filter(task_id=task_id).first()
+        if schedule is None:
+            return None
+        return self._describe(schedule)
     
     def get_all_tasks(self):
         """获取所有任务"""
+        return list(CollectionSchedule.objects.values_list('task_id', flat=True))
+    
+    def get_all_task_stats(self):
+        """所有采集计划的状态与统计"""
+        return [self._describe(schedule) for schedule in CollectionSchedule.objects.order_by('task_id')]
+    
+    def sync(self):
+        """续约本进程持有的计划，接管无人执行或租约过期的计划，并使本地调度与数据库一致"""
+        close_old_connections()
+        now = timezone.now()
+        CollectionSchedule.objects.filter(owner=self.owner, enabled=True).update(
+            lease_expires=now + timedelta(seconds=COLLECTION_LEASE_SECONDS))
+        if self.role != 'none':
+            for schedule in CollectionSchedule.objects.filter(enabled=True).filter(
+                    Q(owner='') | Q(lease_expires__isnull=True) | Q(lease_expires__lt=now)):
+                self._claim(schedule)
+        owned = {schedule.task_id: schedule for schedule in CollectionSchedule.objects.filter(owner=self.owner, enabled=True)}
+        with self.lock:
+            local = set(self.tasks)
+        # 已停止、已删除或租约被其他进程接管的任务
+        for task_id in local - set(owned):
+            self._stop_local(task_id)
+        for task_id in set(owned) - local:
+            self._start_local(owned[task_id])
+    
+    def _sync_loop(self):
+        while True:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"同步采集计划失败: {e}")
+            time.sleep(COLLECTION_SYNC_INTERVAL)
+    
+    def _claim(self, schedule):
+        """条件更新：只有计划的租约状态仍与读取时一致才接管，保证同一计划只被一个进程接管"""
+        claimed = CollectionSchedule.objects.filter(
+            pk=schedule.pk, enabled=True, owner=schedule.owner, lease_expires=schedule.lease_expires,
+        ).update(owner=self.owner, lease_expires=timezone.now() + timedelta(seconds=COLLECTION_LEASE_SECONDS))
+        if claimed and schedule.owner:
+            logger.warning(f"接管租约过期的采集任务: {schedule.task_id}（原执行进程 {schedule.owner}）")
+        return bool(claimed)
+    
+    def _start_local(self, schedule):
+        with self.lock:
+            if schedule.task_id in self.tasks:
+                return
+            task_info = self.tasks[schedule.task_id] = {
+                'cancel': threading.Event(),  # 停止信号
+                'ip': schedule.ip,
+                'port': schedule.port,
+                'interval': schedule.interval,
+                'error_count': 0,  # 连续错误计数
+                'status': 'starting'  # 任务状态
+            }
+            # 首次采集随机错开，避免同时恢复的任务一起采集
+            self._schedule(schedule.task_id, task_info, random.uniform(0, schedule.interval * self.jitter))
+        logger.info(f"本进程开始执行采集任务: {schedule.task_id}")
+    
+    def _stop_local(self, task_id):
         with self.lock:
-            return list(self.tasks.keys())
+            task_info = self.tasks.pop(task_id, None)
+            if task_info is not None:
+                task_info['cancel'].set()
+                logger.info(f"本进程停止执行采集任务: {task_id}")
     
-    def _collection_worker(self, task_id, ip, port, interval):
-        """采集工作线程"""
-        consecutive_errors = 0  # 连续错误计数
-        logger.info(f"开始后台数据采集任务: {task_id}, IP: {ip}, 端口: {port}, 间隔: {interval}秒")
+    def _describe(self, schedule):
+        with self.lock:
+            task_info = self.tasks.get(schedule.task_id)
+            local_status = task_info['status'] if task_info else None
+        if not schedule.enabled:
+            status = 'stopped'
+        elif local_status:
+            status = local_status
+        elif schedule.owner and schedule.lease_expires and schedule.lease_expires > timezone.now():
+            status = 'running'
+        else:
+            status = 'pending'  # 等待某个进程接管
+        
+        def format_time(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
         
+        return {
+            'running': schedule.enabled,
+            'ip': schedule.ip,
+            'port': schedule.port,
+            'interval': schedule.interval,
+            'start_time': format_time(schedule.created_at),
+            'error_count': schedule.error_count,
+            'total_errors': schedule.total_errors,
+            'run_count': schedule.run_count,
+            'last_run': format_time(schedule.last_run),
+            'last_success': format_time(schedule.last_success),
+            'last_latency': schedule.last_latency,
+            'last_error': schedule.last_error,
+            'owner': schedule.owner,
+            'status': status,
+        }
+    
+    def _schedule(self, task_id, task_info, delay):
+        """
+        把任务放入调度堆，调用方须持有 self.lock。
+        条目带有任务信息，同一任务ID停止后重新启动时，旧任务残留的条目不会被当作新任务分派
+        """
+        heapq.heappush(self.queue, (time.monotonic() + delay, next(self.sequence), task_id, task_info))
+        if self.scheduler is None:
+            self.scheduler = threading.Thread(target=self._scheduler_loop, name='collection-scheduler', daemon=True)
+            self.scheduler.start()
+        self.lock.notify()
+    
+    def _scheduler_loop(self):
+        """等待堆顶任务到期后分派到工作线程池；已停止、已删除或已被重新创建的任务的条目直接丢弃"""
         while True:
-            # 检查任务是否应该停止
             with self.lock:
-                if task_id not in self.tasks:
-                    logger.info(f"任务已删除: {task_id}")
-                    break
-                
-                task_info = self.tasks[task_id]
-                if not task_info['running']:
-                    logger.info(f"任务停止信号: {task_id}")
-                    break
-                
-                # 更新状态为运行中
+                while not self.queue or self.queue[0][0] > time.monotonic():
+                    self.lock.wait(self.queue[0][0] - time.monotonic() if self.queue else None)
+                _, _, task_id, task_info = heapq.heappop(self.queue)
+                if self.tasks.get(task_id) is not task_info or task_info['cancel'].is_set():
+                    continue
                 task_info['status'] = 'running'
+            self.executor.submit(self._collect, task_id, task_info)
+    
+    def _collect(self, task_id, task_info):
+        """执行一次采集，记录耗时与错误统计，完成后按结果安排下一次采集"""
+        ip, port, interval = task_info['ip'], task_info['port'], task_info['interval']
+        started = time.monotonic()
+        error = None
+        try:
+            logger.info(f"开始采集数据: {task_id}, IP: {ip}, 端口: {port}")
             
-            try:
-                logger.info(f"开始采集数据: {task_id}, IP: {ip}, 端口: {port}")
-                
-                # 采集CPU数据
-                cpu_data = self._get_info_with_retry('cpu', ip, port)
-                if cpu_data and 'state' in cpu_data and cpu_data['state'] == 'ok':
-                    logger.info(f"CPU数据采集成功: {cpu_data}")
-                    # 验证数据是否为真实数据
-                    if 'info' in cpu_data and cpu_data['info']:
-                        cpu_info = cpu_data['info']
-                        logger.info(f"CPU详细信息: 用户时间={cpu_info.get('cpu_user_time')}, 系统时间={cpu_info.get('cpu_system_time')}, 使用率={cpu_info.get('cpu_percent')}%")
-                else:
-                    logger.warning(f"CPU数据采集失败: {cpu_data}")
-                
-                # 采集内存数据
-                mem_data = self._get_info_with_retry('memory', ip, port)
-                if mem_data and 'state' in mem_data and mem_data['state'] == 'ok':
-                    logger.info(f"内存数据采集成功: {mem_data}")
-                    # 验证数据是否为真实数据
-                    if 'info' in mem_data and mem_data['info']:
-                        mem_info = mem_data['info']
-                        logger.info(f"内存详细信息: 总量={mem_info.get('mem_total')}, 已用={mem_info.get('mem_used')}, 使用率={mem_info.get('mem_percent')}%")
-                else:
-                    logger.warning(f"内存数据采集失败: {mem_data}")
-                
-                # 采集磁盘数据
-                disk_data = self._get_info_with_retry('disk', ip, port)
-                if disk_data and 'state' in disk_data and disk_data['state'] == 'ok':
-                    logger.info(f"磁盘数据采集成功: {disk_data}")
-                    # 验证数据是否为真实数据
-                    if 'info' in disk_data and disk_data['info']:
-                        disk_info = disk_data['info']
-                        logger.info(f"磁盘详细信息: 总量={disk_info.get('disk_total')}, 已用={disk_info.get('disk_used')}, 使用率={disk_info.get('disk_percent')}%")
-                else:
-                    logger.warning(f"磁盘数据采集失败: {disk_data}")
-                
-                # 采集网络数据
-                net_data = self._get_info_with_retry('network', ip, port)
-                if net_data and 'state' in net_data and net_data['state'] == 'ok':
-                    logger.info(f"网络数据采集成功: {net_data}")
-                    # 验证数据是否为真实数据
-                    if 'info' in net_data and net_data['info']:
-                        net_info = net_data['info']
-                        logger.info(f"网络详细信息: 发送={net_info.get('net_bytes_sent')}, 接收={net_info.get('net_bytes_recv')}")
+            # 一次请求采集全部子系统，探针只做一次采样
+            batch = select_client.get_info_batch(ip, port, tuple(COLLECTION_LABELS))
+            for info_type, label in COLLECTION_LABELS.items():
+                result = batch.get(info_type)
+                if result and result.get('state') == 'ok':
+                    logger.info(f"{label}数据采集成功: {result}")
                 else:
-                    logger.warning(f"网络数据采集失败: {net_data}")
-                
-                # 更新任务状态
-                with self.lock:
-                    if task_id in self.tasks:
-                        self.tasks[task_id]['last_success'] = timezone.now()
-                        self.tasks[task_id]['error_count'] = 0
-                
-                consecutive_errors = 0  # 重置连续错误计数
-                
-            except Exception as e:
-                consecutive_errors += 1
-                logger.error(f"采集任务 {task_id} 出错 ({consecutive_errors}/{self.max_retries}): {e}")
-                
-                with self.lock:
-                    if task_id in self.tasks:
-                        self.tasks[task_id]['error_count'] = consecutive_errors
-                        self.tasks[task_id]['status'] = 'error'
-                
-                if consecutive_errors >= self.max_retries:
-                    logger.error(f"任务 {task_id} 连续错误次数过多，暂停采集")
-                    time.sleep(self.retry_interval * 2)  # 较长的等待时间
-                    consecutive_errors = 0  # 重置计数，给予新的机会
-                else:
-                    time.sleep(self.retry_interval)  # 短暂等待后重试
-                continue
-            
-            # 等待下次采集前再次检查停止信号
-            for i in range(interval):
-                time.sleep(1)
-                with self.lock:
-                    if task_id not in self.tasks:
-                        logger.info(f"任务在等待期间被删除: {task_id}")
-                        return
-                    
-                    if not self.tasks[task_id]['running']:
-                        logger.info(f"任务在等待期间收到停止信号: {task_id}")
-                        return
+                    logger.warning(f"{label}数据采集失败: {result}")
             
-            # 最后一次检查停止信号
             with self.lock:
-                if task_id not in self.tasks:
-                    logger.info(f"任务在循环结束后被删除: {task_id}")
-                    return
-                
-                if not self.tasks[task_id]['running']:
-                    logger.info(f"任务在循环结束后收到停止信号: {task_id}")
-                    return
+                task_info['error_count'] = 0
+            delay = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        except Exception as e:
+            error = e
+            with self.lock:
+                task_info['error_count'] += 1
+                task_info['status'] = 'error'
+                errors = task_info['error_count']
+            logger.error(f"采集任务 {task_id} 出错 ({errors}/{self.max_retries}): {e}")
+            if errors % self.max_retries == 0:
+                logger.error(f"任务 {task_id} 连续错误次数过多，暂停采集")
+                delay = self.retry_interval * 2  # 较长的等待时间
+            else:
+                delay = self.retry_interval  # 短暂等待后重试
+        self._record(task_id, time.monotonic() - started, error)
+        
+        with self.lock:
+            # 采集期间任务可能已被停止、删除或以相同ID重新创建
+            if task_info['cancel'].is_set() or self.tasks.get(task_id) is not task_info:
+                logger.info(f"任务已停止，不再调度: {task_id}")
+                return
+            self._schedule(task_id, task_info, delay)
     
-    def _get_info_with_retry(self, info_type, ip, port, max_retries=3):
-        """带重试机制的数据获取"""
-        for attempt in range(max_retries):
-            try:
-                logger.info(f"正在获取{info_type}数据，IP: {ip}, 端口: {port}")
-                result = select_client.get_info(ip, port, info_type)
-                logger.info(f"成功获取{info_type}数据: {result}")
-                return result
-            except Exception as e:
-                logger.error(f"获取{info_type}数据失败 (尝试 {attempt + 1}/{max_retries}): {e}")
-                if attempt == max_retries - 1:  # 最后一次尝试
-                    raise
-                logger.warning(f"等待{self.retry_interval}秒后重试...")
-                time.sleep(self.retry_interval)
+    def _record(self, task_id, latency, error=None):
+        """把本次采集的耗时与结果写入采集计划，租约已被接管时不再写入"""
+        now = timezone.now()
+        values = dict(last_run=now, last_latency=round(latency, 3), run_count=F('run_count') + 1)
+        if error is None:
+            values.update(last_success=now, error_count=0, last_error='')
+        else:
+            values.update(error_count=F('error_count') + 1, total_errors=F('total_errors') + 1,
+                          last_error=str(error)[:1000])
+        try:
+            close_old_connections()
+            CollectionSchedule.objects.filter(task_id=task_id, owner=self.owner).update(**values)
+        except Exception as e:
+            logger.error(f"记录采集任务 {task_id} 的统计失败: {e}")
     
-    # 注意：数据保存由 select_client.get_info() 自动处理
-    # 这些函数已不再需要，因为 select_client.get_info() 会自动调用 set_info() 保存数据
+    # 注意：数据保存由 select_client.get_info_batch() 自动处理
 
 # 全局任务管理器实例
-task_manager = BackgroundTaskManager()
\ No newline at end of file
+task_manager = BackgroundTaskManager()
+
+
+def resume_on_startup():
+    """由 wsgi/asgi 入口调用，migrate 等管理命令不会经过这里，因此不会启动采集"""
+    if COLLECTION_AUTOSTART:
+        task_manager.resume()
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+折叠调用栈的解析与火焰图 SVG 生成。
+
+折叠栈每行一条调用栈："进程名;根帧;...;叶帧 样本数"，与 FlameGraph 的 stackcollapse-perf.pl 输出格式相同，
+生成的 SVG 与 flamegraph.pl 的布局一致：根在底部，同层的帧按名称排序，宽度与样本数成正比。
+"""
+import json
+import zlib
+from xml.sax.saxutils import escape
+
+FRAME_HEIGHT = 16
+FONT_SIZE = 12
+# 每个字符的平均宽度（相对字号），用于截断帧上的文字
+FONT_WIDTH = 0.59
+# 宽度小于该像素数的帧不绘制
+MIN_FRAME_WIDTH = 0.1
+PAD_TOP = FONT_SIZE * 3
+PAD_BOTTOM = FONT_SIZE * 2 + 10
+PAD_SIDE = 10
+
+
+def parse_folded(text):
+    """解析折叠栈文本，返回 {调用栈: 样本数}，同一调用栈出现多次时累加"""
+    stacks = {}
+    for line in text.splitlines():
+        stack, _, count = line.strip().rpartition(' ')
+        if not stack:
+            continue
+        try:
+            stacks[stack] = stacks.get(stack, 0) + int(count)
+        except ValueError:
+            continue
+    return stacks
+
+
+def format_folded(stacks):
+    return ''.join(f'{stack} {count}\n' for stack, count in sorted(stacks.items()))
+
+
+def merge_stacks(*profiles):
+    """合并多个时间窗口的 {调用栈: 样本数}"""
+    merged = {}
+    for stacks in profiles:
+        for stack, count in stacks.items():
+            merged[stack] = merged.get(stack, 0) + count
+    return merged
+
+
+def encode_stacks(stacks):
+    """
+    紧凑存储折叠栈：帧名去重为字符串表，调用栈按排序后与上一条调用栈的公共前缀长度 + 其余帧编号保存，
+    样本数单独成数组，整体 zlib 压缩。
+    """
+    frames, index = [], {}
+    encoded, counts = [], []
+    previous = []
+    for stack, count in sorted(stacks.items()):
+        ids = []
+        for frame in stack.split(';'):
+            if frame not in index:
+                index[frame] = len(frames)
+                frames.append(frame)
+            ids.append(index[frame])
+        shared = 0
+        while shared < min(len(ids), len(previous)) and ids[shared] == previous[shared]:
+            shared += 1
+        encoded.append([shared] + ids[shared:])
+        counts.append(count)
+        previous = ids
+    payload = {'frames': frames, 'stacks': encoded, 'counts': counts}
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_stacks(data):
+    payload = json.loads(zlib.decompress(bytes(data)).decode('utf-8'))
+    frames = payload['frames']
+    stacks = {}
+    ids = []
+    for entry, count in zip(payload['stacks'], payload['counts']):
+        ids = ids[:entry[0]] + entry[1:]
+        stacks[';'.join(frames[i] for i in ids)] = count
+    return stacks
+
+
+def self_samples(stacks):
+    """每个函数作为叶帧（自身占用 CPU）的样本数"""
+    result = {}
+    for stack, count in stacks.items():
+        leaf = stack.rsplit(';', 1)[-1]
+        result[leaf] = result.get(leaf, 0) + count
+    return result
+
+
+def inclusive_shares(stacks):
+    """每条调用路径（含其下所有子调用）占总样本数的比例，键为帧名元组"""
+    total = sum(stacks.values()) or 1
+    shares = {}
+    for stack, count in stacks.items():
+        path = ()
+        for frame in stack.split(';'):
+            path += (frame,)
+            shares[path] = shares.get(path, 0) + count / total
+    return shares
+
+
+def build_tree(stacks):
+    """把折叠栈合并为调用树，每个节点为 {'name', 'value', 'children'}"""
+    root = {'name': 'all', 'value': 0, 'children': {}}
+    for stack, count in stacks.items():
+        root['value'] += count
+        node = root
+        for frame in stack.split(';'):
+            node = node['children'].setdefault(frame, {'name': frame, 'value': 0, 'children': {}})
+            node['value'] += count
+    return root
+
+
+def tree_depth(node):
+    return 1 + max((tree_depth(child) for child in node['children'].values()), default=0)
+
+
+def frame_color(name):
+    """与 flamegraph.pl 的 hot 配色相近，同名帧颜色固定"""
+    h = zlib.crc32(name.encode('utf-8'))
+    return f'rgb({205 + h % 50},{(h >> 8) % 230},{(h >> 16) % 55})'
+
+
+def render_svg(stacks, title='Flame Graph', width=1200, frame_style=None):
+    """
+    根据 {调用栈: 样本数} 生成火焰图 SVG 文本。
+    frame_style(调用路径元组) 返回 (颜色, 附加说明) 时用于差分火焰图，默认按帧名着色。
+    """
+    root = build_tree(stacks)
+    depth = tree_depth(root) if root['value'] else 1
+    height = PAD_TOP + depth * FRAME_HEIGHT + PAD_BOTTOM
+    parts = [
+        '<?xml version="1.0" standalone="no"?>',
+        f'<svg version="1.1" width="{width}" height="{height}" viewBox="0 0 {width} {height}" '
+        'xmlns="http://www.w3.org/2000/svg">',
+        f'<rect x="0" y="0" width="{width}" height="{height}" fill="#f8f8f8"/>',
+        f'<text x="{width / 2}" y="{FONT_SIZE * 2}" font-size="{FONT_SIZE + 5}" font-family="Verdana" '
+        f'text-anchor="middle">{escape(title)}</text>',
+    ]
+    if not root['value']:
+        parts.append(f'<text x="{width / 2}" y="{height / 2}" font-size="{FONT_SIZE}" font-family="Verdana" '
+                     'text-anchor="middle">没有采集到调用栈</text>')
+        parts.append('</svg>')
+        return '\n'.join(parts)
+    scale = (width - 2 * PAD_SIDE) / root['value']
+    # (节点, 调用路径, 左侧 x 坐标)，路径长度即层级，空路径为底部的 all
+    pending = [(root, (), PAD_SIDE)]
+    while pending:
+        node, path, x = pending.pop()
+        level = len(path)
+        frame_width = node['value'] * scale
+        if frame_width < MIN_FRAME_WIDTH:
+            continue
+        y = height - PAD_BOTTOM - (level + 1) * FRAME_HEIGHT
+        percent = node['value'] * 100 / root['value']
+        label = f"{node['name']} ({node['value']} samples, {percent:.2f}%)"
+        color = frame_color(node['name'])
+        if frame_style is not None:
+            color, note = frame_style(path)
+            label = f"{label} {note}"
+        parts.append(f'<g><title>{escape(label)}</title>'
+                     f'<rect x="{x:.1f}" y="{y}" width="{frame_width:.1f}" height="{FRAME_HEIGHT - 1}" '
+                     f'fill="{color}" rx="2" ry="2"/>')
+        chars = int(frame_width / (FONT_SIZE * FONT_WIDTH))
+        if chars >= 3:
+            text = node['name'] if len(node['name']) <= chars else node['name'][:chars - 2] + '..'
+            parts.append(f'<text x="{x + 3:.1f}" y="{y + FRAME_HEIGHT - 4}" font-size="{FONT_SIZE}" '
+                         f'font-family="Verdana">{escape(text)}</text>')
+        parts.append('</g>')
+        child_x = x
+        for name in sorted(node['children']):
+            child = node['children'][name]
+            pending.append((child, path + (name,), child_x))
+            child_x += child['value'] * scale
+    parts.append('</svg>')
+    return '\n'.join(parts)
+
+
+def render_diff_svg(before, after, title='Differential Flame Graph', width=1200):
+    """
+    差分火焰图：帧宽度取自 after，颜色表示该调用路径占总样本比例的变化，
+    红色为占比上升（调优后更耗 CPU），蓝色为下降，颜色越深变化越大。两次采样按各自总样本数归一化。
+    """
+    shares_before = inclusive_shares(before)
+    shares_after = inclusive_shares(after)
+    deltas = {path: share - shares_before.get(path, 0) for path, share in shares_after.items()}
+    largest = max((abs(delta) for delta in deltas.values()), default=0) or 1
+
+    def frame_style(path):
+        if not path:
+            return 'rgb(230,230,230)', ''
+        delta = deltas.get(path, 0)
+        fade = int(255 * (1 - min(abs(delta) / largest, 1)))
+        color = f'rgb(255,{fade},{fade})' if delta > 0 else f'rgb({fade},{fade},255)'
+        return color, f'{delta * 100:+.2f}%'
+
+    return render_svg(after, title, width, frame_style)
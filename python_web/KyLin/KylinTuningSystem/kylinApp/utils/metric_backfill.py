@@ -0,0 +1,69 @@
+"""
+把性能指标表中以字符串保存的旧数据转换为数值，供迁移 0010_metric_numeric_columns 与 backfill_metric_numbers 命令共用。
+
+旧数据可能是带单位的字符串（如 "12.3G"）、时:分:秒、空字符串，或旧版探针写入读写耗时列的时间戳。
+已是数值文本的行由数据库在修改列类型时直接转换，这里只按主键分批改写其余的行：
+能识别的换算为数值文本，无法识别的置为 NULL。
+"""
+from collections import defaultdict
+
+from ..util import metric_column
+
+# 表 -> {列名: 是否为整数列}，与 0010_metric_numeric_columns 修改后的列类型一致
+METRIC_NUMBER_COLUMNS = {
+    'CPUPerformanceMetrics': {'userTime': False, 'SystemTime': False, 'waitIO': False, 'Idle': False},
+    'MemoryPerformanceMetrics': {name: True for name in ('total', 'used', 'free', 'buffers', 'cache', 'swap')},
+    'DiskPerformanceMetrics': {name: True for name in ('total', 'used', 'free', 'readCount', 'writeCount',
+                                                       'readBytes', 'writeBytes', 'readTime', 'writeTime')},
+    'NetworkPerformanceMetrics': {name: True for name in ('sent', 'recv', 'packetSent', 'packetRecv')},
+}
+# 数据库可以直接转换的数值文本
+INTEGER_PATTERN = r'^-?[0-9]+$'
+FLOAT_PATTERN = r'^-?[0-9]+(\.[0-9]+)?([eE][-+]?[0-9]+)?$'
+BACKFILL_BATCH_SIZE = 5000
+
+
+def legacy_rows(model, column, integer):
+    """列值不是数值文本的行"""
+    pattern = INTEGER_PATTERN if integer else FLOAT_PATTERN
+    return model.objects.filter(**{f'{column}__isnull': False}).exclude(**{f'{column}__regex': pattern})
+
+
+def backfill_column(model, column, integer, batch_size=BACKFILL_BATCH_SIZE, dry_run=False):
+    """
+    按主键顺序分批转换一列，返回 (转换的行数, 置为 NULL 的行数)。
+    每批按转换结果分组，同一结果的行合并为一条 UPDATE。
+    """
+    converted = cleared = 0
+    last_pk = 0
+    while True:
+        batch = list(legacy_rows(model, column, integer).filter(pk__gt=last_pk).order_by('pk')
+                     .values_list('pk', column)[:batch_size])
+        if not batch:
+            return converted, cleared
+        last_pk = batch[-1][0]
+        groups = defaultdict(list)
+        for pk, value in batch:
+            number = metric_column(value, integer)
+            groups[None if number is None else str(number)].append(pk)
+        for value, pks in groups.items():
+            if value is None:
+                cleared += len(pks)
+            else:
+                converted += len(pks)
+            if not dry_run:
+                model.objects.filter(pk__in=pks).update(**{column: value})
+
+
+def backfill(get_model, batch_size=BACKFILL_BATCH_SIZE, dry_run=False, log=None):
+    """转换全部指标表，get_model(模型名) 返回模型类（迁移中为历史模型），返回 {模型名: {列名: (转换, 置空)}}"""
+    report = {}
+    for model_name, columns in METRIC_NUMBER_COLUMNS.items():
+        model = get_model(model_name)
+        report[model_name] = {}
+        for column, integer in columns.items():
+            converted, cleared = backfill_column(model, column, integer, batch_size, dry_run)
+            report[model_name][column] = (converted, cleared)
+            if log is not None and (converted or cleared):
+                log(f'{model._meta.db_table}.{column}: 转换 {converted} 行，置为 NULL {cleared} 行')
+    return report
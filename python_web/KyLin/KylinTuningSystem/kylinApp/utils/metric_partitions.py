@@ -0,0 +1,159 @@
+"""
+性能指标表按 currentTime 做 RANGE 分区（MySQL），按天或按周一个分区，并按保留天数删除过期分区。
+
+分区后按时间范围的查询只访问相关分区，清理过期数据为 DROP PARTITION，不再需要大批量 DELETE。
+MySQL 要求分区列包含在每个唯一键中，因此分区时主键改为 (id, currentTime)，id 仍为自增列。
+表的最后一个分区为 pmax（VALUES LESS THAN MAXVALUE），保证超出已建分区的数据也能写入，
+新分区从 pmax 中拆分（pmax 为空时代价很小）。
+"""
+import datetime
+import os
+
+from django.db import connection
+
+from ..models import CPUPerformanceMetrics, MemoryPerformanceMetrics, DiskPerformanceMetrics, NetworkPerformanceMetrics
+
+# 表名 -> 模型，未分区时按模型批量删除过期数据
+METRIC_PARTITION_MODELS = {
+    model._meta.db_table: model
+    for model in (CPUPerformanceMetrics, MemoryPerformanceMetrics, DiskPerformanceMetrics, NetworkPerformanceMetrics)
+}
+# 分区粒度：day 或 week（周一为起点）
+METRIC_PARTITION_UNIT = os.getenv('KYLIN_METRIC_PARTITION_UNIT', 'day')
+# 数据保留天数，0 表示不删除
+METRIC_RETENTION_DAYS = int(os.getenv('KYLIN_METRIC_RETENTION_DAYS', '30'))
+# 提前建好的未来分区数
+METRIC_PARTITIONS_AHEAD = int(os.getenv('KYLIN_METRIC_PARTITIONS_AHEAD', '7'))
+PARTITION_UNITS = {'day': 1, 'week': 7}
+MAXVALUE_PARTITION = 'pmax'
+# 保留期之前的旧数据（包括时间异常的数据）所在的分区
+HISTORY_PARTITION = 'phistory'
+# 未分区的表每批删除的行数
+DELETE_BATCH_SIZE = 10000
+
+
+def partition_start(day, unit):
+    """day 所在分区的起始日期"""
+    if unit == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def partition_ranges(first, last, unit):
+    """覆盖 first 至 last 的分区 [(分区名, 起始日期, 结束日期)]，第一个分区从 first 开始"""
+    ranges = []
+    start = first
+    while start <= last:
+        end = partition_start(start, unit) + datetime.timedelta(days=PARTITION_UNITS[unit])
+        ranges.append((f"p{start:%Y%m%d}", start, end))
+        start = end
+    return ranges
+
+
+def partition_clause(name, end):
+    return f"PARTITION {name} VALUES LESS THAN ('{end:%Y-%m-%d} 00:00:00')"
+
+
+def existing_partitions(cursor, table):
+    """表的分区 [(分区名, 上界日期)]，pmax 的上界为 None；未分区时为空列表"""
+    cursor.execute(
+        "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL "
+        "ORDER BY PARTITION_ORDINAL_POSITION", [table])
+    partitions = []
+    for name, description in cursor.fetchall():
+        description = description.strip("'")
+        upper = None if description == 'MAXVALUE' else datetime.datetime.fromisoformat(description).date()
+        partitions.append((name, upper))
+    return partitions
+
+
+def plan_partitioning(table, unit, retention_days, ahead, today):
+    """
+    把未分区的表改为分区表的语句及改后的分区列表：保留期起点（不删除时为当前周期起点）之前的数据
+    全部落入 phistory，之后每个周期一个分区直到 ahead 个周期后。
+    分区数只取决于保留天数，不受个别时间异常（如时钟为 1970 年）的旧数据影响
+    """
+    first = partition_start(today - datetime.timedelta(days=max(retention_days, 0)), unit)
+    last = today + datetime.timedelta(days=ahead * PARTITION_UNITS[unit])
+    ranges = partition_ranges(first, last, unit)
+    clauses = [partition_clause(HISTORY_PARTITION, first)]
+    clauses += [partition_clause(name, end) for name, _, end in ranges]
+    clauses.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    statement = (f"ALTER TABLE {connection.ops.quote_name(table)} "
+                 f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, currentTime) "
+                 f"PARTITION BY RANGE COLUMNS(currentTime) ({', '.join(clauses)})")
+    return statement, [(HISTORY_PARTITION, first)] + [(name, end) for name, _, end in ranges] + \
+        [(MAXVALUE_PARTITION, None)]
+
+
+def plan_maintenance(table, partitions, unit, retention_days, ahead, today):
+    """已分区的表：补齐未来 ahead 个周期的分区，删除上界不晚于保留起点的分区"""
+    quoted = connection.ops.quote_name(table)
+    statements = []
+    bounded = [(name, upper) for name, upper in partitions if upper is not None]
+    last = today + datetime.timedelta(days=ahead * PARTITION_UNITS[unit])
+    start = max(upper for _, upper in bounded) if bounded else partition_start(today, unit)
+    clauses = [partition_clause(name, end) for name, _, end in partition_ranges(start, last, unit)]
+    if clauses:
+        if any(name == MAXVALUE_PARTITION for name, _ in partitions):
+            clauses.append(f"PARTITION {MAXVALUE_PARTITION} VALUES LESS THAN (MAXVALUE)")
+            statements.append(f"ALTER TABLE {quoted} REORGANIZE PARTITION {MAXVALUE_PARTITION} "
+                              f"INTO ({', '.join(clauses)})")
+        else:
+            statements.append(f"ALTER TABLE {quoted} ADD PARTITION ({', '.join(clauses)})")
+    if retention_days > 0:
+        cutoff = today - datetime.timedelta(days=retention_days)
+        expired = [name for name, upper in bounded if upper <= cutoff]
+        # 表至少保留一个分区
+        if len(expired) == len(partitions):
+            expired = expired[:-1]
+        if expired:
+            statements.append(f"ALTER TABLE {quoted} DROP PARTITION {', '.join(expired)}")
+    return statements
+
+
+def delete_expired(table, retention_days, today, batch_size=DELETE_BATCH_SIZE):
+    """未分区的表（或非 MySQL 数据库）按主键分批删除过期数据，返回删除的行数"""
+    if retention_days <= 0:
+        return 0
+    model = METRIC_PARTITION_MODELS[table]
+    cutoff = datetime.datetime.combine(today - datetime.timedelta(days=retention_days), datetime.time())
+    deleted = 0
+    while True:
+        ids = list(model.objects.filter(currentTime__lt=cutoff).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += model.objects.filter(id__in=ids).delete()[0]
+
+
+def maintain(tables=None, unit=METRIC_PARTITION_UNIT, retention_days=METRIC_RETENTION_DAYS,
+             ahead=METRIC_PARTITIONS_AHEAD, init=False, dry_run=False, today=None):
+    """
+    维护指标表分区，返回 {表名: {'statements': 执行的语句, 'deleted': 批量删除的行数, 'partitioned': 是否已分区}}。
+    未分区的表在 init 为 True 时改为分区表（会重建整张表），否则按保留天数分批 DELETE。
+    dry_run 时只生成语句，不修改数据。
+    """
+    if unit not in PARTITION_UNITS:
+        raise ValueError(f"未知的分区粒度: {unit}")
+    today = today or datetime.date.today()
+    report = {}
+    for table in tables or METRIC_PARTITION_MODELS:
+        result = dict(statements=[], deleted=0, partitioned=False)
+        report[table] = result
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                partitions = existing_partitions(cursor, table)
+                if not partitions and init:
+                    statement, partitions = plan_partitioning(table, unit, retention_days, ahead, today)
+                    result['statements'].append(statement)
+                if partitions:
+                    result['statements'] += plan_maintenance(table, partitions, unit, retention_days, ahead, today)
+                    result['partitioned'] = True
+                    if not dry_run:
+                        for statement in result['statements']:
+                            cursor.execute(statement)
+                    continue
+        if not dry_run:
+            result['deleted'] = delete_expired(table, retention_days, today)
+    return report
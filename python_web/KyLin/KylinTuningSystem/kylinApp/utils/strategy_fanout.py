@@ -0,0 +1,103 @@
+"""
+策略包的并行下发：一个策略包同时应用到多台服务器，结果按服务器完成的先后逐个返回。
+
+策略包由若干步骤组成，步骤之间按顺序执行；一个步骤为单条命令，或为互不依赖的一组命令（元组），
+组内命令在同一台服务器上并行执行。
+"""
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ..model.SocketServer import select_client
+
+# 默认同时下发的服务器数
+STRATEGY_FANOUT_PARALLELISM = 32
+# 单次请求允许的最大并行服务器数
+STRATEGY_FANOUT_MAX_PARALLELISM = 128
+# 单条命令的超时（秒）
+STRATEGY_COMMAND_TIMEOUT = 30.0
+
+
+def strategy_stages(pack):
+    """把策略包规整为步骤列表，每个步骤为命令元组"""
+    return [(step,) if isinstance(step, str) else tuple(step) for step in pack]
+
+
+def strategy_commands(pack):
+    """按执行顺序列出策略包中的全部命令"""
+    return [command for stage in strategy_stages(pack) for command in stage]
+
+
+def run_command(ip, port, command, timeout=STRATEGY_COMMAND_TIMEOUT):
+    start = time.monotonic()
+    try:
+        result = dict(command=command, result=select_client.send_command(command, ip, port, timeout=timeout))
+    except OSError as e:
+        # 连接失败或超时，同一台服务器后续步骤不再执行
+        result = dict(command=command, error=str(e) or e.__class__.__name__)
+    result['elapsed'] = round(time.monotonic() - start, 3)
+    return result
+
+
+def group_size(pack):
+    """策略包中最大的并行命令组大小"""
+    return max((len(stage) for stage in strategy_stages(pack)), default=1)
+
+
+def apply_pack(ip, port, pack, executor=None, timeout=STRATEGY_COMMAND_TIMEOUT):
+    """
+    在一台服务器上执行策略包，返回按策略包顺序排列的各命令结果。
+    组内命令提交到 executor 并行执行（未提供时临时创建）；某一步出现连接错误时，其后的命令标记为 skipped。
+    """
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=group_size(pack)) as executor:
+            return apply_pack(ip, port, pack, executor, timeout)
+    results = []
+    failed = False
+    for stage in strategy_stages(pack):
+        if failed:
+            results.extend(dict(command=command, skipped=True) for command in stage)
+        elif len(stage) == 1:
+            results.append(run_command(ip, port, stage[0], timeout))
+        else:
+            futures = [executor.submit(run_command, ip, port, command, timeout) for command in stage]
+            results.extend(future.result() for future in futures)
+        failed = failed or any('error' in result for result in results)
+    return results
+
+
+def host_report(host, started, results):
+    return dict(type='host', ip=host['ip'], port=host['port'],
+                ok=all('result' in result for result in results),
+                elapsed=round(time.monotonic() - started, 3), results=results)
+
+
+def fan_out(pack, hosts, parallelism=STRATEGY_FANOUT_PARALLELISM, timeout=STRATEGY_COMMAND_TIMEOUT):
+    """
+    把策略包并行应用到 hosts（[{'ip', 'port'}]），最多同时处理 parallelism 台服务器，
+    每台服务器完成后立即产出一条 host 报告。生成器提前关闭时（如客户端断开）未开始的服务器不再执行。
+    """
+    parallelism = max(1, min(int(parallelism), STRATEGY_FANOUT_MAX_PARALLELISM, len(hosts) or 1))
+    # 服务器与组内命令使用两个线程池，避免服务器任务占满线程后等待自己提交的命令
+    host_pool = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix='strategy-host')
+    command_pool = ThreadPoolExecutor(max_workers=parallelism * group_size(pack), thread_name_prefix='strategy-cmd')
+
+    def run(host):
+        started = time.monotonic()
+        return host_report(host, started, apply_pack(host['ip'], host['port'], pack, command_pool, timeout))
+
+    pending = {host_pool.submit(run, host): host for host in hosts}
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                host = pending.pop(future)
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield dict(type='host', ip=host['ip'], port=host['port'], ok=False, elapsed=0,
+                               error=f"{e.__class__.__name__}: {e}", results=[])
+    finally:
+        for future in pending:
+            future.cancel()
+        host_pool.shutdown(wait=False)
+        command_pool.shutdown(wait=False)
@@ -26,12 +26,14 @@ from django.views import View
 from django.http import Http404
 from ..model.SocketServer import select_client
 from ..model.DBSence import dbSceneRecognition
+from django.db.models import QuerySet
 from django.forms.models import model_to_dict
 from django.views.decorators.csrf import csrf_exempt
-from django.http.response import HttpResponse, JsonResponse
+from django.http.response import HttpResponse, JsonResponse, StreamingHttpResponse
 from ..utils import encrypt
-from kylinApp.util import dict_to_custom_str
+from kylinApp.util import dict_to_custom_str, format_io_latency, humanize_metrics, metric_column, parse_metric_number
 from ..utils.background_tasks import task_manager
+from ..utils import affinity_planner, flamegraph, strategy_fanout
 from django.conf import settings
 from kylinApp.models import (
     UserModels, MonitoringServerInformation, DataBaseInformationManagement,
@@ -45,7 +47,8 @@ from kylinApp.models import (
 
 
 
-# 策略包接口（场景化）
+# 策略包接口（场景化）：步骤按顺序执行，元组内为可并行执行的命令。
+# 元组内只放查看类的只读命令；修改系统配置或重启服务的命令各自单独成步，逐条顺序执行
 STRATEGY_PACKS = {
         "db_speedup": [
             "command:添加数据库缓存",
@@ -55,9 +58,9 @@ STRATEGY_PACKS = {
         ],
         "io_optimize": [
             "command:清理系统缓存",
-            "command:查看磁盘使用情况",
-            "command:查看活跃连接数",
-            "command:查看运行进程"
+            ("command:查看磁盘使用情况",
+             "command:查看活跃连接数",
+             "command:查看运行进程")
         ],
         "security_harden": [
             "command:查看防火墙",
@@ -68,8 +71,8 @@ STRATEGY_PACKS = {
         ],
         "memory_release": [
             "command:清理系统缓存",
-            "command:查看内存使用情况",
-            "command:查看运行进程"
+            ("command:查看内存使用情况",
+             "command:查看运行进程")
         ],
         "service_restart": [
             "command:重启Nginx服务",
@@ -77,23 +80,23 @@ STRATEGY_PACKS = {
             "command:重启Docker服务"
         ],
         "network_optimize": [
-            "command:检测网络连接状态",
-            "command:查看端口占用情况",
+            ("command:检测网络连接状态",
+             "command:查看端口占用情况"),
             "command:终止占用端口的进程",
             "command:查看活跃连接数"
         ],
         "system_health_check": [
-            "command:查看系统负载",
-            "command:查看CPU信息",
-            "command:查看内核日志",
-            "command:检查系统内核日志",
-            "command:导出当前系统状态"
+            ("command:查看系统负载",
+             "command:查看CPU信息",
+             "command:查看内核日志",
+             "command:检查系统内核日志",
+             "command:导出当前系统状态")
         ],
         "resource_release": [
             "command:清理系统缓存",
-            "command:查看内存使用情况",
-            "command:查看磁盘使用情况",
-            "command:查看运行进程"
+            ("command:查看内存使用情况",
+             "command:查看磁盘使用情况",
+             "command:查看运行进程")
         ],
         "server_reboot": [
             "command:重启服务器"
@@ -105,12 +108,73 @@ def apply_strategy(request):
     ip = data.get("ip")
     port = int(data.get("port"))
     strategy = data.get("strategy")
-    commands = STRATEGY_PACKS.get(strategy, [])
-    results = []
-    for cmd in commands:
-        result = select_client.send_command(cmd, ip, port)
-        results.append({ "command": cmd, "result": result })
+    pack = STRATEGY_PACKS.get(strategy, [])
+    results = strategy_fanout.apply_pack(ip, port, pack)
+    for item in results:
+        item.setdefault("result", item.get("error", "未执行"))
     return JsonResponse({ "message": "success", "results": results }, status=200)
+
+
+def select_fanout_hosts(data):
+    """
+    批量下发的目标服务器：hosts 直接给出 [{ip, port}]，或从监控服务器信息中按
+    ids（记录ID列表）、category（服务类型）选取，all 为真时选取全部监控服务器
+    """
+    if data.get("hosts"):
+        return [{"ip": host["ip"], "port": int(host["port"])} for host in data["hosts"]]
+    servers = MonitoringServerInformation.objects.all()
+    if data.get("ids"):
+        servers = servers.filter(id__in=data["ids"])
+    elif data.get("category"):
+        servers = servers.filter(server_category=data["category"])
+    elif not data.get("all"):
+        return []
+    # 同一探针登记多次时只下发一次
+    hosts = {(server.ip, server.port) for server in servers}
+    return [{"ip": ip, "port": port} for ip, port in sorted(hosts)]
+
+
+# 策略包批量下发接口：按 NDJSON 逐行返回，每台服务器执行完成后立即输出一行
+@csrf_exempt
+def apply_strategy_fanout(request):
+    data = json.loads(request.body.decode("utf8"))
+    strategy = data.get("strategy")
+    if strategy not in STRATEGY_PACKS:
+        return JsonResponse({"message": f"未知的策略包: {strategy}"}, status=400)
+    hosts = select_fanout_hosts(data)
+    if not hosts:
+        return JsonResponse({"message": "没有选择目标服务器"}, status=400)
+    pack = STRATEGY_PACKS[strategy]
+    # 参数在开始输出结果之前校验，流式响应开始后无法再返回 400
+    try:
+        parallelism = int(data.get("parallelism") or strategy_fanout.STRATEGY_FANOUT_PARALLELISM)
+        timeout = float(data.get("timeout") or strategy_fanout.STRATEGY_COMMAND_TIMEOUT)
+    except (TypeError, ValueError):
+        return JsonResponse({"message": "parallelism 必须为整数，timeout 必须为数字"}, status=400)
+    if not 1 <= parallelism <= strategy_fanout.STRATEGY_FANOUT_MAX_PARALLELISM:
+        return JsonResponse({"message": f"parallelism 取值范围为 1-{strategy_fanout.STRATEGY_FANOUT_MAX_PARALLELISM}"},
+                            status=400)
+    if timeout <= 0:
+        return JsonResponse({"message": "timeout 必须大于 0"}, status=400)
+
+    def stream():
+        started = time.monotonic()
+        succeeded = failed = 0
+        yield json.dumps({"type": "start", "strategy": strategy, "hosts": len(hosts),
+                          "commands": strategy_fanout.strategy_commands(pack)}, ensure_ascii=False) + "\n"
+        for report in strategy_fanout.fan_out(pack, hosts, parallelism, timeout):
+            if report["ok"]:
+                succeeded += 1
+            else:
+                failed += 1
+            yield json.dumps(report, ensure_ascii=False, default=str) + "\n"
+        yield json.dumps({"type": "done", "succeeded": succeeded, "failed": failed,
+                          "elapsed": round(time.monotonic() - started, 3)}) + "\n"
+
+    response = StreamingHttpResponse(stream(), content_type="application/x-ndjson")
+    # 禁止反向代理缓冲，保证每行结果及时送达
+    response["X-Accel-Buffering"] = "no"
+    return response
 def create_data(dbmodel, data):
     try:
         # 处理服务信息管理的字段映射
@@ -377,7 +441,7 @@ def cha_two_tool(name, dbmodel, data, tp=""):
                 # 发起采集
                 try:
                     result = select_client.get_info(host, port, tp)
-                    return JsonResponse(result, status=200)
+                    return JsonResponse(humanize_metrics(result), status=200)
                 except Exception as e:
                     logger.error(f"采集数据失败({host}:{port}): {e}")
                     return JsonResponse({
@@ -469,7 +533,8 @@ def constrain_the_page(number_range, filtered_records):
     page_content_number = 50
     start_index, end_index = map(int, number_range.split("-"))
     start_index -= 1
-    max_len = len(filtered_records)
+    # 查询集只统计行数，分页切片由数据库以 LIMIT/OFFSET 完成
+    max_len = filtered_records.count() if isinstance(filtered_records, QuerySet) else len(filtered_records)
     # 是50的几倍
     all_numb, a_mod = divmod(max_len, page_content_number)
     max_numb, m_mod = divmod(start_index, page_content_number)
@@ -534,7 +599,8 @@ def return_data_model_three(request, name, start_time, end_time, number_range, i
 
     start_time = datetime.datetime.strptime(start_time, '%Y-%m-%d')
     end_time = datetime.datetime.strptime(end_time, '%Y-%m-%d').replace(hour=23, minute=59, second=59)
-    condition = {}
+    # 时间范围在数据库中过滤，指定主机时使用 (ipaddress, currentTime) 索引
+    condition = {"currentTime__range": (start_time, end_time)}
     if ipvalue != "no":
         condition.update({"ipaddress": ipvalue})
     if name == "cpuxinnengzhibiao":
@@ -547,18 +613,8 @@ def return_data_model_three(request, name, start_time, end_time, number_range, i
         records = select_data(NetworkPerformanceMetrics, condition)
     else:
         return JsonResponse({"error": "Invalid name parameter"}, status=400,)
-    # 过滤时间范围
-    filtered_records = []
-    for record in records:
-        # 使用 parse_date 将字符串转换为 date 对象
-        current_date = datetime.datetime.fromisoformat(str(record.currentTime))
-        # 移除时区信息以保持一致性
-        if current_date.tzinfo is not None:
-            current_date = current_date.replace(tzinfo=None)
-        if current_date and start_time <= current_date <= end_time:
-            filtered_records.append(record)
-
-    data_dicts = constrain_the_page(number_range, filtered_records)
+
+    data_dicts = constrain_the_page(number_range, records.order_by("currentTime", "id"))
     # 输出过滤后的结果
     for record in data_dicts["all_data"]:
         record["currentTime"] = record["currentTime"].strftime('%Y-%m-%d %H:%M:%S')
@@ -584,7 +640,9 @@ def return_data_model_four(request):
         data.update({"memory_percent": memory_percent})
     if network_data:
         network_info = network_data.last()
-        data.update({"network_data": {"sent": network_info.sent, "recv": network_info.recv}})
+        # 页面图表以 GB 为单位
+        data.update({"network_data": {"sent": round(parse_metric_number(network_info.sent) / 1024 ** 3, 2),
+                                      "recv": round(parse_metric_number(network_info.recv) / 1024 ** 3, 2)}})
     if os_data:
         os_info = os_data.last()
         data.update({"os_data": {"os_name": os_info.os_name,
@@ -681,6 +739,56 @@ def return_cmd_four(request):
     return HttpResponse(str(state_info), status=200)
 
 
+# 模块6中耗时的命令：页面命令 -> 探针命令。新版探针上作为后台作业执行，页面带 job_id 轮询结果
+FIVE_MODEL_COMMANDS = {
+    "get_flame_graph": "get_flame_graph",
+    "get_new_io_data": "command:get_biotop",
+    "get_io_stack": "command:get_io_stack",
+}
+
+
+def five_model_number_options(data, keys, convert):
+    """按 convert 转换页面传入的正数参数，未传入的参数不下发；格式错误或不是正数时抛出 ValueError"""
+    options = {}
+    for key in keys:
+        if data.get(key) in (None, ""):
+            continue
+        try:
+            value = convert(data[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} 格式不正确: {data[key]}")
+        if not 0 < value < float("inf"):
+            raise ValueError(f"{key} 必须为正数")
+        options[key] = value
+    return options
+
+
+def five_model_options(command, data):
+    """页面传入的可选采样参数，返回 (探针命令参数, 同步执行时的超时秒数)，参数无效时抛出 ValueError"""
+    if command == "get_flame_graph":
+        # 探针只上报折叠栈，SVG 在页面请求 perf.svg 时生成
+        options = {"output": "folded"}
+        options.update(five_model_number_options(data, ("duration", "frequency"), int))
+        return options, options.get("duration", 60) + 60
+    if command == "get_new_io_data":
+        options = five_model_number_options(data, ("duration", "interval"), float)
+        return options, options.get("duration", 5) + 10
+    return {}, 60
+
+
+def five_model_response(command, ip, result, data, job_id=None):
+    """把探针返回的结果转换为页面需要的响应，job_id 为产生该结果的后台作业"""
+    if command == "get_flame_graph":
+        profile = select_client.store_flame_graph(result)
+        if profile:
+            save_flame_profile(ip, profile, data.get("label", ""), job_id)
+        return JsonResponse({"state": "ok"}, status=200)
+    if command == "get_new_io_data" and isinstance(result, dict):
+        # 旧版探针返回 biolatency 的文本输出，原样展示
+        result = format_io_latency(result)
+    return HttpResponse(result, status=200)
+
+
 # 实则模块6
 @csrf_exempt
 def return_data_five(request):
@@ -688,15 +796,146 @@ def return_data_five(request):
     ip = data.get("ip")
     port = int(data.get("port"))
     command = data.get("command")
-    if command == "get_flame_graph":
-        select_client.send_command("get_flame_graph", ip, port)
-    elif command == "get_new_io_data":
-        info = select_client.send_command("command:get_biotop", ip, port)
-        return HttpResponse(info, status=200)
-    elif command == "get_io_stack":
-        info = select_client.send_command("command:get_io_stack", ip, port)
-        return HttpResponse(info, status=200)
-    return JsonResponse({"state": "ok"}, status=200)
+    agent_command = FIVE_MODEL_COMMANDS.get(command)
+    if agent_command is None:
+        return JsonResponse({"state": "ok"}, status=200)
+    try:
+        options, timeout = five_model_options(command, data)
+    except ValueError as e:
+        return JsonResponse({"state": "error", "error": str(e)}, status=400)
+    job_id = data.get("job_id")
+    if not job_id:
+        job_id = select_client.submit_job(ip, port, agent_command, options)
+        if job_id is None:
+            # 旧版探针不支持后台作业，同步等待结果
+            result = json.loads(select_client.request(ip, port, dict(options, command=agent_command), timeout))
+            return five_model_response(command, ip, result, data)
+        return JsonResponse({"state": "running", "job_id": job_id}, status=200)
+    job = select_client.get_job(ip, port, job_id)
+    if job["status"] in ("queued", "running"):
+        return JsonResponse({"state": "running", "job_id": job_id}, status=200)
+    if job["status"] != "done":
+        return JsonResponse({"state": "error", "error": job.get("error", "作业执行失败")}, status=500)
+    return five_model_response(command, ip, job["result"], data, job_id)
+
+
+def save_flame_profile(ip, profile, label="", job_id=None):
+    """
+    保存一次火焰图采样，以服务端收到结果的时间作为采样结束时间。
+    同一后台作业的结果可能被多个页面或重试的请求轮询到，探针缓存期内的多次请求也会拿到同一次采样，
+    因此按探针返回的 sample_id（旧版探针没有时按 job_id）只保存一次
+    """
+    sample_id = profile.get("sample_id")
+    if sample_id:
+        key = dict(sample_id=sample_id)
+    elif job_id:
+        key = dict(job_id=job_id)
+    else:
+        key = None
+    if key and FlameGraphProfile.objects.filter(**key).exists():
+        return
+    stacks = flamegraph.parse_folded(profile["folded"])
+    end_time = datetime.datetime.now()
+    fields = dict(
+        host=ip, label=label, start_time=end_time - datetime.timedelta(seconds=profile["duration"]),
+        end_time=end_time, frequency=profile["frequency"], samples=profile["samples"], stack_count=len(stacks),
+        data=flamegraph.encode_stacks(stacks), job_id=job_id or None)
+    if key:
+        # 并发的轮询同时通过上面的检查时，由唯一约束保证只有一条记录
+        FlameGraphProfile.objects.get_or_create(**key, defaults=fields)
+    else:
+        FlameGraphProfile.objects.create(**fields)
+
+
+def select_flame_profiles(params, prefix=""):
+    """按 <prefix>ids（逗号分隔的记录ID）或 ip 加 <prefix>start、<prefix>end 时间窗口选择火焰图采样记录"""
+    ids = params.get(prefix + "ids")
+    if ids:
+        return list(FlameGraphProfile.objects.filter(id__in=[int(i) for i in ids.split(",") if i.strip()]))
+    query = FlameGraphProfile.objects.filter(host=params.get("ip"))
+    start, end = params.get(prefix + "start"), params.get(prefix + "end")
+    if start:
+        query = query.filter(start_time__gte=datetime.datetime.strptime(start, "%Y-%m-%d %H:%M:%S"))
+    if end:
+        query = query.filter(end_time__lte=datetime.datetime.strptime(end, "%Y-%m-%d %H:%M:%S"))
+    return list(query)
+
+
+def merge_flame_profiles(profiles):
+    """合并多条采样记录，同时按各自的采样频率把每个函数自身的样本数换算为 CPU 秒数"""
+    merged, seconds = {}, {}
+    for profile in profiles:
+        stacks = flamegraph.decode_stacks(profile.data)
+        merged = flamegraph.merge_stacks(merged, stacks)
+        for name, count in flamegraph.self_samples(stacks).items():
+            seconds[name] = seconds.get(name, 0) + count / profile.frequency
+    return merged, seconds
+
+
+@csrf_exempt
+def flame_graph_api(request, tp):
+    """
+    火焰图采样记录：
+    list  列出主机（ip）的采样记录；
+    merge 合并 ids 或时间窗口内的采样并返回火焰图 SVG，format=folded 时返回折叠栈文本；
+    diff  对比 before_* 与 after_* 两组采样（调优前后）并返回差分火焰图 SVG，format=json 时返回各函数的 CPU 时间变化。
+    """
+    params = request.GET if request.method == "GET" else request.POST
+    try:
+        if tp == "list":
+            query = FlameGraphProfile.objects.filter(host=params.get("ip"))[:int(params.get("limit", 50))]
+            data = [{
+                "id": item.id,
+                "label": item.label,
+                "start_time": item.start_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "end_time": item.end_time.strftime("%Y-%m-%d %H:%M:%S"),
+                "frequency": item.frequency,
+                "samples": item.samples,
+                "stack_count": item.stack_count,
+            } for item in query]
+            return JsonResponse({"message": "success", "data": data}, status=200)
+        if tp == "merge":
+            profiles = select_flame_profiles(params)
+            if not profiles:
+                return JsonResponse({"message": "error", "error": "没有符合条件的火焰图采样"}, status=404)
+            stacks, _ = merge_flame_profiles(profiles)
+            if params.get("format") == "folded":
+                return HttpResponse(flamegraph.format_folded(stacks), content_type="text/plain; charset=utf-8")
+            title = f"{profiles[0].host} 火焰图（{len(profiles)} 次采样）"
+            return HttpResponse(flamegraph.render_svg(stacks, title), content_type="image/svg+xml")
+        if tp == "diff":
+            before, after = select_flame_profiles(params, "before_"), select_flame_profiles(params, "after_")
+            if not before or not after:
+                return JsonResponse({"message": "error", "error": "调优前后都需要至少一次火焰图采样"}, status=404)
+            before_stacks, before_seconds = merge_flame_profiles(before)
+            after_stacks, after_seconds = merge_flame_profiles(after)
+            if params.get("format") != "json":
+                svg = flamegraph.render_diff_svg(before_stacks, after_stacks, "调优前后差分火焰图")
+                return HttpResponse(svg, content_type="image/svg+xml")
+            before_total = sum(before_seconds.values()) or 1
+            after_total = sum(after_seconds.values()) or 1
+            functions = []
+            for name in set(before_seconds) | set(after_seconds):
+                cpu_before, cpu_after = before_seconds.get(name, 0), after_seconds.get(name, 0)
+                functions.append({
+                    "function": name,
+                    "before_seconds": round(cpu_before, 3),
+                    "after_seconds": round(cpu_after, 3),
+                    "delta_seconds": round(cpu_after - cpu_before, 3),
+                    "before_percent": round(cpu_before * 100 / before_total, 2),
+                    "after_percent": round(cpu_after * 100 / after_total, 2),
+                })
+            functions.sort(key=lambda item: abs(item["delta_seconds"]), reverse=True)
+            return JsonResponse({"message": "success", "data": {
+                "before": {"profiles": len(before), "samples": sum(before_stacks.values()),
+                           "cpu_seconds": round(sum(before_seconds.values()), 3)},
+                "after": {"profiles": len(after), "samples": sum(after_stacks.values()),
+                          "cpu_seconds": round(sum(after_seconds.values()), 3)},
+                "functions": functions[:int(params.get("limit", 20))],
+            }}, status=200)
+        return JsonResponse({"message": "error", "error": f"未知的操作: {tp}"}, status=400)
+    except (TypeError, ValueError) as e:
+        return JsonResponse({"message": "error", "error": f"参数错误: {e}"}, status=400)
 
 
 # 火焰图转成二进制
@@ -704,6 +943,14 @@ class NoCacheImageView(View):
     def get(self, request, *args, **kwargs):
         image_name = kwargs.get('image_name')
         image_path = os.path.join('kylinApp', 'static', 'img', f'{image_name}')  # 替换为你的图片路径
+        folded_path = os.path.splitext(image_path)[0] + '.folded'
+        # 折叠栈比已生成的 SVG 新时重新生成
+        if image_name.endswith('.svg') and os.path.exists(folded_path) and (
+                not os.path.exists(image_path) or os.path.getmtime(folded_path) > os.path.getmtime(image_path)):
+            with open(folded_path) as f:
+                svg = flamegraph.render_svg(flamegraph.parse_folded(f.read()))
+            with open(image_path, mode="w") as f:
+                f.write(svg)
         if not os.path.exists(image_path):
             raise Http404("Image does not exist")
         with open(image_path, mode="rb") as f:
@@ -743,7 +990,8 @@ def return_data_six(request):
                                                      query.database, query.port, query.code)
         return JsonResponse(values, status=200)
     elif tp == "ceph_info":
-        data = select_client.get_info(ip, int(port), tp)
+        data = select_client.get_ceph_info(ip, int(port), data.get("cluster_ip"), data.get("since", 0),
+                                           bool(data.get("raw")))
         return JsonResponse(data)
     return HttpResponse("请求错误", status=303)
 
@@ -876,26 +1124,24 @@ def realtime_update_pid_data(request):
                 "error": "端口号必须是有效的数字"
             }, status=400)
         
-        data = select_client.send_command("get_top", ip, port_int)
+        data = select_client.send_command("get_top", ip, port_int, options={"sort": "cpu", "limit": 10})
         json_data = json.loads(data)
-        # 将字典转换为列表，以便筛选和排序
-        data_list = list(json_data.values())
+        if "processes" in json_data:
+            # 探针已按 %CPU 降序排序并截取前 10 个进程，数值字段为原始数值
+            data_list = json_data["processes"]
+        else:
+            # 旧版探针返回解析 top 输出得到的全部进程，数值为字符串
+            data_list = sorted(json_data.values(), key=lambda x: float(x['%CPU']), reverse=True)
 
         # 筛选出 %CPU 和 %MEM 不等于 0 的数据
         filtered_data = [item for item in data_list if float(item['%CPU']) > 0 or float(item['%MEM']) > 0.1]
 
-        # 按 %CPU 降序排序
-        sorted_by_cpu = sorted(filtered_data, key=lambda x: float(x['%CPU']), reverse=True)
-
         data = {}
-        if len(sorted_by_cpu) > 10:
-            for item in sorted_by_cpu[:10]:
-                PID = item.pop("PID")
-                data[PID] = item
-        else:
-            for item in sorted_by_cpu:
-                PID = item.pop("PID")
-                data[PID] = item
+        for item in filtered_data[:10]:
+            if "processes" in json_data:
+                item = humanize_metrics(item)
+            PID = item.pop("PID")
+            data[PID] = item
         return JsonResponse({
             "message": "success",
             "data": data
@@ -915,8 +1161,7 @@ def pid_info(request):
     changeCpuId = request.POST.get("changeCpuId")
     currPid = request.POST.get("currPid")
     if tp == "GETPIDINFO":
-        data = select_client.send_command("get_ps",ip, int(port))
-        json_data = json.loads(data)
+        json_data = select_client.get_process_table(ip, int(port))
         json_data["CPUCount"] = [hex(i) for i in set(json_data["CPU核心"])]
         json_data["CPU核心"] = [hex(i) for i in json_data["CPU核心"]]
         return JsonResponse({
@@ -928,6 +1173,43 @@ def pid_info(request):
         return JsonResponse({"message": "success"}, status=200)
 
 
+@csrf_exempt
+def affinity_plan(request):
+    """亲和性规划：tp 为 PROPOSE 时返回规划及规划前后的评估，APPLY 时按规划设置亲和性并评估实际结果"""
+    ip = request.POST.get("ip")
+    tp = request.POST.get("tp", "PROPOSE")
+    try:
+        port = int(request.POST.get("port"))
+        limit = int(request.POST.get("limit", 16))
+    except (TypeError, ValueError):
+        return JsonResponse({
+            "message": "error",
+            "error": "端口号和进程数必须是有效的数字"
+        }, status=400)
+    try:
+        profile = select_client.get_affinity_profile(ip, port, limit)
+        result = affinity_planner.plan(profile)
+        if tp == "APPLY" and result["assignments"]:
+            applied = select_client.apply_affinity(ip, port, result["assignments"])
+            # 设置失败的进程保持原亲和性，用实际设置结果重新评估
+            actual = {proc["pid"]: proc["affinity"] for proc in result["processes"]}
+            for item in applied["results"]:
+                if item.get("ok"):
+                    actual[item["pid"]] = item["cpus"]
+            result["applied"] = applied
+            result["after"] = affinity_planner.evaluate(result["processes"], actual, profile["topology"])
+        return JsonResponse({
+            "message": "success",
+            "data": result
+        }, status=200)
+    except Exception as e:
+        logger.error(f"affinity_plan error: {e}")
+        return JsonResponse({
+            "message": "error",
+            "error": f"亲和性规划失败: {str(e)}"
+        }, status=500)
+
+
 
 
 
@@ -1026,6 +1308,13 @@ def background_collection_api(request):
                     "tasks": tasks
                 })
         
+        elif action == "stats":
+            # 所有采集计划的执行进程、最近一次采集耗时与错误统计
+            return JsonResponse({
+                "success": True,
+                "tasks": task_manager.get_all_task_stats()
+            })
+        
         elif action == "cleanup":
             # 清理已停止的任务
             task_id = data.get("task_id")
@@ -1074,7 +1363,7 @@ def background_collection_api(request):
                 return JsonResponse({
                     "success": True,
                     "message": "探针连接成功",
-                    "data": cpu_data
+                    "data": humanize_metrics(cpu_data)
                 })
             except Exception as e:
                 logger.error(f"探针连接测试失败: {e}")
@@ -1215,7 +1504,7 @@ def get_latest_data_api(request):
         
         return JsonResponse({
             "success": True,
-            "data": response_data
+            "data": humanize_metrics(response_data)
         })
         
     except json.JSONDecodeError as e:
@@ -1278,8 +1567,8 @@ def get_latest_data(request):
         if latest_network:
             try:
                 # 计算网络使用率（基于发送和接收的字节数）
-                sent_bytes = float(latest_network.sent) if latest_network.sent else 0
-                recv_bytes = float(latest_network.recv) if latest_network.recv else 0
+                sent_bytes = parse_metric_number(latest_network.sent)
+                recv_bytes = parse_metric_number(latest_network.recv)
                 total_bytes = sent_bytes + recv_bytes
                 
                 # 将字节数转换为0-1之间的使用率（假设1GB为满负荷）
@@ -1342,12 +1631,12 @@ def save_collected_data_api(request):
             cpu_data = CPUPerformanceMetrics(
                 type='cpu',
                 ipaddress=ip_address,
-                percent=actual_data.get('cpu_percent', 0),
+                percent=metric_column(actual_data.get('cpu_percent')) or 0.0,
                 count=actual_data.get('cpu_count', 0),
-                userTime=actual_data.get('cpu_user', actual_data.get('cpu_user_time', 0)),
-                SystemTime=actual_data.get('cpu_system', actual_data.get('cpu_system_time', 0)),
-                Idle=actual_data.get('cpu_idle', actual_data.get('cpu_idle_time', 0)),
-                waitIO=actual_data.get('cpu_iowait', actual_data.get('cpu_wait_time', 0)),
+                userTime=metric_column(actual_data.get('cpu_user', actual_data.get('cpu_user_time'))),
+                SystemTime=metric_column(actual_data.get('cpu_system', actual_data.get('cpu_system_time'))),
+                Idle=metric_column(actual_data.get('cpu_idle', actual_data.get('cpu_idle_time'))),
+                waitIO=metric_column(actual_data.get('cpu_iowait', actual_data.get('cpu_wait_time'))),
                 currentTime=timezone.now()
             )
             cpu_data.save()
@@ -1358,13 +1647,13 @@ def save_collected_data_api(request):
             memory_data = MemoryPerformanceMetrics(
                 type='memory',
                 ipaddress=ip_address,
-                percent=actual_data.get('mem_percent', 0),
-                total=actual_data.get('mem_total', ''),
-                used=actual_data.get('mem_used', ''),
-                free=actual_data.get('mem_free', ''),
-                buffers=actual_data.get('mem_buffers', ''),
-                cache=actual_data.get('mem_cached', ''),
-                swap=actual_data.get('swap_used', ''),
+                percent=metric_column(actual_data.get('mem_percent')) or 0.0,
+                total=metric_column(actual_data.get('mem_total'), integer=True),
+                used=metric_column(actual_data.get('mem_used'), integer=True),
+                free=metric_column(actual_data.get('mem_free'), integer=True),
+                buffers=metric_column(actual_data.get('mem_buffers'), integer=True),
+                cache=metric_column(actual_data.get('mem_cached'), integer=True),
+                swap=metric_column(actual_data.get('swap_used'), integer=True),
                 currentTime=timezone.now()
             )
             memory_data.save()
@@ -1375,14 +1664,14 @@ def save_collected_data_api(request):
             disk_data = DiskPerformanceMetrics(
                 type='disk',
                 ipaddress=ip_address,
-                total=actual_data.get('disk_total', ''),
-                used=actual_data.get('disk_used', ''),
-                free=actual_data.get('disk_free', ''),
-                percent=actual_data.get('disk_percent', 0),
-                readCount=actual_data.get('disk_read_count', 0),
-                writeCount=actual_data.get('disk_write_count', 0),
-                readBytes=actual_data.get('disk_read_bytes', 0),
-                writeBytes=actual_data.get('disk_write_bytes', 0),
+                total=metric_column(actual_data.get('disk_total'), integer=True),
+                used=metric_column(actual_data.get('disk_used'), integer=True),
+                free=metric_column(actual_data.get('disk_free'), integer=True),
+                percent=metric_column(actual_data.get('disk_percent')) or 0.0,
+                readCount=metric_column(actual_data.get('disk_read_count'), integer=True),
+                writeCount=metric_column(actual_data.get('disk_write_count'), integer=True),
+                readBytes=metric_column(actual_data.get('disk_read_bytes'), integer=True),
+                writeBytes=metric_column(actual_data.get('disk_write_bytes'), integer=True),
                 currentTime=timezone.now()
             )
             disk_data.save()
@@ -1393,10 +1682,10 @@ def save_collected_data_api(request):
             network_data = NetworkPerformanceMetrics(
                 type='network',
                 ipaddress=ip_address,
-                sent=actual_data.get('net_bytes_sent', ''),
-                recv=actual_data.get('net_bytes_recv', ''),
-                packetSent=actual_data.get('net_packets_sent', ''),
-                packetRecv=actual_data.get('net_packets_recv', ''),
+                sent=metric_column(actual_data.get('net_bytes_sent'), integer=True),
+                recv=metric_column(actual_data.get('net_bytes_recv'), integer=True),
+                packetSent=metric_column(actual_data.get('net_packets_sent'), integer=True),
+                packetRecv=metric_column(actual_data.get('net_packets_recv'), integer=True),
                 currentTime=timezone.now()
             )
             network_data.save()
@@ -1408,12 +1697,12 @@ def save_collected_data_api(request):
                 cpu_data = CPUPerformanceMetrics(
                     type='cpu',
                     ipaddress=ip_address,
-                    percent=actual_data.get('cpu_percent', 0),
+                    percent=metric_column(actual_data.get('cpu_percent')) or 0.0,
                     count=actual_data.get('cpu_count', 0),
-                    userTime=actual_data.get('cpu_user', 0),
-                    SystemTime=actual_data.get('cpu_system', 0),
-                    Idle=actual_data.get('cpu_idle', 0),
-                    waitIO=actual_data.get('cpu_iowait', 0),
+                    userTime=metric_column(actual_data.get('cpu_user')),
+                    SystemTime=metric_column(actual_data.get('cpu_system')),
+                    Idle=metric_column(actual_data.get('cpu_idle')),
+                    waitIO=metric_column(actual_data.get('cpu_iowait')),
                     currentTime=timezone.now()
                 )
                 cpu_data.save()
@@ -162,6 +162,24 @@ OPENAPI_SPEC = {
                 "responses": {"200": {"description": "执行结果"}}
             }
         },
+        "/api/strategy/fanout": {
+            "post": {
+                "summary": "批量下发策略包（NDJSON 流式返回各服务器结果）",
+                "requestBody": {"required": True, "content": {"application/json": {"schema": {"type": "object", "properties": {
+                    "strategy": {"type": "string"},
+                    "hosts": {"type": "array", "items": {"type": "object", "properties": {
+                        "ip": {"type": "string"},
+                        "port": {"type": "integer"}
+                    }}},
+                    "ids": {"type": "array", "items": {"type": "integer"}},
+                    "category": {"type": "string"},
+                    "all": {"type": "boolean"},
+                    "parallelism": {"type": "integer"},
+                    "timeout": {"type": "number"}
+                }, "required": ["strategy"]}}}},
+                "responses": {"200": {"description": "每行一个 JSON：start、各服务器的 host 结果、done 汇总"}}
+            }
+        },
         "/api/ai_optimize/": {
             "post": {
                 "summary": "AI 优化推理（直传直返）",
@@ -190,7 +208,7 @@ OPENAPI_SPEC = {
             "post": {
                 "summary": "后台采集任务管理",
                 "requestBody": {"required": True, "content": {"application/json": {"schema": {"type": "object", "properties": {
-                    "action": {"type": "string", "enum": ["start", "stop", "status", "cleanup", "force_stop_all", "test_connection"]},
+                    "action": {"type": "string", "enum": ["start", "stop", "status", "stats", "cleanup", "force_stop_all", "test_connection"]},
                     "ip": {"type": "string"},
                     "port": {"type": "integer"},
                     "interval": {"type": "integer"},